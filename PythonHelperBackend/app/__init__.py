@@ -4,6 +4,7 @@ import os
 import logging
 from config import Config
 from .services.question_service import QuestionService
+from .services.ai_service import configure_ai_cache, configure_http_client, configure_request_coalescing
 
 def create_app(config_class=Config):
     """创建并配置 Flask 应用实例"""
@@ -28,9 +29,17 @@ def create_app(config_class=Config):
         logging.info(f"PPT上传目录已存在: {ppt_folder}")
 
     # 在应用上下文中初始化服务
+    # 题库服务须在启动任何后台线程（如题库监视）之前创建：分片搜索进程池此时 fork 子进程
     with app.app_context():
         app.question_service = QuestionService()
 
+    # AI 接口共用的长连接客户端（连接池大小与超时来自配置）、回复缓存与相同请求合并
+    configure_http_client(app.config)
+    configure_ai_cache(app.config)
+    configure_request_coalescing(app.config)
+
+    app.question_service.start_reload_watcher(app.config.get('QUESTION_BANK_RELOAD_INTERVAL', 0))
+
     # 注册蓝图
     from .routes.main_routes import main_bp
     from .routes.mistakes_routes import mistakes_bp
@@ -1,9 +1,16 @@
 from flask import Blueprint, jsonify, request, current_app, send_from_directory, Response
-from app.services.ai_service import call_ai_api, call_ai_api_with_memory, call_ai_api_stream
+from app.services.ai_service import call_ai_api, call_ai_api_with_memory, call_ai_api_stream, get_ai_cache, get_coalescing_stats, get_http_client
 from app.database import get_db
+from app.services.facets import FACET_FIELDS, normalize_filters
+from app.services.question_service import StaleCursorError
+from app.services.question_store import DisplayRecord
+from app.services.stream_pipeline import pipelined_filter
+import hmac
 import logging
 import os
 import json
+import time
+import zlib
 
 SYSTEM_PROMPT = """
                 #浙大python助手
@@ -48,15 +55,15 @@ FILTER_SYSTEM_PROMPT = """
 请直接输出修改后的内容，不需要输出“审核完成”等额外废话。
 """
 main_bp = Blueprint('main', __name__)
+SEARCH_MODES = ('text', 'code', 'vector')
 logger = logging.getLogger(__name__)
 
 
 @main_bp.route('/health', methods=['GET'])
 def health_check():
     question_service = current_app.question_service
-    question_types = {q.get('question_type', '未知'): 0 for q in question_service.questions_db}
-    for q in question_service.questions_db:
-        question_types[q.get('question_type', '未知')] += 1
+    bank = question_service.bank
+    question_types = bank.stats['question_types']
 
     mistakes_count = 0
     ppt_files_count = 0
@@ -69,9 +76,16 @@ def health_check():
 
     return jsonify({
         'status': 'healthy', 'message': 'Python教学助手后端服务运行正常',
-        'questions_count': len(question_service.questions_db),
+        'questions_count': len(bank.questions),
+        'bank_version': bank.version,
         'mistakes_count': mistakes_count, 'ppt_files_count': ppt_files_count,
         'question_types': question_types,
+        'search_cache': question_service.search_cache.stats(),
+        'shards': bank.shards.stats(),
+        'storage_backend': 'sqlite' if bank.fts_store is not None else 'memory',
+        'ai_http_pools': get_http_client().stats(),
+        'ai_cache': get_ai_cache().stats() if get_ai_cache() is not None else None,
+        'ai_coalescing': get_coalescing_stats(),
         'database_source': 'database.json' if os.path.exists('database.json') else 'questions.json',
         'features': ['题库搜索', 'AI聊天', '错题管理', 'PPT文件管理']
     })
@@ -112,6 +126,7 @@ def ai_chat():
 @main_bp.route('/ai/chat/stream', methods=['POST'])
 def ai_chat_stream():
     """AI聊天接口 - 支持流式传输（Server-Sent Events）"""
+    started = time.perf_counter()
     try:
         data = request.get_json()
         messages = data.get('messages', [])  # 接收完整对话历史
@@ -131,7 +146,20 @@ def ai_chat_stream():
 
         system = data.get('system', SYSTEM_PROMPT)
         api_endpoint = data.get('apiEndpoint', 'https://api.deepseek.com/v1/chat/completions')
-        
+
+        def filter_stream(content):
+            review_message = [{'role': 'user', 'content': f"请审查以下回复:\n\n{content}"}]
+            return call_ai_api_stream(review_message, api_key, api_endpoint, FILTER_SYSTEM_PROMPT)
+
+        if current_app.config.get('AI_STREAM_PIPELINE', False):
+            # 流水线模式：草稿按段落切分，每段生成完毕立即审查，审查结果按顺序流式返回
+            chunks = pipelined_filter(
+                call_ai_api_stream(messages, api_key, api_endpoint, system), filter_stream,
+                min_chars=current_app.config.get('AI_STREAM_PIPELINE_MIN_CHARS', 200),
+                max_parallel=current_app.config.get('AI_STREAM_PIPELINE_MAX_PARALLEL', 4))
+            return Response(_sse_stream(chunks, started, 'pipeline'), mimetype='text/event-stream',
+                            headers={'Cache-Control': 'no-cache', 'Connection': 'keep-alive'})
+
         draft_content = ""
         try:
             # 我们复用 call_ai_api_stream，但在后端循环消费它，不发送给前端
@@ -147,74 +175,246 @@ def ai_chat_stream():
         logger.info(f"第一阶段draft生成完成, 草稿长度: {len(draft_content)}")
 
         # 进行审查
-        filter_message = [
-            {'role': 'user', 'content': f"请审查以下回复:\n\n{draft_content}"}
-        ]
-        
-        def generate_filter_stream():
-            try:
-                for chunk in call_ai_api_stream(filter_message, api_key, api_endpoint, FILTER_SYSTEM_PROMPT):
-                    yield f"data: {json.dumps(chunk)}\n\n"
-            except Exception as e:
-                logger.error(f"流式AI调用错误: {e}")
-                error_chunk = {'content': f'错误: {str(e)}', 'done': True, 'error': True}
-                yield f"data: {json.dumps(error_chunk)}\n\n"
-        
-        return Response(generate_filter_stream(), mimetype='text/event-stream',
+        return Response(_sse_stream(filter_stream(draft_content), started, 'sequential'), mimetype='text/event-stream',
                       headers={'Cache-Control': 'no-cache', 'Connection': 'keep-alive'})
     except Exception as e:
         logger.error(f"AI流式聊天接口错误: {e}")
         return jsonify({'error': str(e), 'status': 'error'}), 500
 
 
+def _sse_stream(chunks, started, mode):
+    """将数据块编码为 SSE，并记录首字延迟（TTFT，从收到请求到第一段内容）与总耗时"""
+    first_token = None
+    try:
+        for chunk in chunks:
+            if first_token is None and chunk.get('content') and not chunk.get('error'):
+                first_token = time.perf_counter() - started
+                logger.info(f"/ai/chat/stream 首字延迟 ({mode}): {first_token * 1000:.0f} ms")
+            yield f"data: {json.dumps(chunk)}\n\n"
+    except Exception as e:
+        logger.error(f"流式AI调用错误: {e}")
+        error_chunk = {'content': f'错误: {str(e)}', 'done': True, 'error': True}
+        yield f"data: {json.dumps(error_chunk)}\n\n"
+    finally:
+        logger.info(f"/ai/chat/stream 完成 ({mode}): 总耗时 {(time.perf_counter() - started) * 1000:.0f} ms")
+
+
 @main_bp.route('/search', methods=['POST'])
 def search_questions_route():
     # ... (此路由内容与原代码相同)
     try:
         question_service = current_app.question_service
-        query = request.get_json().get('query', '')
+        data = request.get_json()
+        query = data.get('query', '')
         if not query: return jsonify({'error': '搜索查询不能为空'}), 400
-        results = question_service.search_questions(query)
+        top_k = _parse_top_k(data.get('top_k', 5))
+        if top_k is None:
+            return jsonify({'error': 'top_k 必须是正整数', 'status': 'error'}), 400
+        mode = data.get('mode', 'text')
+        if mode not in SEARCH_MODES:
+            return jsonify({'error': 'mode 只能是 text、code 或 vector', 'status': 'error'}), 400
+        try:
+            filters = normalize_filters(data.get('filters'))
+        except ValueError as e:
+            return jsonify({'error': str(e), 'status': 'error'}), 400
+        if mode == 'code':
+            results = question_service.match_code(query, top_k=top_k, filters=filters)
+        elif mode == 'vector':
+            results = question_service.vector_search(query, top_k=top_k, filters=filters)
+        else:
+            results = question_service.search_questions(query, top_k=top_k, filters=filters)
         return jsonify({'results': results, 'count': len(results), 'status': 'success'})
     except Exception as e:
         logger.error(f"搜索接口错误: {e}")
         return jsonify({'error': str(e), 'status': 'error'}), 500
 
 
+@main_bp.route('/search/batch', methods=['POST'])
+def search_questions_batch_route():
+    """批量搜索接口 - 一个题目集页面的所有题目一次请求完成"""
+    try:
+        question_service = current_app.question_service
+        data = request.get_json()
+        queries = data.get('queries')
+        if not isinstance(queries, list) or not queries:
+            return jsonify({'error': 'queries 必须是非空列表', 'status': 'error'}), 400
+        max_queries = current_app.config.get('SEARCH_BATCH_MAX_QUERIES', 100)
+        if len(queries) > max_queries:
+            return jsonify({'error': f'单次最多搜索 {max_queries} 个查询', 'status': 'error'}), 400
+        top_k = _parse_top_k(data.get('top_k', 5))
+        if top_k is None:
+            return jsonify({'error': 'top_k 必须是正整数', 'status': 'error'}), 400
+        mode = data.get('mode', 'text')
+        if mode not in SEARCH_MODES:
+            return jsonify({'error': 'mode 只能是 text、code 或 vector', 'status': 'error'}), 400
+        try:
+            filters = normalize_filters(data.get('filters'))
+        except ValueError as e:
+            return jsonify({'error': str(e), 'status': 'error'}), 400
+        if mode == 'code':
+            batch_results = [question_service.match_code(query, top_k=top_k, filters=filters)
+                             if isinstance(query, str) else [] for query in queries]
+        elif mode == 'vector':
+            batch_results = question_service.vector_search_batch(queries, top_k=top_k, filters=filters)
+        else:
+            batch_results = question_service.search_questions_batch(queries, top_k=top_k, filters=filters)
+        return jsonify({
+            'results': [{'query': query, 'results': results, 'count': len(results)}
+                        for query, results in zip(queries, batch_results)],
+            'count': len(batch_results), 'status': 'success'
+        })
+    except Exception as e:
+        logger.error(f"批量搜索接口错误: {e}")
+        return jsonify({'error': str(e), 'status': 'error'}), 500
+
+
+def _parse_top_k(value, max_value=None):
+    """解析返回条数，超过上限（默认为 SEARCH_MAX_TOP_K）时截断；非法值返回 None"""
+    try:
+        top_k = int(value)
+    except (TypeError, ValueError):
+        return None
+    if top_k < 1:
+        return None
+    return min(top_k, max_value or current_app.config.get('SEARCH_MAX_TOP_K', 50))
+
+
 @main_bp.route('/questions', methods=['GET'])
 def get_all_questions():
+    """题目列表接口
+
+    可选参数：cursor/limit 游标分页，fields/exclude 字段投影（逗号分隔），format=ndjson 逐行流式输出，
+    question_type/course/tag 筛选（可重复或逗号分隔）。响应带有由题库标识与参数生成的 ETag，题库未变化时返回 304。
+    """
     try:
         print('获取题目接口被调用')
         question_service = current_app.question_service
-        formatted_questions = [question_service.format_question_for_display(q) for q in question_service.questions_db]
-        return jsonify({'questions': formatted_questions, 'count': len(formatted_questions), 'status': 'success'})
+        args = request.args
+        limit = None
+        if 'limit' in args:
+            limit = _parse_top_k(args.get('limit'), current_app.config.get('QUESTIONS_PAGE_MAX_LIMIT', 1000))
+            if limit is None:
+                return jsonify({'error': 'limit 必须是正整数', 'status': 'error'}), 400
+        fields = _parse_fields(args.get('fields'), args.get('exclude'))
+        if fields is None:
+            return jsonify({'error': f'字段只能是 {", ".join(DisplayRecord.KEYS)}', 'status': 'error'}), 400
+        filters = {field: [value.strip() for raw in args.getlist(field) for value in raw.split(',') if value.strip()]
+                   for field in FACET_FIELDS if field in args}
+        try:
+            filters = normalize_filters(filters)
+            bank, records, next_cursor = question_service.page_questions(args.get('cursor'), limit, filters)
+        except StaleCursorError as e:
+            return jsonify({'error': str(e), 'status': 'error'}), 409
+        except ValueError as e:
+            return jsonify({'error': str(e), 'status': 'error'}), 400
+
+        params = '&'.join(f'{key}={value}' for key, value in sorted(args.items(multi=True)))
+        etag = f'{bank.etag}-{zlib.crc32(params.encode("utf-8")):08x}'
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+            response.set_etag(etag)
+            return response
+
+        if args.get('format') == 'ndjson':
+            def generate():
+                for record in records:
+                    yield json.dumps(record.to_dict(fields), ensure_ascii=False) + '\n'
+            response = Response(generate(), mimetype='application/x-ndjson')
+            if next_cursor:
+                response.headers['X-Next-Cursor'] = next_cursor
+        else:
+            formatted_questions = [record.to_dict(fields) for record in records]
+            body = {'questions': formatted_questions, 'count': len(formatted_questions), 'status': 'success'}
+            if limit is not None or args.get('cursor'):
+                facet = bank.facets.resolve(filters)
+                body.update({'total': len(bank.formatted) if facet is None else len(facet), 'next_cursor': next_cursor})
+            response = jsonify(body)
+        response.set_etag(etag)
+        return response
     except Exception as e:
         logger.error(f"获取题目接口错误: {e}")
         return jsonify({'error': str(e), 'status': 'error'}), 500
 
 
+def _parse_fields(fields, exclude):
+    """解析字段投影，返回要输出的键；含未知字段时返回 None"""
+    keys = list(DisplayRecord.KEYS)
+    if fields:
+        keys = [key.strip() for key in fields.split(',') if key.strip()]
+    if exclude:
+        excluded = {key.strip() for key in exclude.split(',') if key.strip()}
+        if not excluded.issubset(DisplayRecord.KEYS):
+            return None
+        keys = [key for key in keys if key not in excluded]
+    if not set(keys).issubset(DisplayRecord.KEYS):
+        return None
+    return keys
+
+
 @main_bp.route('/questions/stats', methods=['GET'])
 def get_questions_stats():
     try:
-        question_service = current_app.question_service
-        stats = {'question_types': {}, 'categories': {}, 'difficulties': {}}
-        for question in question_service.questions_db:
-            q_type = question.get('question_type', '未知')
-            stats['question_types'][q_type] = stats['question_types'].get(q_type, 0) + 1
-            formatted = question_service.format_question_for_display(question)
-            category = formatted.get('category', '未知')
-            difficulty = formatted.get('difficulty', '未知')
-            stats['categories'][category] = stats['categories'].get(category, 0) + 1
-            stats['difficulties'][difficulty] = stats['difficulties'].get(difficulty, 0) + 1
-
-        return jsonify({
-            'total_count': len(question_service.questions_db), **stats, 'status': 'success'
-        })
+        # 统计结果在题库加载时已计算好，请求开销与题库大小无关
+        bank = current_app.question_service.bank
+        etag = f'stats-{bank.etag}'
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            response = jsonify({
+                'total_count': len(bank.questions), **bank.stats, 'status': 'success'
+            })
+        response.set_etag(etag)
+        return response
     except Exception as e:
         logger.error(f"获取题目统计接口错误: {e}")
         return jsonify({'error': str(e), 'status': 'error'}), 500
 
 
+@main_bp.route('/autocomplete', methods=['GET'])
+def autocomplete():
+    """输入框前缀提示接口 - 每次按键调用，只做二分查找与查表"""
+    try:
+        limit = _parse_top_k(request.args.get('limit', 10),
+                             current_app.config.get('AUTOCOMPLETE_MAX_SUGGESTIONS', 10))
+        if limit is None:
+            return jsonify({'error': 'limit 必须是正整数', 'status': 'error'}), 400
+        suggestions = current_app.question_service.autocomplete(request.args.get('q', ''), limit=limit)
+        return jsonify({'suggestions': suggestions, 'count': len(suggestions), 'status': 'success'})
+    except Exception as e:
+        logger.error(f"前缀提示接口错误: {e}")
+        return jsonify({'error': str(e), 'status': 'error'}), 500
+
+
+@main_bp.route('/questions/<question_id>/related', methods=['GET'])
+def get_related_questions(question_id):
+    """相关题目接口 - 查询离线计算好的相关题目图"""
+    try:
+        limit = _parse_top_k(request.args.get('limit', 5))
+        if limit is None:
+            return jsonify({'error': 'limit 必须是正整数', 'status': 'error'}), 400
+        related = current_app.question_service.related_questions(question_id, limit=limit)
+        if related is None:
+            return jsonify({'error': f'题目 {question_id} 不存在', 'status': 'error'}), 404
+        return jsonify({'id': question_id, 'related': related, 'count': len(related), 'status': 'success'})
+    except Exception as e:
+        logger.error(f"相关题目接口错误: {e}")
+        return jsonify({'error': str(e), 'status': 'error'}), 500
+
+
+@main_bp.route('/questions/reload', methods=['POST'])
+def reload_questions():
+    """管理员接口：在后台重新加载题库，完成后原子切换"""
+    admin_token = current_app.config.get('ADMIN_TOKEN')
+    if not admin_token:
+        return jsonify({'error': '未配置管理员令牌，接口不可用', 'status': 'error'}), 403
+    # 按 UTF-8 字节比较：请求头中含非 ASCII 字符时 compare_digest 不接受 str
+    if not hmac.compare_digest(request.headers.get('X-Admin-Token', '').encode('utf-8'), admin_token.encode('utf-8')):
+        return jsonify({'error': '管理员令牌无效', 'status': 'error'}), 403
+    question_service = current_app.question_service
+    question_service.reload_in_background()
+    return jsonify({'status': 'accepted', 'bank_version': question_service.bank.version}), 202
+
+
 @main_bp.route('/auth')
 def auth_page():
     """提供认证页面"""
@@ -0,0 +1,136 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ai_responses (
+    key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    response TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    last_used REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_ai_responses_last_used ON ai_responses (last_used);
+"""
+
+
+def _normalize_text(text: str) -> str:
+    """统一换行符、去掉行尾与首尾空白；不改动行首缩进（代码的缩进有意义）"""
+    lines = str(text).replace('\r\n', '\n').replace('\r', '\n').split('\n')
+    return '\n'.join(line.rstrip() for line in lines).strip()
+
+
+def make_cache_key(api_endpoint: str, model: str, messages: List[Dict]) -> str:
+    """由端点、模型与规范化后的消息（含系统提示词）生成缓存键"""
+    normalized = [[message.get('role', ''), _normalize_text(message.get('content', ''))] for message in messages]
+    document = json.dumps([api_endpoint.strip().lower(), model, normalized], ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(document.encode('utf-8')).hexdigest()
+
+
+class AIResponseCache:
+    """AI 回复的持久缓存（保存在 mistakes.db 旁边的独立 SQLite 文件中）
+
+    相同端点、模型、系统提示词与对话内容的请求直接返回已缓存的回复。
+    超过 ttl 秒的回复失效；条目数或总字节数超过上限时按最近使用时间淘汰最旧的条目（LRU）。
+    多个工作进程共用同一个文件；缓存读写失败只记录日志，不影响 AI 调用。
+    """
+
+    def __init__(self, path: str, ttl: float = 7 * 24 * 3600, max_entries: int = 10000,
+                 max_bytes: int = 64 * 1024 * 1024):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        connection = self._connection()
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.executescript(_SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        """每个线程一个连接"""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            self._local.connection = connection
+        return connection
+
+    def _count(self, hit: bool) -> None:
+        with self._lock:
+            if hit:
+                self._hits += 1
+            else:
+                self._misses += 1
+
+    def get(self, key: str) -> Optional[str]:
+        """返回未过期的缓存回复并更新最近使用时间，没有时返回 None"""
+        now = time.time()
+        try:
+            connection = self._connection()
+            row = connection.execute('SELECT response, created_at FROM ai_responses WHERE key = ?', (key,)).fetchone()
+            if row is not None and now - row[1] > self.ttl:
+                connection.execute('DELETE FROM ai_responses WHERE key = ?', (key,))
+                row = None
+            if row is not None:
+                connection.execute('UPDATE ai_responses SET last_used = ?, hits = hits + 1 WHERE key = ?', (now, key))
+        except sqlite3.Error as e:
+            logger.warning(f"读取 AI 回复缓存失败: {e}")
+            return None
+        self._count(row is not None)
+        return row[0] if row is not None else None
+
+    def put(self, key: str, model: str, response: str) -> None:
+        """保存回复，随后淘汰过期与超出上限的条目"""
+        if not response:
+            return
+        now = time.time()
+        size = len(response.encode('utf-8'))
+        if size > self.max_bytes:
+            return
+        try:
+            connection = self._connection()
+            connection.execute(
+                'INSERT OR REPLACE INTO ai_responses (key, model, response, size, created_at, last_used, hits) '
+                'VALUES (?, ?, ?, ?, ?, ?, 0)', (key, model, response, size, now, now))
+            self._evict(connection, now)
+        except sqlite3.Error as e:
+            logger.warning(f"写入 AI 回复缓存失败: {e}")
+
+    def _evict(self, connection: sqlite3.Connection, now: float) -> None:
+        connection.execute('DELETE FROM ai_responses WHERE created_at < ?', (now - self.ttl,))
+        count, total = connection.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM ai_responses').fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        # 按最近使用时间从旧到新删除，直到条目数与总字节数都不超过上限
+        excess_count, excess_bytes = count - self.max_entries, total - self.max_bytes
+        doomed = []
+        for key, size in connection.execute('SELECT key, size FROM ai_responses ORDER BY last_used'):
+            if excess_count <= 0 and excess_bytes <= 0:
+                break
+            doomed.append((key,))
+            excess_count -= 1
+            excess_bytes -= size
+        connection.executemany('DELETE FROM ai_responses WHERE key = ?', doomed)
+
+    def stats(self) -> Dict:
+        try:
+            count, total = self._connection().execute(
+                'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM ai_responses').fetchone()
+        except sqlite3.Error:
+            count = total = None
+        with self._lock:
+            return {'entries': count, 'bytes': total, 'hits': self._hits, 'misses': self._misses,
+                    'max_entries': self.max_entries, 'max_bytes': self.max_bytes, 'ttl': self.ttl}
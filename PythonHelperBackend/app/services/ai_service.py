@@ -2,10 +2,274 @@ import requests
 import logging
 import markdown
 import json
-from typing import Dict, List, Generator
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Generator, Iterator, Mapping, Optional, Tuple
+from urllib.parse import urlsplit
+from requests.adapters import HTTPAdapter
+from ..database import DEFAULT_DB_PATH
+from .ai_cache import make_cache_key
+from .single_flight import SingleFlight, StreamFanout
 
 logger = logging.getLogger(__name__)
 
+
+class _Endpoint:
+    """一个端点的连接池：Session、请求统计与正在使用它的请求数"""
+
+    __slots__ = ('session', 'counters', 'users', 'evicted')
+
+    def __init__(self, session: requests.Session):
+        self.session = session
+        self.counters = {'requests': 0, 'errors': 0}
+        self.users = 0
+        self.evicted = False
+
+
+class AIHttpClient:
+    """所有 AI 接口调用共用的 HTTP 客户端（线程安全）
+
+    每个 API 端点（协议 + 主机 + 端口）一个 requests.Session，连接池中的连接保持长连接，
+    同一端点的后续请求（包括 /ai/chat/stream 的两个阶段）直接复用，不再重复 TCP 与 TLS 握手。
+    端点地址来自请求参数，最多保留 max_endpoints 个端点的连接池，超出时移除最久未使用的端点及其统计；
+    被移除的连接池若仍有请求在使用（如进行中的流式响应），等这些请求结束后再关闭。
+    """
+
+    def __init__(self, pool_size: int = 10, connect_timeout: float = 10, read_timeout: float = 600,
+                 max_endpoints: int = 8):
+        self.pool_size = pool_size
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_endpoints = max_endpoints
+        self._endpoints: 'OrderedDict[str, _Endpoint]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _origin(url: str) -> str:
+        parts = urlsplit(url)
+        return f"{parts.scheme}://{parts.netloc}".lower()
+
+    def _acquire(self, url: str) -> _Endpoint:
+        """取得 url 所属端点的连接池并登记一个使用者，用完后须调用 _release"""
+        origin = self._origin(url)
+        evicted = []
+        with self._lock:
+            endpoint = self._endpoints.get(origin)
+            if endpoint is None:
+                session = requests.Session()
+                session.mount(f"{origin}/", HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size))
+                endpoint = self._endpoints[origin] = _Endpoint(session)
+            else:
+                self._endpoints.move_to_end(origin)
+            endpoint.users += 1
+            while len(self._endpoints) > self.max_endpoints:
+                _, oldest = self._endpoints.popitem(last=False)
+                oldest.evicted = True
+                if oldest.users == 0:
+                    evicted.append(oldest)
+        for oldest in evicted:
+            oldest.session.close()
+        return endpoint
+
+    def _release(self, endpoint: _Endpoint) -> None:
+        with self._lock:
+            endpoint.users -= 1
+            close = endpoint.evicted and endpoint.users == 0
+        if close:
+            endpoint.session.close()
+
+    def _send(self, endpoint: _Endpoint, url: str, **kwargs) -> requests.Response:
+        kwargs.setdefault('timeout', self.timeout)
+        with self._lock:
+            endpoint.counters['requests'] += 1
+        try:
+            return endpoint.session.post(url, **kwargs)
+        except requests.exceptions.RequestException:
+            with self._lock:
+                endpoint.counters['errors'] += 1
+            raise
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        """发送 POST 请求并读取完整响应，未指定 timeout 时使用配置的 (连接超时, 读取超时)
+
+        流式请求使用 stream_lines。
+        """
+        endpoint = self._acquire(url)
+        try:
+            return self._send(endpoint, url, **kwargs)
+        finally:
+            self._release(endpoint)
+
+    def stream_lines(self, url: str, **kwargs) -> Generator[bytes, None, None]:
+        """发送流式 POST 请求并逐行返回响应内容，结束后把连接放回连接池
+
+        读到 [DONE] 后调用方会停止迭代，此时响应体通常只剩结尾的分块标记：先读完剩余内容再释放，
+        连接才能被下一次请求复用；中途放弃（如客户端断开）时直接关闭连接，不等待剩余内容。
+        迭代结束或关闭之前端点的连接池不会因淘汰而被关闭。
+        """
+        endpoint = self._acquire(url)
+        try:
+            response = self._send(endpoint, url, stream=True, **kwargs)
+            finished = False
+            try:
+                response.raise_for_status()
+                for line in response.iter_lines():
+                    if line.strip() == b'data: [DONE]':
+                        finished = True
+                    yield line
+                finished = True
+            finally:
+                if finished:
+                    response.raw.drain_conn()
+                response.close()
+        finally:
+            self._release(endpoint)
+
+    def stats(self) -> Dict[str, Dict]:
+        """各端点的连接池统计：请求数、失败数、新建连接数与空闲连接数"""
+        with self._lock:
+            endpoints = [(origin, endpoint, dict(endpoint.counters)) for origin, endpoint in self._endpoints.items()]
+        stats = {}
+        for origin, endpoint, counters in endpoints:
+            connections_created = idle_connections = 0
+            pool_manager = endpoint.session.get_adapter(f"{origin}/").poolmanager
+            for key in list(pool_manager.pools.keys()):
+                pool = pool_manager.pools.get(key)
+                if pool is not None:
+                    connections_created += pool.num_connections
+                    # 连接池队列中预先填充了 None 占位，只统计真正的空闲连接
+                    idle_connections += sum(1 for conn in list(pool.pool.queue) if conn is not None) if pool.pool else 0
+            stats[origin] = {**counters, 'connections_created': connections_created,
+                             'idle_connections': idle_connections, 'pool_size': self.pool_size}
+        return stats
+
+    def close(self) -> None:
+        """关闭所有连接池；仍在使用的连接池在使用结束后关闭"""
+        with self._lock:
+            endpoints = list(self._endpoints.values())
+            self._endpoints.clear()
+            idle = []
+            for endpoint in endpoints:
+                endpoint.evicted = True
+                if endpoint.users == 0:
+                    idle.append(endpoint)
+        for endpoint in idle:
+            endpoint.session.close()
+
+
+_http_client = AIHttpClient()
+
+
+def configure_http_client(config: Mapping) -> AIHttpClient:
+    """按应用配置重新创建共用的 HTTP 客户端（应用启动时调用一次）"""
+    global _http_client
+    old_client, _http_client = _http_client, AIHttpClient(
+        pool_size=config.get('AI_HTTP_POOL_SIZE', 10),
+        connect_timeout=config.get('AI_HTTP_CONNECT_TIMEOUT', 10),
+        read_timeout=config.get('AI_HTTP_READ_TIMEOUT', 600),
+        max_endpoints=config.get('AI_HTTP_MAX_ENDPOINTS', 8),
+    )
+    old_client.close()
+    return _http_client
+
+
+def get_http_client() -> AIHttpClient:
+    return _http_client
+
+
+def _post_json(api_endpoint: str, headers: Dict, data: Dict) -> Dict:
+    """使用长连接客户端发送非流式请求并解析 JSON"""
+    response = get_http_client().post(api_endpoint, headers=headers, json=data)
+    response.raise_for_status()
+    return response.json()
+
+
+_response_cache = None
+
+
+def configure_ai_cache(config: Mapping):
+    """按配置打开 AI 回复缓存（AI_CACHE_ENABLED），默认保存在 mistakes.db 同一目录的 ai_cache.db"""
+    global _response_cache
+    _response_cache = None
+    if not config.get('AI_CACHE_ENABLED', True):
+        return None
+    from .ai_cache import AIResponseCache
+    path = config.get('AI_CACHE_PATH') or os.path.join(os.path.dirname(os.path.abspath(DEFAULT_DB_PATH)), 'ai_cache.db')
+    try:
+        _response_cache = AIResponseCache(
+            path,
+            ttl=config.get('AI_CACHE_TTL', 7 * 24 * 3600),
+            max_entries=config.get('AI_CACHE_MAX_ENTRIES', 10000),
+            max_bytes=config.get('AI_CACHE_MAX_BYTES', 64 * 1024 * 1024),
+        )
+    except (OSError, sqlite3.Error) as e:
+        logger.error(f"打开 AI 回复缓存失败，不使用缓存: {e}")
+    return _response_cache
+
+
+def get_ai_cache():
+    return _response_cache
+
+
+def _cached_response(api_endpoint: str, model: str, messages: List[Dict]) -> Tuple[str, Optional[str]]:
+    """返回 (请求键, 已缓存的回复)；请求键同时用于合并相同请求，未启用缓存或未命中时回复为 None"""
+    key = make_cache_key(api_endpoint, model, messages)
+    cache = get_ai_cache()
+    return key, cache.get(key) if cache is not None else None
+
+
+def _store_response(key: str, model: str, response: str) -> None:
+    cache = get_ai_cache()
+    if cache is not None:
+        cache.put(key, model, response)
+
+
+def _replay_stream(response: str, chunk_size: int = 16) -> Generator[Dict, None, None]:
+    """将缓存的回复按流式接口的格式分块返回"""
+    for start in range(0, len(response), chunk_size):
+        yield {'content': response[start:start + chunk_size], 'done': False}
+    yield {'content': '', 'done': True, 'cached': True}
+
+
+def _stream_lines(api_endpoint: str, headers: Dict, data: Dict) -> Generator[bytes, None, None]:
+    """发送流式请求并逐行返回响应内容"""
+    return get_http_client().stream_lines(api_endpoint, headers=headers, json=data)
+
+
+_single_flight: Optional[SingleFlight] = SingleFlight()
+_stream_fanout: Optional[StreamFanout] = StreamFanout()
+
+
+def configure_request_coalescing(config: Mapping):
+    """按配置（AI_COALESCE_REQUESTS）开启或关闭相同请求的合并"""
+    global _single_flight, _stream_fanout
+    if config.get('AI_COALESCE_REQUESTS', True):
+        _single_flight, _stream_fanout = SingleFlight(), StreamFanout()
+    else:
+        _single_flight = _stream_fanout = None
+
+
+def get_coalescing_stats() -> Optional[Dict]:
+    if _single_flight is None or _stream_fanout is None:
+        return None
+    return {'requests': _single_flight.stats(), 'streams': _stream_fanout.stats()}
+
+
+def _coalesced_post(key: str, api_endpoint: str, headers: Dict, data: Dict) -> Tuple[Dict, bool]:
+    """同时进行的相同请求只发送一次，返回 (响应, 是否由本次调用发送)"""
+    if _single_flight is None:
+        return _post_json(api_endpoint, headers, data), True
+    return _single_flight.do(key, lambda: _post_json(api_endpoint, headers, data))
+
+
+def _coalesced_stream(key: str, api_endpoint: str, headers: Dict,
+                      data: Dict) -> Tuple[Iterator[bytes], bool]:
+    """同时进行的相同流式请求共享一个上游流，返回 (逐行迭代器, 是否由本次调用发起)"""
+    if _stream_fanout is None:
+        return _stream_lines(api_endpoint, headers, data), True
+    return _stream_fanout.join(key, lambda: _stream_lines(api_endpoint, headers, data))
+
 # d3f4ebk44jevfv89d6e0 浙大智能体密钥
 def convert_markdown_to_html(markdown_text: str) -> str:
     """将markdown文本转换为HTML"""
@@ -52,6 +316,11 @@ def call_ai_api_with_memory(messages: List[Dict], api_key: str, api_endpoint: st
                     'content': msg['content']
                 })
 
+        cache_key, cached = _cached_response(api_endpoint, model, full_messages)
+        if cached is not None:
+            logger.info(f"AI回复缓存命中 (持久记忆): {api_endpoint} with model: {model}")
+            return cached
+
         data = {
             'model': model,
             'messages': full_messages,
@@ -59,15 +328,15 @@ def call_ai_api_with_memory(messages: List[Dict], api_key: str, api_endpoint: st
             'temperature': 0.7
         }
 
-        logger.info(f"调用AI API (持久记忆): {api_endpoint} with model: {model}, messages count: {len(full_messages)}, timeout: 600s")
-        response = requests.post(api_endpoint, headers=headers, json=data, timeout=600)
-
-        response.raise_for_status()
-        result = response.json()
+        result = None
+        logger.info(f"调用AI API (持久记忆): {api_endpoint} with model: {model}, messages count: {len(full_messages)}, timeout: {get_http_client().timeout}")
+        result, leader = _coalesced_post(cache_key, api_endpoint, headers, data)
         logger.info("AI API调用成功 (持久记忆)")
         
         # 获取AI回复内容
         ai_response = result['choices'][0]['message']['content']
+        if leader:
+            _store_response(cache_key, model, ai_response)
         
         # # 将markdown转换为HTML
         # html_response = convert_markdown_to_html(ai_response)
@@ -78,7 +347,7 @@ def call_ai_api_with_memory(messages: List[Dict], api_key: str, api_endpoint: st
         logger.error(f"AI API调用失败 (持久记忆): {e}")
         raise Exception(f"AI服务调用失败: {str(e)}")
     except (KeyError, IndexError) as e:
-        logger.error(f"处理AI响应失败 (持久记忆): {e} - Response: {response.text}")
+        logger.error(f"处理AI响应失败 (持久记忆): {e} - Response: {result}")
         raise Exception(f"处理AI响应失败，无效的响应格式")
 
 
@@ -103,24 +372,29 @@ def call_ai_api(message: str, api_key: str, api_endpoint: str, system: str) -> s
             'temperature': 0.7
         }
 
-        logger.info(f"调用AI API: {api_endpoint} with model: {model}, timeout: 600s")
-        # --- 关键修改：将timeout延长至600秒 ---
-        response = requests.post(api_endpoint, headers=headers, json=data, timeout=600)
-
-        response.raise_for_status()  # 如果状态码不是 2xx，则抛出异常
+        cache_key, cached = _cached_response(api_endpoint, model, data['messages'])
+        if cached is not None:
+            logger.info(f"AI回复缓存命中: {api_endpoint} with model: {model}")
+            return cached
 
-        result = response.json()
-        logger.info("AI API调用成功")
+        result = None
+        logger.info(f"调用AI API: {api_endpoint} with model: {model}, timeout: {get_http_client().timeout}")
+        # --- 关键修改：读取超时延长至600秒（AI_HTTP_READ_TIMEOUT）---
+        # 同时到达的相同请求只有第一个发往上游，其余等待并共享它的结果
+        result, leader = _coalesced_post(cache_key, api_endpoint, headers, data)  # 如果状态码不是 2xx，则抛出异常
+        logger.info("AI API调用成功" if leader else "AI API调用成功（与进行中的相同请求合并）")
         
         # 获取AI回复内容
         ai_response = result['choices'][0]['message']['content']
+        if leader:
+            _store_response(cache_key, model, ai_response)
 
         return ai_response
     except requests.exceptions.RequestException as e:
         logger.error(f"AI API调用失败: {e}")
         raise Exception(f"AI服务调用失败: {str(e)}")
     except (KeyError, IndexError) as e:
-        logger.error(f"处理AI响应失败: {e} - Response: {response.text}")
+        logger.error(f"处理AI响应失败: {e} - Response: {result}")
         raise Exception(f"处理AI响应失败，无效的响应格式")
 
 
@@ -149,6 +423,13 @@ def call_ai_api_stream(messages: List[Dict], api_key: str, api_endpoint: str, sy
                     'content': msg['content']
                 })
 
+        # 已缓存的回复（包括 /ai/chat 得到的）按流式格式直接返回
+        cache_key, cached = _cached_response(api_endpoint, model, full_messages)
+        if cached is not None:
+            logger.info(f"AI回复缓存命中 (流式): {api_endpoint} with model: {model}")
+            yield from _replay_stream(cached)
+            return
+
         data = {
             'model': model,
             'messages': full_messages,
@@ -157,21 +438,24 @@ def call_ai_api_stream(messages: List[Dict], api_key: str, api_endpoint: str, sy
             'stream': True  # 启用流式传输
         }
 
-        logger.info(f"调用AI API (流式): {api_endpoint} with model: {model}, messages count: {len(full_messages)}, timeout: 600s")
+        logger.info(f"调用AI API (流式): {api_endpoint} with model: {model}, messages count: {len(full_messages)}, timeout: {get_http_client().timeout}")
         
-        # 发送流式请求
-        response = requests.post(api_endpoint, headers=headers, json=data, timeout=600, stream=True)
-        response.raise_for_status()
+        # 发送流式请求；进行中的相同请求共享同一个上游流
+        lines, leader = _coalesced_stream(cache_key, api_endpoint, headers, data)
         
-        logger.info("AI API流式调用成功")
+        logger.info("AI API流式调用成功" if leader else "AI API流式调用成功（与进行中的相同请求合并）")
+        # 完整收到的回复写入缓存（只由发起上游请求的调用写入）
+        parts = []
         # 处理流式响应
-        for line in response.iter_lines():
+        for line in lines:
             if line:
                 line = line.decode('utf-8')
                 if line.startswith('data: '):
                     data_str = line[6:]  # 移除 'data: ' 前缀
                     if data_str.strip() == '[DONE]':
                         # 流式传输结束
+                        if leader:
+                            _store_response(cache_key, model, ''.join(parts))
                         yield {'content': '', 'done': True}
                         break
                     try:
@@ -180,9 +464,12 @@ def call_ai_api_stream(messages: List[Dict], api_key: str, api_endpoint: str, sy
                             choice = chunk_data['choices'][0]
                             if 'delta' in choice and 'content' in choice['delta']:
                                 content = choice['delta']['content']
+                                parts.append(content or '')
                                 yield {'content': content, 'done': False}
                             elif choice.get('finish_reason'):
                                 # 传输完成
+                                if leader:
+                                    _store_response(cache_key, model, ''.join(parts))
                                 yield {'content': '', 'done': True}
                                 break
                     except json.JSONDecodeError:
@@ -0,0 +1,163 @@
+import heapq
+import re
+from array import array
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .question_store import DisplayRecord
+
+# 大于任何实际字符，用于求前缀区间的上界
+_MAX_CHAR = '\U0010ffff'
+_WHITESPACE = re.compile(r'\s+')
+_TERM_PATTERN = re.compile(r'[a-z_][a-z0-9_]+')
+
+
+def normalize_prefix(text: str) -> str:
+    """小写并合并连续空白，输入框中的前缀与建索引时的文本按同一规则处理"""
+    return _WHITESPACE.sub(' ', text.lower()).lstrip()
+
+
+def _headline(text: str, max_length: int) -> str:
+    """题目开头的一段（合并空白与换行后截断），作为提示文本
+
+    不只取第一行：大量题目的第一行相同（如“以下代码段的输出是什么？”），后面的代码才能区分。
+    """
+    # 只处理开头足够长的一段：合并空白后的前缀与整段合并后的前缀相同
+    length = max_length * 2
+    while True:
+        headline = _WHITESPACE.sub(' ', text[:length]).strip()
+        if len(headline) >= max_length or length >= len(text):
+            return headline[:max_length]
+        length *= 2
+
+
+class _KeyList:
+    """排序后的提示词列表：拼接为一个字符串并记录偏移，不为每个提示词单独保存 str 对象"""
+
+    __slots__ = ('_text', '_offsets')
+
+    def __init__(self, keys: Iterable[str]):
+        parts = []
+        offsets = array('I', [0])
+        for key in keys:
+            parts.append(key)
+            offsets.append(offsets[-1] + len(key))
+        self._text = ''.join(parts)
+        self._offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, position: int) -> str:
+        return self._text[self._offsets[position]:self._offsets[position + 1]]
+
+
+class PrefixIndex:
+    """题目与关键词的前缀提示索引（排序前缀数组）
+
+    所有提示词按规范化文本排序，一个前缀对应数组中的一段连续区间，二分查找即可定位。
+    区间较短时直接在区间内取得分最高的若干条；区间较长（如只输入一两个字符）时，
+    使用构建时为该前缀预先算好的结果，查询耗时与题库大小无关。
+    索引中只保存提示的排名（整数数组），返回时再由关键词表或显示记录生成提示内容。
+    """
+
+    def __init__(self, terms: Sequence[Tuple[str, int]], formatted: Sequence[DisplayRecord],
+                 keys: Iterable[Tuple[str, int]], max_suggestions: int = 10, scan_limit: int = 64,
+                 headline_length: int = 40):
+        """
+        Args:
+            terms: 关键词提示 (关键词, 出现的题目数)，按优先级从高到低排列，排名即位置
+            formatted: 题目提示对应的显示记录，排名为 len(terms) + 题目编号
+            keys: (规范化后的提示词, 提示排名)，同一条提示可以有多个提示词
+            max_suggestions: 每个前缀最多返回的提示数
+            scan_limit: 前缀区间超过该长度时预先计算结果
+            headline_length: 题目提示文本的最大长度
+        """
+        self.terms = [term for term, _ in terms]
+        self.term_counts = array('I', (count for _, count in terms))
+        self.formatted = formatted
+        self.max_suggestions = max_suggestions
+        self.scan_limit = scan_limit
+        self.headline_length = headline_length
+        pairs = sorted(set(keys))
+        self.keys = _KeyList(key for key, _ in pairs)
+        self.ranks = array('I', (rank for _, rank in pairs))
+        # 长区间前缀 -> 预先计算的提示排名
+        self._top: Dict[str, array] = {}
+        if pairs:
+            self._build(0, len(self.keys), 0)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def _best(self, ranks: Iterable[int]) -> List[int]:
+        return heapq.nsmallest(self.max_suggestions, set(ranks))
+
+    def _build(self, lo: int, hi: int, depth: int) -> List[int]:
+        """自底向上计算 keys[lo:hi]（共享长度为 depth 的前缀）的最优提示，长区间记入 _top"""
+        if hi - lo <= self.scan_limit:
+            return self._best(self.ranks[lo:hi])
+        keys = self.keys
+        candidates = []
+        position = lo
+        # 与前缀完全相同的提示词排在区间最前面
+        while position < hi and len(keys[position]) == depth:
+            candidates.append(self.ranks[position])
+            position += 1
+        while position < hi:
+            prefix = keys[position][:depth + 1]
+            end = bisect_left(keys, prefix + _MAX_CHAR, position, hi)
+            candidates.extend(self._build(position, end, depth + 1))
+            position = end
+        best = self._best(candidates)
+        self._top[keys[lo][:depth]] = array('I', best)
+        return best
+
+    def _suggestion(self, rank: int) -> Dict:
+        if rank < len(self.terms):
+            return {'text': self.terms[rank], 'kind': 'term', 'count': self.term_counts[rank]}
+        record = self.formatted[rank - len(self.terms)]
+        headline = _headline(record.question.get('question', ''), self.headline_length)
+        return {'text': headline or record.title, 'kind': 'question', 'id': record.id, 'title': record.title}
+
+    def suggest(self, prefix: str, limit: Optional[int] = None) -> List[Dict]:
+        """返回以 prefix 开头的提示（按优先级排序），最多 limit 条（不超过 max_suggestions）"""
+        prefix = normalize_prefix(prefix)
+        if not prefix:
+            return []
+        limit = min(limit or self.max_suggestions, self.max_suggestions)
+        lo = bisect_left(self.keys, prefix)
+        hi = bisect_left(self.keys, prefix + _MAX_CHAR, lo)
+        if hi - lo > self.scan_limit:
+            best = self._top[prefix]
+        else:
+            best = self._best(self.ranks[lo:hi])
+        return [self._suggestion(rank) for rank in best[:limit]]
+
+
+def build_prefix_index(formatted: Sequence[DisplayRecord], term_counts: Iterable[Tuple[str, int]],
+                       max_suggestions: int = 10, headline_length: int = 40) -> PrefixIndex:
+    """由显示记录与检索词统计 (检索词, 包含它的题目数) 构建前缀提示索引
+
+    提示分两类：关键词（题目中的英文/Python 标识符与题目 keywords，按出现的题目数排序）
+    与题目（以题目开头的一段和标题如“单选题 1”作为提示词，按题库顺序）。
+    """
+    terms: Dict[str, int] = {}
+    for term, count in term_counts:
+        if _TERM_PATTERN.fullmatch(term):
+            terms[term] = count
+    for record in formatted:
+        for keyword in record.keywords or ():
+            keyword = normalize_prefix(str(keyword)).strip()
+            if keyword:
+                terms[keyword] = terms.get(keyword, 0) + 1
+
+    ranked_terms = sorted(terms.items(), key=lambda item: (-item[1], item[0]))
+    keys = [(term, rank) for rank, (term, _) in enumerate(ranked_terms)]
+    for doc_id, record in enumerate(formatted):
+        headline = _headline(record.question.get('question', ''), headline_length)
+        rank = len(ranked_terms) + doc_id
+        for key in (normalize_prefix(headline), normalize_prefix(record.title)):
+            if key:
+                keys.append((key, rank))
+    return PrefixIndex(ranked_terms, formatted, keys, max_suggestions, headline_length=headline_length)
@@ -0,0 +1,86 @@
+import json
+import logging
+import mmap
+import os
+import pickle
+import struct
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 快照文件格式: 魔数 | 头部长度(uint32) | JSON 头部 | pickle 数据
+SNAPSHOT_MAGIC = b'PHQBANK\x00'
+# 题目记录、索引或评分器的结构变化时递增，旧快照随之失效
+SNAPSHOT_FORMAT_VERSION = 6
+_HEADER_LENGTH = struct.Struct('<I')
+
+
+def _header_key(scorer_key: Tuple) -> list:
+    """评分器配置在 JSON 头部中的形式（元组经 JSON 往返后变为列表）"""
+    return json.loads(json.dumps(list(scorer_key)))
+
+
+def write_snapshot(path: str, payload: Dict, source_signature: Optional[Tuple[int, int]],
+                   scorer_key: Tuple) -> None:
+    """将预先构建好的题库（记录、显示记录、索引、评分器）写入二进制快照
+
+    先写入临时文件再原子替换，正在读取旧快照的进程不受影响。
+    """
+    header = json.dumps({
+        'format_version': SNAPSHOT_FORMAT_VERSION,
+        'source_signature': list(source_signature) if source_signature else None,
+        'scorer': _header_key(scorer_key),
+        'question_count': len(payload['questions']),
+    }).encode('utf-8')
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(SNAPSHOT_MAGIC)
+        f.write(_HEADER_LENGTH.pack(len(header)))
+        f.write(header)
+        pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+
+def read_snapshot_header(path: str) -> Optional[Dict]:
+    """读取快照头部，文件不存在或格式不符时返回 None"""
+    try:
+        with open(path, 'rb') as f:
+            if f.read(len(SNAPSHOT_MAGIC)) != SNAPSHOT_MAGIC:
+                return None
+            (length,) = _HEADER_LENGTH.unpack(f.read(_HEADER_LENGTH.size))
+            return json.loads(f.read(length))
+    except (OSError, ValueError, struct.error):
+        return None
+
+
+def load_snapshot(path: Optional[str], source_signature: Optional[Tuple[int, int]],
+                  scorer_key: Tuple) -> Optional[Dict]:
+    """加载与题库文件一致的快照，快照缺失或已过期时返回 None
+
+    快照通过 mmap 映射后直接反序列化，不再额外复制一份文件内容。
+    评分器配置与快照不一致时，返回结果中的 scorer 为 None，由调用方重新创建。
+    """
+    if not path or source_signature is None:
+        return None
+    header = read_snapshot_header(path)
+    if header is None:
+        return None
+    if header.get('format_version') != SNAPSHOT_FORMAT_VERSION:
+        logger.info(f"题库快照格式已过期: {path}")
+        return None
+    if header.get('source_signature') != list(source_signature):
+        logger.info(f"题库快照与题库文件不一致，回退到 JSON: {path}")
+        return None
+    try:
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            (length,) = _HEADER_LENGTH.unpack_from(mapped, len(SNAPSHOT_MAGIC))
+            offset = len(SNAPSHOT_MAGIC) + _HEADER_LENGTH.size + length
+            with memoryview(mapped)[offset:] as data:
+                payload = pickle.loads(data)
+    except Exception as e:
+        logger.error(f"读取题库快照失败: {e}")
+        return None
+    if header.get('scorer') != _header_key(scorer_key):
+        payload['scorer'] = None
+    logger.info(f"已从快照 {path} 加载 {len(payload['questions'])} 道题目")
+    return payload
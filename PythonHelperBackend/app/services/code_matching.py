@@ -0,0 +1,165 @@
+import builtins
+import hashlib
+import io
+import keyword
+import operator
+import tokenize
+from array import array
+from collections import Counter
+from typing import Container, Dict, Iterable, List, Optional, Tuple
+
+# 保留原样的名称：关键字与内置函数决定代码结构，其余标识符统一替换为 ID
+_KEPT_NAMES = frozenset(keyword.kwlist) | frozenset(dir(builtins))
+_SKIPPED_TYPES = frozenset((tokenize.NEWLINE, tokenize.NL, tokenize.INDENT, tokenize.DEDENT, tokenize.COMMENT,
+                            tokenize.ENCODING, tokenize.ENDMARKER, tokenize.ERRORTOKEN))
+
+NUM_PERM = 64
+LSH_BANDS = 16
+_ROWS = NUM_PERM // LSH_BANDS
+_BIN_MASK = NUM_PERM - 1
+# 空桶借用相邻桶的值时叠加的偏移，使借用的值与原值不同
+_DENSIFY_OFFSET = 0x9E3779B1
+# 代码行的判断：至少含有一个代码符号，且 ASCII 字符占比不低于该值
+_CODE_SYMBOLS = frozenset('=()[]{}:')
+_CODE_ASCII_RATIO = 0.6
+
+
+def _normalize_token(token_type: int, text: str) -> Optional[str]:
+    if token_type in _SKIPPED_TYPES:
+        return None
+    if token_type == tokenize.NAME:
+        # 中文说明文字也会被识别为名称，保留原文
+        if text.isascii() and text not in _KEPT_NAMES:
+            return 'ID'
+        return text
+    if token_type == tokenize.STRING:
+        # 忽略引号风格的差异
+        return 'S:' + text.strip('\'"')
+    return text
+
+
+def contains_code(text: str) -> bool:
+    """题目中是否含有代码行（主要由 ASCII 字符组成并含有代码符号的行）
+
+    只用于建索引前的筛选：纯文字题目不做分词与 MinHash，按代码片段搜索时也不会命中它们。
+    """
+    for line in text.splitlines():
+        stripped = line.strip()
+        if len(stripped) < 3 or _CODE_SYMBOLS.isdisjoint(stripped):
+            continue
+        if sum(char.isascii() for char in stripped) >= _CODE_ASCII_RATIO * len(stripped):
+            return True
+    return False
+
+
+def code_tokens(text: str) -> List[str]:
+    """用 tokenize 切分代码，去掉空白、缩进与注释，并将变量名归一化
+
+    题目中混有中文说明，缩进也常被学生改动，整段切分失败时改为逐行切分。
+    """
+    try:
+        return [token for token in (_normalize_token(tok.type, tok.string)
+                                    for tok in tokenize.generate_tokens(io.StringIO(text).readline))
+                if token is not None]
+    except (tokenize.TokenError, SyntaxError):
+        pass
+    tokens = []
+    for line in text.splitlines():
+        try:
+            tokens.extend(token for token in (_normalize_token(tok.type, tok.string)
+                                              for tok in tokenize.generate_tokens(io.StringIO(line.strip()).readline))
+                          if token is not None)
+        except (tokenize.TokenError, SyntaxError):
+            continue
+    return tokens
+
+
+def code_shingles(text: str, size: int = 3) -> set:
+    """由连续 size 个归一化词法单元组成的片段集合"""
+    tokens = code_tokens(text)
+    return {'\x1f'.join(tokens[i:i + size]) for i in range(len(tokens) - size + 1)}
+
+
+def minhash_signature(shingles: Iterable[str]) -> Optional[array]:
+    """计算 MinHash 签名（单次哈希 + 分桶 + 致密化），没有片段时返回 None
+
+    每个片段只哈希一次，按低位分入 NUM_PERM 个桶并保留桶内最小值，
+    空桶借用右侧最近的非空桶；两段代码签名相同位置相等的比例近似于片段集合的 Jaccard 相似度。
+    """
+    signature = [None] * NUM_PERM
+    for shingle in shingles:
+        value = int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest(), 'little')
+        slot, value = value & _BIN_MASK, value >> 32
+        if signature[slot] is None or value < signature[slot]:
+            signature[slot] = value
+    if signature.count(None) == NUM_PERM:
+        return None
+    for slot in range(NUM_PERM):
+        if signature[slot] is None:
+            distance = next(d for d in range(1, NUM_PERM) if signature[(slot + d) % NUM_PERM] is not None)
+            signature[slot] = (signature[(slot + distance) % NUM_PERM] + distance * _DENSIFY_OFFSET) & 0xFFFFFFFF
+    return array('I', signature)
+
+
+def _band_keys(signature: array) -> List[int]:
+    return [hash(tuple(signature[band * _ROWS:(band + 1) * _ROWS])) for band in range(LSH_BANDS)]
+
+
+class CodeMatchIndex:
+    """代码题的 MinHash/LSH 索引，用于按粘贴的代码片段查找原题
+
+    签名按 LSH_BANDS 段分桶，至少一段完全相同的题目才成为候选，
+    查询只需查找固定数量的桶，不必遍历题库；候选再按签名估计的相似度排序。
+    """
+
+    def __init__(self, texts: Iterable[str], shingle_size: int = 3):
+        self.shingle_size = shingle_size
+        self.doc_ids = array('I')  # 签名行号 -> 题目编号，不含代码的题目不入索引
+        self.signatures = array('I')
+        # 每段一个 {桶键: 最后加入的行号}，同一个桶内的行通过 chains 串成链表（-1 表示结束）
+        self.buckets: List[Dict[int, int]] = [{} for _ in range(LSH_BANDS)]
+        self.chains: List[array] = [array('i') for _ in range(LSH_BANDS)]
+        for doc_id, text in enumerate(texts):
+            if not contains_code(text):
+                continue
+            signature = minhash_signature(code_shingles(text, shingle_size))
+            if signature is None:
+                continue
+            row = len(self.doc_ids)
+            self.doc_ids.append(doc_id)
+            self.signatures.extend(signature)
+            for band, key in enumerate(_band_keys(signature)):
+                self.chains[band].append(self.buckets[band].get(key, -1))
+                self.buckets[band][key] = row
+
+    def __len__(self) -> int:
+        return len(self.doc_ids)
+
+    def match(self, text: str, top_k: int = 5, min_similarity: float = 0.5,
+              max_candidates: int = 100, allowed: Optional[Container[int]] = None) -> List[Tuple[int, float]]:
+        """返回与代码片段最相似的题目 [(题目编号, 估计相似度)]，按相似度从高到低、题库顺序排列
+
+        同一个桶内的题目很多时（大量结构相同、只有数值不同的题目），只校验命中段数最多的
+        max_candidates 道题目：命中段数的期望值随相似度单调增加。
+        allowed 给出时只返回其中的题目（在校验相似度之前过滤）。
+        """
+        signature = minhash_signature(code_shingles(text, self.shingle_size))
+        if signature is None:
+            return []
+        band_hits = Counter()
+        for band, key in enumerate(_band_keys(signature)):
+            row = self.buckets[band].get(key, -1)
+            chain = self.chains[band]
+            while row >= 0:
+                band_hits[row] += 1
+                row = chain[row]
+        if allowed is not None:
+            band_hits = Counter({row: hits for row, hits in band_hits.items() if self.doc_ids[row] in allowed})
+        matches = []
+        for row, _ in band_hits.most_common(max_candidates):
+            stored = self.signatures[row * NUM_PERM:(row + 1) * NUM_PERM]
+            similarity = sum(map(operator.eq, signature, stored)) / NUM_PERM
+            if similarity >= min_similarity:
+                matches.append((self.doc_ids[row], similarity))
+        matches.sort(key=lambda item: (-item[1], item[0]))
+        return matches[:top_k]
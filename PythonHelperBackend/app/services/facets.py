@@ -0,0 +1,133 @@
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+from .question_store import QuestionRecord
+
+# 支持筛选的字段：题型、课程（course 字段）与标签（tags 字段，字符串或列表）
+FACET_FIELDS = ('question_type', 'course', 'tag')
+
+
+def _facet_values(question: QuestionRecord, field: str) -> List[str]:
+    if field == 'tag':
+        tags = question.get('tags')
+        if isinstance(tags, str):
+            tags = [tags]
+        return [str(tag) for tag in tags or () if tag not in (None, '')]
+    value = question.get(field)
+    return [] if value in (None, '') else [str(value)]
+
+
+def normalize_filters(raw) -> Dict[str, Tuple[str, ...]]:
+    """将请求中的筛选条件规范化为 {字段: (取值, ...)}
+
+    同一字段的多个取值为“或”，不同字段之间为“且”；未知字段抛出 ValueError。
+    """
+    if not raw:
+        return {}
+    if not isinstance(raw, Mapping):
+        raise ValueError('filters 必须是对象')
+    filters = {}
+    for field, values in raw.items():
+        if field not in FACET_FIELDS:
+            raise ValueError(f'不支持按 {field} 筛选，可用字段: {", ".join(FACET_FIELDS)}')
+        if isinstance(values, str):
+            values = [values]
+        if not isinstance(values, (list, tuple)) or not values:
+            raise ValueError(f'{field} 的筛选值必须是字符串或非空列表')
+        filters[field] = tuple(sorted({str(value) for value in values}))
+    return filters
+
+
+class FacetFilter:
+    """一组筛选条件对应的题目集合
+
+    mask[doc_id] 为 1 表示题目满足条件，doc_ids 为满足条件的题目编号（按题库顺序）。
+    """
+    __slots__ = ('key', 'mask', 'doc_ids')
+
+    def __init__(self, key: Tuple, mask: bytearray, doc_ids: array):
+        self.key = key
+        self.mask = mask
+        self.doc_ids = doc_ids
+
+    def __len__(self) -> int:
+        return len(self.doc_ids)
+
+    def __contains__(self, doc_id: int) -> bool:
+        return bool(self.mask[doc_id])
+
+    def apply(self, candidates: Sequence[int]) -> List[int]:
+        """保留满足条件的候选文档（保持原有顺序）"""
+        mask = self.mask
+        return [doc_id for doc_id in candidates if mask[doc_id]]
+
+
+class FacetIndex:
+    """按题型、课程与标签预先构建的位图
+
+    每个取值对应一个以 Python 整数存储的位图（第 i 位表示第 i 道题），
+    多个条件直接按位与/或合并；合并结果转换为 FacetFilter 后缓存，重复的筛选条件无需再次计算。
+    """
+
+    def __init__(self, questions: Iterable[QuestionRecord], cache_size: int = 64):
+        members: Dict[str, Dict[str, bytearray]] = {field: {} for field in FACET_FIELDS}
+        doc_count = 0
+        for doc_id, question in enumerate(questions):
+            doc_count += 1
+            for field in FACET_FIELDS:
+                for value in _facet_values(question, field):
+                    bits = members[field].setdefault(value, bytearray())
+                    if len(bits) <= doc_id >> 3:
+                        bits.extend(bytes((doc_id >> 3) + 1 - len(bits)))
+                    bits[doc_id >> 3] |= 1 << (doc_id & 7)
+        self.doc_count = doc_count
+        self.bitmaps: Dict[str, Dict[str, int]] = {
+            field: {value: int.from_bytes(bits, 'little') for value, bits in values.items()}
+            for field, values in members.items()
+        }
+        self.cache_size = cache_size
+        self._cache: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def counts(self, field: str) -> Dict[str, int]:
+        """某个字段每个取值的题目数量"""
+        return {value: bits.bit_count() for value, bits in self.bitmaps.get(field, {}).items()}
+
+    def resolve(self, filters: Dict[str, Tuple[str, ...]]) -> Optional[FacetFilter]:
+        """返回满足规范化筛选条件的题目集合，没有筛选条件时返回 None"""
+        if not filters:
+            return None
+        key = tuple(sorted(filters.items()))
+        with self._lock:
+            facet = self._cache.get(key)
+            if facet is not None:
+                self._cache.move_to_end(key)
+                return facet
+        bits = (1 << self.doc_count) - 1
+        for field, values in filters.items():
+            field_bitmaps = self.bitmaps[field]
+            union = 0
+            for value in values:
+                union |= field_bitmaps.get(value, 0)
+            bits &= union
+        facet = self._materialize(key, bits)
+        with self._lock:
+            self._cache[key] = facet
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return facet
+
+    def _materialize(self, key: Tuple, bits: int) -> FacetFilter:
+        mask = bytearray(self.doc_count)
+        doc_ids = array('I')
+        data = bits.to_bytes((self.doc_count + 7) // 8, 'little')
+        for byte_index, byte in enumerate(data):
+            if byte:
+                base = byte_index << 3
+                for bit in range(8):
+                    if byte >> bit & 1:
+                        doc_ids.append(base + bit)
+                        mask[base + bit] = 1
+        return FacetFilter(key, mask, doc_ids)
@@ -0,0 +1,161 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+from urllib.parse import quote
+
+from .question_store import QuestionRecord
+from .search_index import tokenize, trigrams
+
+logger = logging.getLogger(__name__)
+
+# 表结构或分词规则变化时递增，旧文件随之失效
+FTS_FORMAT_VERSION = 1
+
+# FTS5 的 unicode61 分词器只按空白切分预先分好的检索词；下划线保留在词内，与 tokenize 一致
+_TOKENIZER = "unicode61 remove_diacritics 0 tokenchars '_'"
+# 容错搜索时每个查询最多使用的三元组数
+_MAX_TRIGRAMS = 64
+
+_SCHEMA = f"""
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE questions (doc_id INTEGER PRIMARY KEY, record TEXT NOT NULL);
+CREATE VIRTUAL TABLE question_fts USING fts5(tokens, content='', tokenize="{_TOKENIZER}");
+CREATE VIRTUAL TABLE question_trigram USING fts5(text, content='', tokenize='trigram');
+CREATE VIRTUAL TABLE question_vocab USING fts5vocab(question_fts, 'row');
+"""
+
+
+def _quote(term: str) -> str:
+    return '"' + term.replace('"', '""') + '"'
+
+
+def _match_expression(terms: Iterable[str]) -> str:
+    """多个检索词按“或”组成 MATCH 表达式，每个词加引号避免被当作 FTS5 语法"""
+    return ' OR '.join(_quote(term) for term in terms)
+
+
+class FtsQuestionStore:
+    """保存在 SQLite FTS5 中的题库（database.json 旁边的独立文件）
+
+    题目按 database.json 的顺序写入 questions 表，doc_id 即题目在题库中的位置；
+    检索词用 tokenize 预先切分（中文二元组与一元词），FTS5 只按空白切分，
+    中文检索效果与内存索引一致。打分（bm25）与排序都在 SQLite 中完成，
+    多个工作进程以只读方式打开同一文件，通过操作系统页缓存共享索引，启动时无需各自建索引。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self.doc_count = int(self._meta('question_count') or 0)
+
+    def __len__(self) -> int:
+        return self.doc_count
+
+    @classmethod
+    def open(cls, path: Optional[str], source_signature: Optional[Tuple[int, int]]) -> Optional['FtsQuestionStore']:
+        """打开与题库文件一致的 FTS5 题库，文件不存在、格式过期或题库已修改时返回 None"""
+        if not path or not os.path.exists(path):
+            return None
+        try:
+            store = cls(path)
+            if store._meta('format_version') != str(FTS_FORMAT_VERSION):
+                logger.info(f"FTS5 题库格式已过期: {path}")
+                return None
+            if source_signature is not None and store._meta('source_signature') != json.dumps(list(source_signature)):
+                logger.info(f"FTS5 题库与当前题库文件不一致，需要重新导入: {path}")
+                return None
+        except sqlite3.Error as e:
+            logger.error(f"打开 FTS5 题库失败: {e}")
+            return None
+        return store
+
+    @classmethod
+    def build(cls, path: str, questions: Sequence[QuestionRecord],
+              source_signature: Optional[Tuple[int, int]]) -> 'FtsQuestionStore':
+        """将题目导入新的 FTS5 题库文件
+
+        先写入临时文件再原子替换：多个工作进程同时导入时互不影响，正在读取旧文件的连接也不受影响。
+        """
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        connection = sqlite3.connect(tmp_path)
+        try:
+            connection.executescript(_SCHEMA)
+            with connection:
+                for doc_id, question in enumerate(questions):
+                    text = question.get('question', '')
+                    connection.execute('INSERT INTO questions (doc_id, record) VALUES (?, ?)',
+                                       (doc_id, json.dumps(question.to_dict(), ensure_ascii=False)))
+                    lowered = text.lower()
+                    connection.execute('INSERT INTO question_fts (rowid, tokens) VALUES (?, ?)',
+                                       (doc_id, ' '.join(tokenize(lowered, with_unigrams=True))))
+                    connection.execute('INSERT INTO question_trigram (rowid, text) VALUES (?, ?)',
+                                       (doc_id, ' '.join(lowered.split())))
+                connection.executemany('INSERT INTO meta (key, value) VALUES (?, ?)', [
+                    ('format_version', str(FTS_FORMAT_VERSION)),
+                    ('source_signature', json.dumps(list(source_signature)) if source_signature else 'null'),
+                    ('question_count', str(len(questions))),
+                ])
+            connection.execute("INSERT INTO question_fts (question_fts) VALUES ('optimize')")
+            connection.execute("INSERT INTO question_trigram (question_trigram) VALUES ('optimize')")
+            connection.commit()
+        finally:
+            connection.close()
+        os.replace(tmp_path, path)
+        logger.info(f"已将 {len(questions)} 道题目导入 FTS5 题库 {path}")
+        return cls(path)
+
+    def _connection(self) -> sqlite3.Connection:
+        """每个线程一个只读连接"""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(f"file:{quote(os.path.abspath(self.path))}?mode=ro", uri=True)
+            self._local.connection = connection
+        return connection
+
+    def _meta(self, key: str) -> Optional[str]:
+        row = self._connection().execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def load_questions(self) -> List[Dict]:
+        """按题库顺序读出全部题目"""
+        rows = self._connection().execute('SELECT record FROM questions ORDER BY doc_id')
+        return [json.loads(record) for record, in rows]
+
+    def term_counts(self) -> Iterable[Tuple[str, int]]:
+        """全部检索词及包含它的题目数"""
+        return self._connection().execute('SELECT term, doc FROM question_vocab')
+
+    def search(self, query_tokens: Sequence[str], top_k: int,
+               allowed=None) -> List[Tuple[int, float]]:
+        """按 BM25 返回前 top_k 道题目 [(题目编号, 得分)]，得分越高越相关
+
+        allowed 给出时只保留其中的题目：SQLite 按得分顺序返回，取够 top_k 道即停止读取。
+        """
+        if not query_tokens:
+            return []
+        return self._ranked('SELECT rowid, -bm25(question_fts) FROM question_fts WHERE question_fts MATCH ? '
+                            'ORDER BY rank, rowid', _match_expression(query_tokens), top_k, allowed)
+
+    def similar(self, text: str, top_k: int, allowed=None) -> List[Tuple[int, float]]:
+        """按字符三元组重合度返回最相似的题目，用于查询有错别字、没有任何检索词命中的情况"""
+        grams = sorted(trigrams(text))[:_MAX_TRIGRAMS]
+        if not grams:
+            return []
+        return self._ranked('SELECT rowid, -bm25(question_trigram) FROM question_trigram WHERE question_trigram MATCH ? '
+                            'ORDER BY rank, rowid', _match_expression(grams), top_k, allowed)
+
+    def _ranked(self, sql: str, expression: str, top_k: int, allowed) -> List[Tuple[int, float]]:
+        if allowed is None:
+            return self._connection().execute(f'{sql} LIMIT ?', (expression, top_k)).fetchall()
+        matches = []
+        for doc_id, score in self._connection().execute(sql, (expression,)):
+            if doc_id in allowed:
+                matches.append((doc_id, score))
+                if len(matches) >= top_k:
+                    break
+        return matches
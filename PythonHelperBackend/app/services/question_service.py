@@ -1,38 +1,394 @@
+import base64
 import json
 import os
 import logging
-from typing import Dict, List
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
 from flask import current_app
+from .search_index import InvertedIndex, TrigramIndex
+from .search_cache import SearchResultCache
+from .code_matching import CodeMatchIndex
+from .autocomplete import PrefixIndex, build_prefix_index
+from .fts_store import FtsQuestionStore
+from .facets import FacetFilter, FacetIndex, normalize_filters
+from .related_questions import build_related_graph, load_related_graph, write_related_graph
+from .bank_snapshot import load_snapshot, write_snapshot
+from .question_shards import ParallelShardPool, ShardSet, build_shards
+from .question_store import DisplayRecord, QuestionRecord, build_question_records
+from .scorers import (LegacyScorer, QuestionScorer, SearchQuery, TopKCollector, create_scorer, legacy_score)
 
 logger = logging.getLogger(__name__)
 
 
+class StaleCursorError(ValueError):
+    """分页游标属于已被替换的旧题库"""
+
+
+class QuestionBank:
+    """题库快照：题目记录、显示记录、倒排索引、三元组索引、代码匹配索引、TF-IDF 矩阵、前缀提示索引与评分器
+
+    快照构建完成后不再修改。重新加载题库时会构建新快照并整体替换，
+    正在进行的搜索继续读取开始时拿到的旧快照。
+    使用 SQLite 存储时（fts_store 不为 None）不构建内存索引，search_index 与 scorer 为 None。
+    """
+
+    def __init__(self, version: int, questions: List[QuestionRecord], formatted: List[DisplayRecord],
+                 search_index: Optional[InvertedIndex], scorer: Optional[QuestionScorer], shards: ShardSet,
+                 trigram_index: Optional[TrigramIndex] = None, code_index: Optional[CodeMatchIndex] = None,
+                 vector_index=None, prefix_index: Optional[PrefixIndex] = None, source_path: Optional[str] = None,
+                 source_signature: Optional[Tuple[int, int]] = None,
+                 fts_store: Optional[FtsQuestionStore] = None):
+        self.version = version
+        self.questions = questions
+        self.formatted = formatted
+        self.search_index = search_index
+        self.scorer = scorer
+        self.fallback_scorer = LegacyScorer(search_index) if search_index is not None else None
+        self.shards = shards
+        self.trigram_index = trigram_index
+        self.code_index = code_index
+        self.vector_index = vector_index
+        self.prefix_index = prefix_index
+        self.fts_store = fts_store
+        # 题目编号（如“单选题_1”）-> 题库中的位置，编号重复时以第一道为准
+        self.id_index: Dict[str, int] = {}
+        for doc_id, record in enumerate(formatted):
+            self.id_index.setdefault(record.id, doc_id)
+        # 离线计算的相关题目图 {位置: [(相关题目位置, 相似度)]}
+        self.related: Optional[Dict[int, List[Tuple[int, float]]]] = None
+        # 题型、分类、难度统计，在快照构建时计算一次，/questions/stats 与 /health 直接读取
+        self.stats = self._count_stats()
+        # 按题型、课程与标签筛选用的位图
+        self.facets = FacetIndex(questions)
+        self.source_path = source_path
+        self.source_signature = source_signature
+        self.loaded_at = time.time()
+        # 题库内容标识：由题库文件的修改时间与大小生成，多个工作进程加载同一文件时一致
+        if source_signature:
+            self.etag = f"{source_signature[0]:x}-{source_signature[1]:x}"
+        else:
+            self.etag = f"default-{version}"
+
+    def _count_stats(self) -> Dict[str, Dict[str, int]]:
+        stats = {'question_types': {}, 'categories': {}, 'difficulties': {}}
+        for question, formatted in zip(self.questions, self.formatted):
+            q_type = question.get('question_type', '未知')
+            stats['question_types'][q_type] = stats['question_types'].get(q_type, 0) + 1
+            category = formatted.get('category', '未知')
+            difficulty = formatted.get('difficulty', '未知')
+            stats['categories'][category] = stats['categories'].get(category, 0) + 1
+            stats['difficulties'][difficulty] = stats['difficulties'].get(difficulty, 0) + 1
+        return stats
+
+
 class QuestionService:
     def __init__(self):
-        self.questions_db = []
+        # 保存配置引用，后台重新加载线程中没有应用上下文
+        self.config = current_app.config
+        self.search_cache = SearchResultCache(
+            max_size=self.config.get('SEARCH_CACHE_SIZE', 1024),
+            ttl=self.config.get('SEARCH_CACHE_TTL', 300)
+        )
+        self.bank: Optional[QuestionBank] = None
+        self._bank_version = 0
+        self._reload_lock = threading.Lock()
+        self._watcher: Optional[threading.Thread] = None
+        self.shard_pool = self._create_shard_pool()
         self.load_questions_db()
 
+    @property
+    def questions_db(self) -> List[QuestionRecord]:
+        return self.bank.questions
+
+    @property
+    def formatted_questions(self) -> List[DisplayRecord]:
+        return self.bank.formatted
+
+    @property
+    def search_index(self) -> InvertedIndex:
+        return self.bank.search_index
+
+    @property
+    def scorer(self) -> QuestionScorer:
+        return self.bank.scorer
+
+    @property
+    def bank_version(self) -> int:
+        return self.bank.version
+
     def load_questions_db(self):
-        """加载题库数据库"""
+        """加载题库数据库：优先使用未过期的二进制快照，失败时使用默认数据"""
+        with self._reload_lock:
+            source_path = self._resolve_source_path()
+            signature = self._source_signature(source_path)
+            bank = self._load_fts_bank(source_path, signature)
+            if bank is None:
+                bank = self._load_snapshot_bank(source_path, signature)
+            if bank is None:
+                try:
+                    questions = self._read_questions(source_path)
+                except Exception as e:
+                    logger.error(f"加载题库失败: {e}")
+                    questions = build_question_records(self.get_default_questions())
+                bank = self._build_bank(questions, source_path, signature)
+            self._swap_bank(bank)
+
+    def reload_questions_db(self) -> bool:
+        """重新加载题库：在当前线程解析并建索引，完成后原子替换快照
+
+        解析失败时保留旧题库，返回 False。
+        """
+        with self._reload_lock:
+            source_path = self._resolve_source_path()
+            signature = self._source_signature(source_path)
+            try:
+                bank = self._load_fts_bank(source_path, signature) or self._load_snapshot_bank(source_path, signature)
+                if bank is None:
+                    bank = self._build_bank(self._read_questions(source_path), source_path, signature)
+            except Exception as e:
+                logger.error(f"重新加载题库失败，继续使用版本 {self.bank.version}: {e}")
+                return False
+            self._swap_bank(bank)
+            return True
+
+    def reload_in_background(self) -> threading.Thread:
+        """在后台线程中重新加载题库"""
+        thread = threading.Thread(target=self.reload_questions_db, name='question-bank-reload', daemon=True)
+        thread.start()
+        return thread
+
+    def start_reload_watcher(self, interval: float) -> None:
+        """启动后台线程轮询题库文件的修改时间，文件变化时自动重新加载"""
+        if interval <= 0 or self._watcher is not None:
+            return
+
+        def watch():
+            failed_source = None  # 加载失败的文件版本不重复尝试，等待文件再次变化
+            while True:
+                time.sleep(interval)
+                try:
+                    source_path = self._resolve_source_path()
+                    source = (source_path, self._source_signature(source_path))
+                    bank = self.bank
+                    if source != (bank.source_path, bank.source_signature) and source != failed_source:
+                        logger.info(f"检测到题库文件变化: {source_path}")
+                        failed_source = None if self.reload_questions_db() else source
+                except Exception as e:
+                    logger.error(f"题库文件监控出错: {e}")
+
+        self._watcher = threading.Thread(target=watch, name='question-bank-watcher', daemon=True)
+        self._watcher.start()
+        logger.info(f"题库热加载已启用，轮询间隔 {interval} 秒")
+
+    def _resolve_source_path(self) -> Optional[str]:
+        """返回当前应加载的题库文件路径，均不存在时返回 None"""
+        for key in ('QUESTIONS_DB_PATH_NEW', 'QUESTIONS_DB_PATH_OLD'):
+            path = self.config.get(key)
+            if path and os.path.exists(path):
+                return path
+        return None
+
+    @staticmethod
+    def _source_signature(path: Optional[str]) -> Optional[Tuple[int, int]]:
         try:
-            database_path = current_app.config['QUESTIONS_DB_PATH_NEW']
-            if os.path.exists(database_path):
-                with open(database_path, 'r', encoding='utf-8') as f:
-                    self.questions_db = json.load(f)
-                    logger.info(f"已从 {database_path} 加载 {len(self.questions_db)} 道题目")
+            stat = os.stat(path) if path else None
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size) if stat else None
+
+    def _read_questions(self, source_path: Optional[str]) -> List[QuestionRecord]:
+        """读取题库文件并转换为紧凑记录"""
+        if source_path is None:
+            logger.warning("题库文件不存在，使用默认数据")
+            return build_question_records(self.get_default_questions())
+        with open(source_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if source_path == self.config.get('QUESTIONS_DB_PATH_NEW'):
+            questions = build_question_records(data)
+        else:
+            questions = build_question_records(data.get('questions', []))
+        logger.info(f"已从 {source_path} 加载 {len(questions)} 道题目")
+        return questions
+
+    def _scorer_config(self) -> Tuple[str, Dict]:
+        """返回配置中的评分器名称与参数"""
+        scorer_name = self.config.get('QUESTION_SEARCH_SCORER', 'legacy').lower()
+        scorer_params = {}
+        if scorer_name == 'bm25':
+            scorer_params = {'k1': self.config.get('BM25_K1', 1.2), 'b': self.config.get('BM25_B', 0.75)}
+        return scorer_name, scorer_params
+
+    def _scorer_key(self) -> Tuple:
+        scorer_name, scorer_params = self._scorer_config()
+        return (scorer_name, *sorted(scorer_params.items()))
+
+    def _load_fts_bank(self, source_path: Optional[str],
+                       signature: Optional[Tuple[int, int]]) -> Optional[QuestionBank]:
+        """QUESTION_STORAGE_BACKEND 为 sqlite 时从 FTS5 题库加载，题库文件已修改时先重新导入
+
+        未启用、题库文件不存在、SQLite 不支持 FTS5 或导入失败（如题库文件格式错误）时返回 None，
+        由调用方按内存索引的方式加载（首次加载失败时使用默认数据，重新加载失败时保留旧题库）。
+        """
+        if self.config.get('QUESTION_STORAGE_BACKEND', 'memory') != 'sqlite' or source_path is None:
+            return None
+        path = self.config.get('QUESTIONS_FTS_PATH') or f"{os.path.splitext(source_path)[0]}.fts.db"
+        try:
+            store = FtsQuestionStore.open(path, signature)
+            if store is None:
+                questions = self._read_questions(source_path)
+                store = FtsQuestionStore.build(path, questions, signature)
             else:
-                questions_path = current_app.config['QUESTIONS_DB_PATH_OLD']
-                if os.path.exists(questions_path):
-                    with open(questions_path, 'r', encoding='utf-8') as f:
-                        data = json.load(f)
-                        self.questions_db = data.get('questions', [])
-                        logger.info(f"已从 {questions_path} 加载 {len(self.questions_db)} 道题目")
-                else:
-                    logger.warning("题库文件不存在，使用默认数据")
-                    self.questions_db = self.get_default_questions()
+                questions = build_question_records(store.load_questions())
+                logger.info(f"已从 FTS5 题库 {path} 加载 {len(questions)} 道题目")
+        except Exception as e:
+            logger.error(f"FTS5 题库不可用，改用内存索引: {e}")
+            return None
+        return self._build_bank(questions, source_path, signature, fts_store=store)
+
+    def _load_snapshot_bank(self, source_path: Optional[str],
+                            signature: Optional[Tuple[int, int]]) -> Optional[QuestionBank]:
+        """从与题库文件一致的二进制快照恢复题库，没有可用快照时返回 None"""
+        payload = load_snapshot(self.config.get('QUESTIONS_SNAPSHOT_PATH'), signature, self._scorer_key())
+        if payload is None:
+            return None
+        return self._build_bank(payload['questions'], source_path, signature, formatted=payload['formatted'],
+                                search_index=payload['search_index'], scorer=payload['scorer'],
+                                trigram_index=payload['trigram_index'], code_index=payload['code_index'],
+                                prefix_index=payload['prefix_index'])
+
+    def write_snapshot(self, path: Optional[str] = None) -> str:
+        """将当前题库（含预先构建的索引）写入二进制快照，返回快照路径"""
+        path = path or self.config.get('QUESTIONS_SNAPSHOT_PATH')
+        bank = self.bank
+        payload = {'questions': bank.questions, 'formatted': bank.formatted,
+                   'search_index': bank.search_index, 'scorer': bank.scorer, 'trigram_index': bank.trigram_index,
+                   'code_index': bank.code_index, 'prefix_index': bank.prefix_index}
+        write_snapshot(path, payload, bank.source_signature, self._scorer_key())
+        logger.info(f"题库快照已写入 {path}，共 {len(bank.questions)} 道题目")
+        return path
+
+    def write_related_graph(self, path: Optional[str] = None, top_k: int = 10) -> str:
+        """离线计算当前题库的相关题目图（k 近邻）并写入文件，返回文件路径"""
+        path = path or self.config.get('RELATED_QUESTIONS_PATH')
+        bank = self.bank
+        matrix = bank.vector_index
+        if matrix is None:
+            from .vector_search import TfidfMatrix
+            search_index = bank.search_index
+            if search_index is None:
+                search_index = InvertedIndex(q.get('question', '') for q in bank.questions)
+            matrix = TfidfMatrix(search_index)
+        graph = build_related_graph(matrix, [record.id for record in bank.formatted], top_k)
+        write_related_graph(path, graph, bank.source_signature, top_k)
+        logger.info(f"相关题目图已写入 {path}，共 {len(graph)} 道题目")
+        return path
+
+    def _build_bank(self, questions: List[QuestionRecord], source_path: Optional[str] = None,
+                    source_signature: Optional[Tuple[int, int]] = None,
+                    formatted: Optional[List[DisplayRecord]] = None, search_index: Optional[InvertedIndex] = None,
+                    scorer: Optional[QuestionScorer] = None,
+                    trigram_index: Optional[TrigramIndex] = None,
+                    code_index: Optional[CodeMatchIndex] = None,
+                    prefix_index: Optional[PrefixIndex] = None,
+                    fts_store: Optional[FtsQuestionStore] = None) -> QuestionBank:
+        """为题目构建显示记录、倒排索引并按配置创建评分器；已从快照恢复的部分直接复用
+
+        题库保存在 FTS5 中时检索由 SQLite 完成，只构建显示记录与筛选、提示等轻量结构。
+        """
+        if formatted is None:
+            formatted = [self.build_display_record(q) for q in questions]
+        if fts_store is not None:
+            return self._build_fts_bank(questions, formatted, fts_store, source_path, source_signature)
+        if search_index is None:
+            search_index = InvertedIndex(q.get('question', '') for q in questions)
+        if scorer is None:
+            scorer_name, scorer_params = self._scorer_config()
+            scorer = create_scorer(scorer_name, search_index, **scorer_params)
+        if not self.config.get('QUESTION_TRIGRAM_INDEX', False):
+            trigram_index = None
+        elif trigram_index is None:
+            trigram_index = TrigramIndex(search_index.texts)
+        if not self.config.get('QUESTION_CODE_INDEX', False):
+            code_index = None
+        elif code_index is None:
+            # 代码区分大小写，使用原始题目文本
+            code_index = CodeMatchIndex(q.get('question', '') for q in questions)
+        if not self.config.get('QUESTION_AUTOCOMPLETE', False):
+            prefix_index = None
+        elif prefix_index is None:
+            prefix_index = build_prefix_index(formatted,
+                                              ((term, len(postings)) for term, postings in search_index.postings.items()),
+                                              self.config.get('AUTOCOMPLETE_MAX_SUGGESTIONS', 10))
+        vector_index = self._build_vector_index(search_index)
+        shards = build_shards(questions, self.config.get('QUESTION_SHARD_BY', 'hash'),
+                              self.config.get('QUESTION_SHARD_COUNT', 1))
+        logger.info(f"题库倒排索引构建完成，共 {len(search_index.postings)} 个检索词，评分器: {scorer.name}，"
+                    f"分片: {len(shards)}")
+        self._bank_version += 1
+        bank = QuestionBank(self._bank_version, questions, formatted, search_index, scorer, shards,
+                            trigram_index, code_index, vector_index, prefix_index, source_path, source_signature)
+        bank.related = load_related_graph(self.config.get('RELATED_QUESTIONS_PATH'), bank.id_index, source_signature)
+        return bank
+
+    def _build_fts_bank(self, questions: List[QuestionRecord], formatted: List[DisplayRecord],
+                        fts_store: FtsQuestionStore, source_path: Optional[str],
+                        source_signature: Optional[Tuple[int, int]]) -> QuestionBank:
+        prefix_index = None
+        if self.config.get('QUESTION_AUTOCOMPLETE', False):
+            prefix_index = build_prefix_index(formatted, fts_store.term_counts(),
+                                              self.config.get('AUTOCOMPLETE_MAX_SUGGESTIONS', 10))
+        shards = build_shards(questions, 'hash', 1)
+        logger.info(f"题库使用 FTS5 检索: {fts_store.path}")
+        self._bank_version += 1
+        bank = QuestionBank(self._bank_version, questions, formatted, None, None, shards,
+                            prefix_index=prefix_index, source_path=source_path,
+                            source_signature=source_signature, fts_store=fts_store)
+        bank.related = load_related_graph(self.config.get('RELATED_QUESTIONS_PATH'), bank.id_index, source_signature)
+        return bank
+
+    def _build_vector_index(self, search_index: InvertedIndex):
+        """按配置构建 TF-IDF 矩阵；矩阵由倒排索引直接生成，不写入快照
+
+        NumPy 是可选依赖，未安装时向量搜索退回普通搜索。
+        """
+        if not self.config.get('QUESTION_VECTOR_SEARCH', False):
+            return None
+        try:
+            from .vector_search import TfidfMatrix
+        except ImportError:
+            logger.warning("未安装 NumPy，向量搜索不可用")
+            return None
+        return TfidfMatrix(search_index)
+
+    def _create_shard_pool(self) -> Optional[ParallelShardPool]:
+        """创建分片搜索进程池；需在启动任何后台线程之前调用（子进程此时一次性 fork）"""
+        processes = self.config.get('QUESTION_SEARCH_PROCESSES', 0)
+        if processes <= 0 or not ParallelShardPool.available():
+            return None
+        try:
+            return ParallelShardPool(processes)
         except Exception as e:
-            logger.error(f"加载题库失败: {e}")
-            self.questions_db = self.get_default_questions()
+            logger.error(f"创建分片搜索进程池失败，改为单进程搜索: {e}")
+            return None
+
+    def _swap_bank(self, bank: QuestionBank) -> None:
+        if self.shard_pool is not None and not self.shard_pool.broken and bank.fts_store is None:
+            try:
+                self.shard_pool.load(bank)
+                bank.shards.pool = self.shard_pool
+            except Exception as e:
+                logger.error(f"分片搜索进程加载题库失败，之后改为单进程搜索: {e}")
+        # 单次引用赋值即完成替换；旧快照在最后一个使用它的搜索结束后被回收
+        old_bank, self.bank = self.bank, bank
+        if old_bank is not None:
+            old_bank.shards.close()
+        self.search_cache.clear()
+        logger.info(f"题库已切换到版本 {bank.version}，共 {len(bank.questions)} 道题目")
+
+    def build_display_record(self, question: QuestionRecord) -> DisplayRecord:
+        """生成只读的前端显示记录，题库加载时为每道题构建一次"""
+        return DisplayRecord(question, self.format_question_for_display(question))
 
     def get_default_questions(self) -> List[Dict]:
         """获取默认题库数据"""
@@ -44,56 +400,304 @@ class QuestionService:
             }
         ]
 
-    def search_questions(self, query: str) -> List[Dict]:
-        """搜索题库 - 只对题目文本进行搜索"""
+    def search_questions(self, query: str, top_k: int = 5, filters: Optional[Dict] = None) -> List[Dict]:
+        """搜索题库 - 只对题目文本进行搜索
+
+        Args:
+            query: 搜索关键词
+            top_k: 最多返回的命中数量
+            filters: 筛选条件，如 {"question_type": ["判断题"], "course": "Python"}，条件不合法时抛出 ValueError
+        """
         if not query or len(query.strip()) < 1:
             return []
 
-        query = query.strip()
-        results = []
-        all_questions_with_scores = []
-        query_lower = query.lower()
+        # 整个搜索过程只读取这一份快照，不受并发的重新加载影响
+        bank = self.bank
+        facet = self._resolve_facet(bank, filters)
+        search_query = SearchQuery(query)
+        cache_key = self._cache_key(bank, facet, search_query.text, top_k)
+        results = self.search_cache.get(cache_key)
+        if results is None:
+            results = self._search(bank, search_query, top_k, facet)
+            self.search_cache.put(cache_key, results)
+        return results
+
+    @staticmethod
+    def _resolve_facet(bank: QuestionBank, filters: Optional[Dict]) -> Optional[FacetFilter]:
+        """将筛选条件转换为满足条件的题目集合，没有条件时返回 None"""
+        return bank.facets.resolve(normalize_filters(filters))
+
+    @staticmethod
+    def _cache_key(bank: QuestionBank, facet: Optional[FacetFilter], *parts) -> Tuple:
+        return (bank.version, *parts) if facet is None else (bank.version, *parts, facet.key)
+
+    def match_code(self, snippet: str, top_k: int = 5, filters: Optional[Dict] = None) -> List[Dict]:
+        """按粘贴的代码片段查找原题
+
+        忽略空白、缩进与变量名的差异，按 MinHash 估计的相似度排序；
+        未启用代码索引或没有足够相似的题目时改为普通文本搜索。
+        """
+        if not snippet or not snippet.strip():
+            return []
+        bank = self.bank
+        facet = self._resolve_facet(bank, filters)
+        cache_key = self._cache_key(bank, facet, 'code', snippet, top_k)
+        results = self.search_cache.get(cache_key)
+        if results is None:
+            matches = bank.code_index.match(
+                snippet, top_k, self.config.get('QUESTION_CODE_MIN_SIMILARITY', 0.5), allowed=facet
+            ) if bank.code_index is not None else []
+            if matches:
+                results = [{**self._make_hit(bank, doc_id, similarity, similarity), 'match_mode': 'code'}
+                           for doc_id, similarity in matches]
+            else:
+                results = self._search(bank, SearchQuery(snippet), top_k, facet)
+            self.search_cache.put(cache_key, results)
+        return results
+
+    def page_questions(self, cursor: Optional[str] = None, limit: Optional[int] = None,
+                       filters: Optional[Dict] = None) -> Tuple[QuestionBank, List[DisplayRecord], Optional[str]]:
+        """按游标分页读取显示记录，返回 (题库快照, 本页记录, 下一页游标)
 
-        for question in self.questions_db:
-            score = 0
-            question_content = question.get('question', '')
-            question_content_lower = question_content.lower()
+        游标中记录了题库标识，题库重新加载后旧游标失效（StaleCursorError），客户端需从头同步；
+        limit 为 None 时返回游标之后的全部记录。有筛选条件时在满足条件的题目中分页。
+        """
+        bank = self.bank
+        facet = self._resolve_facet(bank, filters)
+        total = len(bank.formatted) if facet is None else len(facet)
+        offset = 0
+        if cursor:
+            try:
+                etag, offset_text = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8').rsplit(':', 1)
+                offset = int(offset_text)
+            except (ValueError, UnicodeError) as e:
+                raise ValueError('cursor 无效') from e
+            if etag != bank.etag:
+                raise StaleCursorError('题库已更新，请从头同步')
+            if offset < 0:
+                raise ValueError('cursor 无效')
+        end = total if limit is None else min(total, offset + limit)
+        next_cursor = None
+        if end < total:
+            next_cursor = base64.urlsafe_b64encode(f"{bank.etag}:{end}".encode('utf-8')).decode('ascii')
+        if facet is None:
+            return bank, bank.formatted[offset:end], next_cursor
+        return bank, [bank.formatted[doc_id] for doc_id in facet.doc_ids[offset:end]], next_cursor
 
-            if query_lower in question_content_lower:
-                score += 10
+    def related_questions(self, question_id: str, limit: int = 5) -> Optional[List[Dict]]:
+        """返回离线计算好的相关题目，题目编号不存在时返回 None
 
-            query_words = query_lower.split()
-            for word in query_words:
-                if len(word) >= 2 and word in question_content_lower:
-                    score += 3
+        请求时只做查表，不再评分；尚未生成相关题目图时返回空列表。
+        """
+        bank = self.bank
+        doc_id = bank.id_index.get(question_id)
+        if doc_id is None:
+            return None
+        neighbors = bank.related.get(doc_id, ()) if bank.related else ()
+        return [{**bank.formatted[other], 'similarity': similarity} for other, similarity in neighbors[:limit]]
 
-            # (此处的关键词匹配和评分逻辑保持不变)
-            special_keywords = ['if', 'else', 'def', 'class', 'list', 'dict', 'for', 'while']  # 简化示例
-            for keyword in special_keywords:
-                if keyword.lower() in query_lower and keyword.lower() in question_content_lower:
-                    score += 2
+    def autocomplete(self, prefix: str, limit: Optional[int] = None) -> List[Dict]:
+        """输入框前缀提示：返回以 prefix 开头的关键词与题目，未启用前缀提示索引时返回空列表"""
+        prefix_index = self.bank.prefix_index
+        if prefix_index is None:
+            return []
+        return prefix_index.suggest(prefix, limit)
+
+    def vector_search(self, query: str, top_k: int = 5, filters: Optional[Dict] = None) -> List[Dict]:
+        """按 TF-IDF 余弦相似度搜索题库
 
-            char_match_score = sum(0.1 for char in query_lower if char in question_content_lower)
-            word_frequency_score = sum(
-                question_content_lower.count(word) * 0.5 for word in query_words if len(word) >= 2)
+        整个题库的打分是一次稀疏矩阵-向量乘法；未启用向量搜索或没有任何相似题目时改为普通搜索。
+        """
+        return self.vector_search_batch([query], top_k, filters)[0]
 
-            total_score = score + char_match_score + word_frequency_score
-            formatted_question = self.format_question_for_display(question)
+    def vector_search_batch(self, queries: List[str], top_k: int = 5,
+                            filters: Optional[Dict] = None) -> List[List[Dict]]:
+        """批量向量搜索，未缓存的查询合并为一次稀疏矩阵-矩阵乘法，按输入顺序返回结果"""
+        bank = self.bank
+        if bank.vector_index is None:
+            return self.search_questions_batch(queries, top_k, filters)
+        from .vector_search import top_k_scores
+        facet = self._resolve_facet(bank, filters)
+        allowed = None
+        if facet is not None:
+            import numpy as np
+            allowed = np.frombuffer(facet.mask, dtype=np.uint8)
 
-            all_questions_with_scores.append({**formatted_question, 'score': total_score, 'original_score': score})
+        results: List[List[Dict]] = [[] for _ in queries]
+        pending: Dict[str, List[int]] = {}
+        for position, query in enumerate(queries):
+            if not isinstance(query, str) or not query.strip():
+                continue
+            text = SearchQuery(query).text
+            cached = self.search_cache.get(self._cache_key(bank, facet, 'vector', text, top_k))
+            if cached is not None:
+                results[position] = cached
+            else:
+                pending.setdefault(text, []).append(position)
+
+        texts = list(pending)
+        for begin, block in bank.vector_index.scores_batch(texts):
+            for offset, scores in enumerate(block):
+                text = texts[begin + offset]
+                if allowed is not None:
+                    # 不满足筛选条件的题目得分置 0，不会进入前 k 名
+                    scores *= allowed
+                matches = top_k_scores(scores, top_k)
+                if matches:
+                    query_results = [{**self._make_hit(bank, doc_id, score, score), 'match_mode': 'vector'}
+                                     for doc_id, score in matches]
+                else:
+                    query_results = self._search(bank, SearchQuery(text), top_k, facet)
+                self.search_cache.put(self._cache_key(bank, facet, 'vector', text, top_k), query_results)
+                for position in pending[text]:
+                    results[position] = query_results
+        return results
 
-            if score > 0:
-                results.append({**formatted_question, 'score': total_score, 'original_score': score})
+    def search_questions_batch(self, queries: List[str], top_k: int = 5,
+                               filters: Optional[Dict] = None) -> List[List[Dict]]:
+        """批量搜索题库，按输入顺序返回每个查询的结果
 
-        if results:
-            return sorted(results, key=lambda x: x['score'], reverse=True)[:5]
+        相同的查询只计算一次；各查询共享一次倒排表遍历，每个检索词的倒排表只读取一次。
+        没有任何候选的查询合并为一次全库扫描，每道题目只访问一次。筛选条件对所有查询生效。
+        """
+        bank = self.bank
+        if bank.fts_store is not None:
+            # 检索在 SQLite 中完成，逐个查询即可
+            return [self.search_questions(query, top_k, filters) if isinstance(query, str) else []
+                    for query in queries]
+        facet = self._resolve_facet(bank, filters)
+        results: List[List[Dict]] = [[] for _ in queries]
+        pending: Dict[str, Tuple[SearchQuery, List[int]]] = {}
+        for position, query in enumerate(queries):
+            if not isinstance(query, str) or not query.strip():
+                continue
+            search_query = SearchQuery(query)
+            cached = self.search_cache.get(self._cache_key(bank, facet, search_query.text, top_k))
+            if cached is not None:
+                results[position] = cached
+            else:
+                pending.setdefault(search_query.text, (search_query, []))[1].append(position)
+
+        candidate_sets: Dict[str, set] = {text: set() for text in pending}
+        if isinstance(bank.scorer, LegacyScorer):
+            # 原有规则按子串匹配，候选由评分器给出
+            for text, (search_query, _) in pending.items():
+                candidate_sets[text].update(bank.scorer.candidates(search_query, bank.trigram_index))
         else:
-            all_sorted = sorted(all_questions_with_scores, key=lambda x: x['score'], reverse=True)
-            if all_sorted:
-                best_match = all_sorted[0]
-                best_match['is_fallback'] = True
-                return [best_match]
+            # 共享的倒排表遍历：检索词 -> 包含该词的查询
+            token_queries: Dict[str, List[str]] = {}
+            for text, (search_query, _) in pending.items():
+                for token in search_query.tokens:
+                    token_queries.setdefault(token, []).append(text)
+            for token, texts in token_queries.items():
+                doc_ids = bank.search_index.postings.get(token)
+                if doc_ids:
+                    for text in texts:
+                        candidate_sets[text].update(doc_ids)
+
+        ranked: Dict[str, TopKCollector] = {}
+        scan_queries = []
+        parallel_min_candidates = self.config.get('QUESTION_PARALLEL_MIN_CANDIDATES', 20000)
+        for text, (search_query, _) in pending.items():
+            candidates = sorted(candidate_sets[text])
+            if facet is not None:
+                candidates = facet.apply(candidates)
+            if candidates:
+                collector = bank.shards.rank(bank, search_query, candidates, top_k,
+                                             parallel_min_candidates=parallel_min_candidates)
+                if collector.hits():
+                    ranked[text] = collector
+                    continue
+            similar = self._similar_candidates(bank, search_query, facet)
+            if similar:
+                ranked[text] = bank.shards.rank(bank, search_query, similar, top_k, fallback=True,
+                                                parallel_min_candidates=parallel_min_candidates)
+            else:
+                scan_queries.append(search_query)
+        if scan_queries:
+            doc_ids = range(len(bank.search_index)) if facet is None else facet.doc_ids
+            ranked.update(self._scan_shared(bank, scan_queries, top_k, doc_ids))
+
+        for text, (search_query, positions) in pending.items():
+            query_results = self._collect_results(bank, ranked[text]) if text in ranked else []
+            self.search_cache.put(self._cache_key(bank, facet, text, top_k), query_results)
+            for position in positions:
+                results[position] = query_results
+        return results
+
+    def _search(self, bank: QuestionBank, search_query: SearchQuery, top_k: int,
+                facet: Optional[FacetFilter] = None) -> List[Dict]:
+        if bank.fts_store is not None:
+            return self._search_fts(bank, search_query, top_k, facet)
+        parallel_min_candidates = self.config.get('QUESTION_PARALLEL_MIN_CANDIDATES', 20000)
+        candidates = bank.scorer.candidates(search_query, bank.trigram_index)
+        if facet is not None:
+            # 先与筛选位图求交集再评分，不满足条件的题目不参与排序
+            candidates = facet.apply(candidates)
+        if candidates:
+            collector = bank.shards.rank(bank, search_query, candidates, top_k,
+                                         parallel_min_candidates=parallel_min_candidates)
+            if collector.hits():
+                return self._collect_results(bank, collector)
+        # 没有候选或候选都没有得分（如查询有错别字或只是单词的一部分）时按原有规则选出最接近的题目：
+        # 先用三元组索引筛选相似题目，筛选不出时才扫描全库（或满足条件的全部题目）
+        candidates = (self._similar_candidates(bank, search_query, facet)
+                      or (range(len(bank.search_index)) if facet is None else facet.doc_ids))
+        if not candidates:
+            return []
+        collector = bank.shards.rank(bank, search_query, candidates, top_k, fallback=True,
+                                     parallel_min_candidates=parallel_min_candidates)
+        return self._collect_results(bank, collector)
+
+    def _search_fts(self, bank: QuestionBank, search_query: SearchQuery, top_k: int,
+                    facet: Optional[FacetFilter] = None) -> List[Dict]:
+        """在 FTS5 中按 BM25 检索；没有任何检索词命中时按三元组相似度返回一条最接近的题目"""
+        matches = bank.fts_store.search(search_query.tokens, top_k, facet)
+        if matches:
+            return [self._make_hit(bank, doc_id, score, score) for doc_id, score in matches]
+        closest = bank.fts_store.similar(search_query.text, 1, facet)
+        return [self._make_hit(bank, doc_id, score, score, is_fallback=True) for doc_id, score in closest]
+
+    def _similar_candidates(self, bank: QuestionBank, search_query: SearchQuery,
+                            facet: Optional[FacetFilter] = None) -> List[int]:
+        """按字符三元组重合度筛选与查询相似的题目，未启用三元组索引时返回空列表"""
+        if bank.trigram_index is None:
             return []
+        candidates = bank.trigram_index.candidates(
+            search_query.text,
+            max_candidates=self.config.get('QUESTION_TRIGRAM_MAX_CANDIDATES', 200),
+            min_overlap=self.config.get('QUESTION_TRIGRAM_MIN_OVERLAP', 0.3)
+        )
+        return candidates if facet is None else facet.apply(candidates)
+
+    @staticmethod
+    def _scan_shared(bank: QuestionBank, search_queries: List[SearchQuery], top_k: int,
+                     doc_ids: Sequence[int]) -> Dict[str, TopKCollector]:
+        """按原有规则扫描给定的题目（通常为全库），多个查询共用同一次遍历"""
+        collectors = {search_query.text: TopKCollector(top_k) for search_query in search_queries}
+        texts = bank.search_index.texts
+        for doc_id in doc_ids:
+            text = texts[doc_id]
+            for search_query in search_queries:
+                total_score, score = legacy_score(search_query, text)
+                collectors[search_query.text].add(doc_id, total_score, score)
+        return collectors
+
+    def _collect_results(self, bank: QuestionBank, collector: TopKCollector) -> List[Dict]:
+        hits = collector.hits()
+        if hits:
+            return [self._make_hit(bank, *hit) for hit in hits]
+        best_hit = collector.best_hit()
+        return [self._make_hit(bank, *best_hit, is_fallback=True)] if best_hit else []
+
+    @staticmethod
+    def _make_hit(bank: QuestionBank, doc_id: int, total_score: float, score: float,
+                  is_fallback: bool = False) -> Dict:
+        """基于预先格式化的记录生成搜索结果"""
+        hit = {**bank.formatted[doc_id], 'score': total_score, 'original_score': score}
+        if is_fallback:
+            hit['is_fallback'] = True
+        return hit
 
     def format_question_for_display(self, question: Dict) -> Dict:
         """格式化题目数据以适应前端显示 (此函数内容保持不变)"""
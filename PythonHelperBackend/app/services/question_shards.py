@@ -0,0 +1,252 @@
+import atexit
+import logging
+import multiprocessing
+import os
+import pickle
+import tempfile
+import threading
+import time
+import zlib
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Sequence
+
+from .question_store import QuestionRecord
+from .scorers import LegacyScorer, QuestionScorer, SearchQuery, TopKCollector, rank_candidates
+
+logger = logging.getLogger(__name__)
+
+# 子进程中当前加载的题库索引（_WorkerBank）
+_worker_bank = None
+
+
+class QuestionShard:
+    """题库分片：一组题目编号及其搜索耗时统计"""
+
+    def __init__(self, shard_id: int, name: str, doc_ids: array):
+        self.shard_id = shard_id
+        self.name = name
+        self.doc_ids = doc_ids
+        self.searches = 0
+        self.total_ms = 0.0
+        self.last_ms = 0.0
+
+    def record(self, elapsed_ms: float) -> None:
+        self.searches += 1
+        self.total_ms += elapsed_ms
+        self.last_ms = elapsed_ms
+
+    def stats(self) -> Dict:
+        return {
+            'shard': self.shard_id, 'name': self.name, 'size': len(self.doc_ids),
+            'searches': self.searches, 'last_ms': round(self.last_ms, 3),
+            'avg_ms': round(self.total_ms / self.searches, 3) if self.searches else 0.0,
+        }
+
+
+class ShardSet:
+    """按课程或题目编号哈希划分的题库分片
+
+    分片共用同一个倒排索引与评分器（全局 IDF），搜索时候选文档按分片拆分后分别排序，
+    再合并各分片的前 k 个结果，排序与不分片时完全一致。
+    候选数量较多且配置了进程池时，各分片在独立进程中并行评分。
+    """
+
+    def __init__(self, shards: List[QuestionShard], shard_of: array):
+        self.shards = shards
+        self.shard_of = shard_of
+        self.pool: Optional['ParallelShardPool'] = None
+        self._stats_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.shards)
+
+    def split(self, candidates: Sequence[int]) -> List[array]:
+        """将候选文档按所属分片拆分"""
+        parts = [array('I') for _ in self.shards]
+        shard_of = self.shard_of
+        for doc_id in candidates:
+            parts[shard_of[doc_id]].append(doc_id)
+        return parts
+
+    def rank(self, bank, search_query: SearchQuery, candidates: Sequence[int], top_k: int,
+             fallback: bool = False, parallel_min_candidates: int = 0) -> TopKCollector:
+        """在各分片上排序候选文档并合并结果
+
+        Args:
+            bank: 分片所属的题库快照
+            fallback: 为 True 时使用原有规则评分（全库扫描兜底）
+            parallel_min_candidates: 候选数量达到该值时才使用进程池
+        """
+        scorer = bank.fallback_scorer if fallback else bank.scorer
+        if len(self.shards) == 1 and self.pool is None:
+            return self._rank_local(0, search_query, candidates, top_k, scorer)
+        parts = self.split(candidates)
+        if self.pool is not None and len(candidates) >= parallel_min_candidates:
+            collectors = self.pool.rank(bank.version, search_query.text, parts, top_k, fallback)
+            if collectors is not None:
+                shard_ids = [shard_id for shard_id, part in enumerate(parts) if part]
+                for shard_id, (_, elapsed_ms) in zip(shard_ids, collectors):
+                    self._record(shard_id, elapsed_ms)
+                return TopKCollector.merge((collector for collector, _ in collectors), top_k)
+        return TopKCollector.merge(
+            (self._rank_local(shard_id, search_query, part, top_k, scorer) for shard_id, part in enumerate(parts)),
+            top_k
+        )
+
+    def _rank_local(self, shard_id: int, search_query: SearchQuery, candidates: Sequence[int], top_k: int,
+                    scorer: QuestionScorer) -> TopKCollector:
+        start = time.perf_counter()
+        collector = rank_candidates(search_query, candidates, top_k, scorer)
+        self._record(shard_id, (time.perf_counter() - start) * 1000)
+        return collector
+
+    def _record(self, shard_id: int, elapsed_ms: float) -> None:
+        with self._stats_lock:
+            self.shards[shard_id].record(elapsed_ms)
+
+    def stats(self) -> List[Dict]:
+        with self._stats_lock:
+            return [shard.stats() for shard in self.shards]
+
+    def close(self) -> None:
+        # 进程池由 QuestionService 持有，在各版本题库之间共用，这里只解除关联
+        self.pool = None
+
+
+def build_shards(questions: List[QuestionRecord], shard_by: str = 'hash', shard_count: int = 1) -> ShardSet:
+    """划分题库分片
+
+    Args:
+        questions: 题目记录
+        shard_by: 'course' 按题目的 course 字段划分（缺失时归入“未分类”），'hash' 按题目编号哈希划分
+        shard_count: 按哈希划分时的分片数量
+    """
+    shard_of = array('I', bytes(4 * len(questions)))
+    if shard_by == 'course':
+        names: Dict[str, int] = {}
+        for doc_id, question in enumerate(questions):
+            course = str(question.get('course') or '未分类')
+            shard_of[doc_id] = names.setdefault(course, len(names))
+        shard_names = list(names) or ['未分类']
+    else:
+        shard_count = max(1, shard_count)
+        if shard_count > 1:
+            for doc_id, question in enumerate(questions):
+                key = f"{question.get('question_type', '')}_{question.get('question_number', '')}"
+                shard_of[doc_id] = zlib.crc32(key.encode('utf-8')) % shard_count
+        shard_names = [f'hash-{i}' for i in range(shard_count)]
+
+    members = [array('I') for _ in shard_names]
+    for doc_id, shard_id in enumerate(shard_of):
+        members[shard_id].append(doc_id)
+    shards = [QuestionShard(shard_id, name, doc_ids) for shard_id, (name, doc_ids) in enumerate(zip(shard_names, members))]
+    return ShardSet(shards, shard_of)
+
+
+class _WorkerBank:
+    """子进程中的题库索引：版本号、评分器与兜底评分器"""
+
+    __slots__ = ('version', 'scorer', 'fallback_scorer')
+
+    def __init__(self, version: int, search_index, scorer: QuestionScorer):
+        self.version = version
+        self.scorer = scorer
+        self.fallback_scorer = LegacyScorer(search_index)
+
+
+def _load_worker_bank(version: int, path: str) -> int:
+    """子进程加载指定版本的题库索引（已加载时直接返回），返回进程号"""
+    global _worker_bank
+    if _worker_bank is None or _worker_bank.version != version:
+        with open(path, 'rb') as f:
+            payload = pickle.load(f)
+        _worker_bank = _WorkerBank(version, payload['search_index'], payload['scorer'])
+    return os.getpid()
+
+
+def _rank_in_worker(version: int, path: str, query_text: str, candidates: array, top_k: int, fallback: bool):
+    """在子进程中对一个分片的候选文档评分，返回 (结果, 耗时毫秒)"""
+    _load_worker_bank(version, path)
+    start = time.perf_counter()
+    scorer = _worker_bank.fallback_scorer if fallback else _worker_bank.scorer
+    collector = rank_candidates(SearchQuery(query_text), candidates, top_k, scorer)
+    return collector, (time.perf_counter() - start) * 1000
+
+
+class ParallelShardPool:
+    """分片并行搜索的进程池
+
+    子进程在服务启动时一次性 fork 出来（此时进程内还没有其他线程，子进程不会继承被其他线程持有的锁），
+    之后不再创建新进程，题库重新加载时也不再 fork。
+    每次加载题库时把倒排索引与评分器写入临时文件，子进程收到新版本的任务时从文件加载；
+    子进程加载新版本后删除旧文件，关闭进程池（或进程退出）时删除当前文件。
+    进程池出错（如子进程崩溃）后不再使用，所有搜索改在本进程内完成。
+    不支持 fork 的平台不启用。
+    """
+
+    def __init__(self, processes: int):
+        self.processes = processes
+        self.version: Optional[int] = None
+        self.payload_path: Optional[str] = None
+        self.broken = False
+        self._lock = threading.Lock()
+        self.executor = ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context('fork'))
+        # 使用 fork 时首次提交任务即创建全部子进程，之后只复用这些进程
+        self.executor.submit(time.sleep, 0).result()
+        atexit.register(self.close)
+
+    def load(self, bank) -> None:
+        """将题库的索引与评分器交给子进程，各子进程加载完成后删除上一版本的临时文件；失败时进程池不再使用"""
+        fd, path = tempfile.mkstemp(prefix='question-shards-', suffix='.pickle')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump({'search_index': bank.search_index, 'scorer': bank.scorer}, f,
+                            protocol=pickle.HIGHEST_PROTOCOL)
+            futures = [self.executor.submit(_load_worker_bank, bank.version, path) for _ in range(self.processes)]
+            for future in futures:
+                future.result()
+        except Exception:
+            self.broken = True
+            self._remove(path)
+            raise
+        with self._lock:
+            old_path, self.version, self.payload_path = self.payload_path, bank.version, path
+        self._remove(old_path)
+
+    def rank(self, version: int, query_text: str, parts: List[array], top_k: int, fallback: bool = False):
+        """并行排序各分片，失败时返回 None 由调用方在本进程内完成"""
+        with self._lock:
+            if self.broken or version != self.version:
+                return None
+            path = self.payload_path
+        try:
+            futures = [self.executor.submit(_rank_in_worker, version, path, query_text, part, top_k, fallback)
+                       for part in parts if part]
+            return [future.result() for future in futures]
+        except Exception as e:
+            with self._lock:
+                first_failure, self.broken = not self.broken, True
+            if first_failure:
+                logger.error(f"分片并行搜索失败，之后的搜索都在本进程内完成: {e}")
+            return None
+
+    def close(self) -> None:
+        """关闭子进程并删除临时文件（可重复调用）"""
+        atexit.unregister(self.close)
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        with self._lock:
+            path, self.payload_path, self.version = self.payload_path, None, None
+        self._remove(path)
+
+    @staticmethod
+    def _remove(path: Optional[str]) -> None:
+        if path:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    @staticmethod
+    def available() -> bool:
+        return 'fork' in multiprocessing.get_all_start_methods()
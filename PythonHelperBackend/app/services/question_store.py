@@ -0,0 +1,163 @@
+import sys
+from collections.abc import Mapping
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+# 题库中高度重复的短字符串（题型、答案、选项等）统一驻留，多道题目共享同一个对象
+_intern = sys.intern
+
+
+def _intern_text(value):
+    return _intern(value) if isinstance(value, str) else value
+
+
+class QuestionRecord:
+    """紧凑的题目记录
+
+    使用 __slots__ 存储 database.json 中的固定字段，比普通字典节省大量内存；
+    题型、题号、答案和选项文本均为驻留字符串。未知字段保存在 extra 中。
+    提供与字典一致的只读访问接口，原有 question.get(...) 的调用方式保持不变。
+    """
+    __slots__ = ('question_type', 'question_number', 'question', 'options', 'answer', 'extra')
+
+    FIELDS = ('question_type', 'question_number', 'question', 'options', 'answer')
+
+    def __init__(self, question_type: Optional[str] = None, question_number: Optional[str] = None,
+                 question: Optional[str] = None, options: Optional[Tuple[str, ...]] = None,
+                 answer: Optional[str] = None, extra: Optional[Dict] = None):
+        self.question_type = question_type
+        self.question_number = question_number
+        self.question = question
+        self.options = options
+        self.answer = answer
+        self.extra = extra
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'QuestionRecord':
+        """从题库 JSON 中的单道题目构建记录"""
+        options = data.get('options')
+        if isinstance(options, list):
+            options = tuple(_intern_text(option) for option in options)
+        extra = {key: value for key, value in data.items() if key not in cls.FIELDS} or None
+        return cls(
+            question_type=_intern_text(data.get('question_type')),
+            question_number=_intern_text(data.get('question_number')),
+            question=data.get('question'),
+            options=options,
+            answer=_intern_text(data.get('answer')),
+            extra=extra,
+        )
+
+    def __getstate__(self):
+        return tuple(getattr(self, slot) for slot in self.__slots__)
+
+    def __setstate__(self, state):
+        for slot, value in zip(self.__slots__, state):
+            setattr(self, slot, value)
+
+    def get(self, key: str, default=None):
+        """与 dict.get 一致：缺失的字段返回默认值"""
+        if key in self.FIELDS:
+            value = getattr(self, key)
+            return default if value is None else value
+        if self.extra is not None:
+            return self.extra.get(key, default)
+        return default
+
+    def __getitem__(self, key: str):
+        value = self.get(key, KeyError)
+        if value is KeyError:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key: str) -> bool:
+        if key in self.FIELDS:
+            return getattr(self, key) is not None
+        return self.extra is not None and key in self.extra
+
+    def to_dict(self) -> Dict:
+        data = {field: getattr(self, field) for field in self.FIELDS if getattr(self, field) is not None}
+        if isinstance(self.options, tuple):
+            data['options'] = list(self.options)
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+
+class FrozenRecord(dict):
+    """只读字典：在多个请求间共享的题目数据，禁止就地修改"""
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError('题目记录是只读的')
+
+    __setitem__ = __delitem__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+
+
+class DisplayRecord(Mapping):
+    """预先格式化的只读显示记录
+
+    只保存格式化时生成的字符串（标题、内容、答案文本等），原题字段直接引用
+    QuestionRecord，不再为每道题复制一份完整字典。按映射方式访问时返回的键
+    与 QuestionService.format_question_for_display 完全一致。
+    """
+    __slots__ = ('question', 'id', 'title', 'content', 'answer', 'category', 'difficulty', 'keywords')
+
+    KEYS = ('id', 'title', 'content', 'answer', 'category', 'difficulty', 'keywords',
+            'question_type', 'question_number', 'original_question', 'options', 'original_answer',
+            'full_question')
+
+    def __init__(self, question: QuestionRecord, formatted: Dict):
+        self.question = question
+        self.id = formatted['id']
+        self.title = formatted['title']
+        # 没有选项的题目内容与原题相同时直接复用原字符串
+        content = formatted['content']
+        self.content = question.question if content == question.question else content
+        self.answer = _intern(formatted['answer'])
+        self.category = _intern(formatted['category'])
+        self.difficulty = _intern(formatted['difficulty'])
+        self.keywords = tuple(formatted['keywords'])
+
+    def __getstate__(self):
+        return tuple(getattr(self, slot) for slot in self.__slots__)
+
+    def __setstate__(self, state):
+        for slot, value in zip(self.__slots__, state):
+            setattr(self, slot, value)
+
+    def __getitem__(self, key: str):
+        if key in ('id', 'title', 'content', 'answer', 'category', 'difficulty', 'keywords'):
+            return getattr(self, key)
+        question = self.question
+        if key == 'question_type':
+            return question.get('question_type', '')
+        if key == 'question_number':
+            return question.get('question_number', '')
+        if key == 'original_question':
+            return question.get('question', '')
+        if key == 'options':
+            return question.get('options', ())
+        if key == 'original_answer':
+            return question.get('answer', '')
+        if key == 'full_question':
+            return FrozenRecord(
+                question_text=question.get('question', ''), options_list=question.get('options', ()),
+                correct_answer=question.get('answer', ''), question_type=question.get('question_type', ''),
+                question_number=question.get('question_number', '')
+            )
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.KEYS)
+
+    def __len__(self) -> int:
+        return len(self.KEYS)
+
+    def to_dict(self, fields: Optional[Iterable[str]] = None) -> Dict:
+        """转换为字典，fields 指定只输出的键（按给定顺序）"""
+        return {key: self[key] for key in (self.KEYS if fields is None else fields)}
+
+
+def build_question_records(questions: Iterable[Dict]) -> List[QuestionRecord]:
+    """将题库 JSON 列表转换为紧凑记录列表"""
+    return [QuestionRecord.from_dict(question) for question in questions if isinstance(question, dict)]
@@ -0,0 +1,67 @@
+import json
+import logging
+import os
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 相关题目图的结构变化时递增，旧文件随之失效
+RELATED_FORMAT_VERSION = 1
+
+
+def build_related_graph(matrix, ids: List[str], top_k: int = 10) -> Dict[str, List[Tuple[str, float]]]:
+    """离线计算每道题目的 k 近邻，返回 {题目编号: [(相关题目编号, 相似度)]}
+
+    Args:
+        matrix: 题库的 TfidfMatrix
+        ids: 与矩阵行对应的题目编号（如“单选题_1”）
+        top_k: 每道题目保留的相关题目数量
+    """
+    graph = {}
+    for doc_id, neighbors in matrix.neighbors(top_k):
+        graph.setdefault(ids[doc_id], [(ids[other], round(similarity, 4)) for other, similarity in neighbors])
+    return graph
+
+
+def write_related_graph(path: str, graph: Dict[str, List[Tuple[str, float]]],
+                        source_signature: Optional[Tuple[int, int]], top_k: int) -> None:
+    """写入相关题目图，先写临时文件再原子替换"""
+    document = {
+        'format_version': RELATED_FORMAT_VERSION,
+        'source_signature': list(source_signature) if source_signature else None,
+        'top_k': top_k,
+        'related': graph,
+    }
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(document, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def load_related_graph(path: Optional[str], id_index: Dict[str, int],
+                       source_signature: Optional[Tuple[int, int]]) -> Optional[Dict[int, List[Tuple[int, float]]]]:
+    """读取相关题目图并换算为题目在题库中的位置，文件不存在或无法解析时返回 None
+
+    题库已修改时仍然使用旧图（只记录警告），已不存在的题目会被忽略。
+    """
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            document = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.error(f"读取相关题目图失败: {e}")
+        return None
+    if document.get('format_version') != RELATED_FORMAT_VERSION:
+        logger.info(f"相关题目图格式已过期: {path}")
+        return None
+    if source_signature is not None and document.get('source_signature') != list(source_signature):
+        logger.warning(f"相关题目图与当前题库文件不一致，请重新运行 build_related_questions.py: {path}")
+    related = {}
+    for question_id, neighbors in document.get('related', {}).items():
+        doc_id = id_index.get(question_id)
+        if doc_id is not None:
+            related[doc_id] = [(id_index[other], similarity) for other, similarity in neighbors
+                               if other in id_index]
+    logger.info(f"已加载 {len(related)} 道题目的相关题目")
+    return related
@@ -0,0 +1,276 @@
+import heapq
+import math
+import logging
+from array import array
+from bisect import bisect_left
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from .search_index import InvertedIndex, TrigramIndex, tokenize
+
+logger = logging.getLogger(__name__)
+
+SPECIAL_KEYWORDS = ['if', 'else', 'def', 'class', 'list', 'dict', 'for', 'while']  # 简化示例
+# 剪枝时的得分容差，避免浮点累加顺序不同造成误剪
+_PRUNE_EPSILON = 1e-6
+
+
+class SearchQuery:
+    """预处理后的搜索查询，同一次搜索中供各评分器共用"""
+
+    def __init__(self, query: str):
+        self.text = query.strip().lower()
+        self.words = self.text.split()
+        self.tokens = list(dict.fromkeys(tokenize(self.text)))
+        # 长度不少于 2 的查询词（保留重复项，与评分规则一致）
+        self.long_words = [word for word in self.words if len(word) >= 2]
+
+
+def legacy_score(query: SearchQuery, question_content_lower: str) -> Tuple[float, float]:
+    """原有的手工评分规则，返回 (总分, 关键词得分)"""
+    query_lower = query.text
+    score = 0
+    if query_lower in question_content_lower:
+        score += 10
+
+    for word in query.words:
+        if len(word) >= 2 and word in question_content_lower:
+            score += 3
+
+    for keyword in SPECIAL_KEYWORDS:
+        if keyword in query_lower and keyword in question_content_lower:
+            score += 2
+
+    char_match_score = sum(0.1 for char in query_lower if char in question_content_lower)
+    word_frequency_score = sum(
+        question_content_lower.count(word) * 0.5 for word in query.words if len(word) >= 2)
+
+    return score + char_match_score + word_frequency_score, score
+
+
+class QuestionScorer:
+    """题目评分器接口
+
+    评分器在题库加载时基于倒排索引完成预计算，搜索时只对候选文档评分。
+    关键词得分大于 0 的文档视为命中，否则只参与兜底匹配。
+    """
+    name = ''
+
+    def __init__(self, index: InvertedIndex):
+        self.index = index
+
+    def candidates(self, query: SearchQuery, trigram_index: Optional[TrigramIndex] = None) -> List[int]:
+        """可能得到正的关键词得分的文档编号（按题库顺序），默认为包含任一检索词的文档"""
+        return self.index.candidates(query.tokens)
+
+    def score_candidates(self, query: SearchQuery, doc_ids: Iterable[int]) -> Iterator[Tuple[int, float, float]]:
+        """按顺序为候选文档评分，逐个返回 (文档编号, 总分, 关键词得分)
+
+        doc_ids 会被惰性消费，调用方可以在遍历过程中提前终止。
+        """
+        raise NotImplementedError
+
+    def score_top_k(self, query: SearchQuery, doc_ids: Sequence[int],
+                    top_k: int) -> Iterator[Tuple[int, float, float]]:
+        """为可能进入前 top_k 名的候选文档评分，默认对全部候选评分
+
+        评分器可以跳过得分不可能超过第 k 名的文档，但必须为所有可能进入前 k 名的文档给出准确得分。
+        """
+        return self.score_candidates(query, doc_ids)
+
+
+class LegacyScorer(QuestionScorer):
+    """沿用原有的子串、关键词与字符匹配规则"""
+    name = 'legacy'
+
+    def candidates(self, query, trigram_index=None):
+        # 关键词得分来自子串匹配：整个查询、长度不少于 2 的查询词或查询中出现的特殊关键词，
+        # 包含其中任一子串的文档才可能命中（如查询 int 也命中只含 print 的题目）
+        needles = set(query.long_words)
+        needles.update(keyword for keyword in SPECIAL_KEYWORDS if keyword in query.text)
+        if not query.long_words and query.text:
+            needles.add(query.text)
+        doc_ids = set()
+        for needle in needles:
+            doc_ids.update(self.index.containing(needle, trigram_index))
+        return sorted(doc_ids)
+
+    def score_candidates(self, query, doc_ids):
+        texts = self.index.texts
+        for doc_id in doc_ids:
+            total_score, score = legacy_score(query, texts[doc_id])
+            yield doc_id, total_score, score
+
+
+
+class BM25Scorer(QuestionScorer):
+    """BM25 评分器
+
+    加载时为每个检索词预计算 IDF 与文档长度归一化后的权重，
+    查询时每个候选文档只需累加若干个权重。
+    取前 k 名时按 MaxScore 剪枝：每个检索词的最大权重是它能为文档贡献的得分上界，
+    上界之和不可能超过当前第 k 名的检索词不再遍历倒排表，只为已有候选按需查找权重。
+    """
+    name = 'bm25'
+
+    def __init__(self, index: InvertedIndex, k1: float = 1.2, b: float = 0.75):
+        super().__init__(index)
+        self.k1 = k1
+        self.b = b
+        doc_count = len(index)
+        avg_length = (sum(index.doc_lengths) / doc_count) if doc_count else 0.0
+        self.idf: Dict[str, float] = {}
+        # 与 index.postings 对齐的权重数组
+        self.weights: Dict[str, array] = {}
+        # 每个检索词的最大权重（得分上界）
+        self.max_weights: Dict[str, float] = {}
+        for token, doc_ids in index.postings.items():
+            idf = math.log(1 + (doc_count - len(doc_ids) + 0.5) / (len(doc_ids) + 0.5))
+            self.idf[token] = idf
+            weights = array('f')
+            for doc_id, freq in zip(doc_ids, index.term_freqs[token]):
+                norm = k1 * (1 - b + b * index.doc_lengths[doc_id] / avg_length) if avg_length else k1
+                weights.append(idf * freq * (k1 + 1) / (freq + norm))
+            self.weights[token] = weights
+            self.max_weights[token] = max(weights)
+
+    def accumulate(self, query: SearchQuery) -> Dict[int, float]:
+        """按检索词累加权重，返回 {文档编号: BM25 得分}"""
+        scores: Dict[int, float] = {}
+        for token in query.tokens:
+            doc_ids = self.index.postings.get(token)
+            if not doc_ids:
+                continue
+            for doc_id, weight in zip(doc_ids, self.weights[token]):
+                scores[doc_id] = scores.get(doc_id, 0.0) + weight
+        return scores
+
+    def score_candidates(self, query, doc_ids):
+        scores = self.accumulate(query)
+        for doc_id in doc_ids:
+            score = scores.get(doc_id, 0.0)
+            yield doc_id, score, score
+
+    def score_top_k(self, query, doc_ids, top_k):
+        terms = sorted(((self.max_weights[token], self.index.postings[token], self.weights[token])
+                        for token in query.tokens if token in self.index.postings),
+                       key=lambda term: -term[0])
+        if not terms:
+            return
+        allowed = set(doc_ids)
+        # remaining[i]: 第 i 个及之后的检索词最多还能贡献的得分
+        remaining = [0.0] * (len(terms) + 1)
+        for i in range(len(terms) - 1, -1, -1):
+            remaining[i] = remaining[i + 1] + terms[i][0]
+
+        # 按最大权重从高到低遍历倒排表；部分得分的第 k 名只会随遍历增大，是最终第 k 名得分的下界
+        scores: Dict[int, float] = {}
+        threshold = 0.0
+        essential = len(terms)
+        for i, (_, postings, weights) in enumerate(terms):
+            if i and len(scores) >= top_k:
+                threshold = heapq.nlargest(top_k, scores.values())[-1]
+                if remaining[i] + _PRUNE_EPSILON < threshold:
+                    # 只出现在剩余检索词中的文档不可能进入前 k 名
+                    essential = i
+                    break
+            for doc_id, weight in zip(postings, weights):
+                if doc_id in allowed:
+                    scores[doc_id] = scores.get(doc_id, 0.0) + weight
+        if essential == len(terms):
+            for doc_id, score in scores.items():
+                yield doc_id, score, score
+            return
+
+        # 剩余检索词：按部分得分从高到低，只为仍可能进入前 k 名的文档二分查找权重
+        top: List[float] = []
+        for doc_id, score in sorted(scores.items(), key=lambda item: -item[1]):
+            floor = max(threshold, top[0]) if len(top) == top_k else threshold
+            if score + remaining[essential] + _PRUNE_EPSILON < floor:
+                break
+            for j in range(essential, len(terms)):
+                if score + remaining[j] + _PRUNE_EPSILON < floor:
+                    score = None
+                    break
+                postings, weights = terms[j][1], terms[j][2]
+                position = bisect_left(postings, doc_id)
+                if position < len(postings) and postings[position] == doc_id:
+                    score += weights[position]
+            if score is None:
+                continue
+            if len(top) < top_k:
+                heapq.heappush(top, score)
+            elif score > top[0]:
+                heapq.heapreplace(top, score)
+            yield doc_id, score, score
+
+
+class TopKCollector:
+    """定长小顶堆：保留关键词得分大于 0 的前 k 个命中，同时记录总分最高的文档作为兜底
+
+    得分相同时按题库顺序排列，与原先稳定排序的结果一致。
+    """
+
+    def __init__(self, top_k: int):
+        self.top_k = max(1, top_k)
+        self.heap = []  # (总分, -文档编号, 关键词得分)，堆顶为当前第 k 名
+        self.best = None
+
+    def add(self, doc_id: int, total_score: float, score: float) -> None:
+        key = (total_score, -doc_id, score)
+        if self.best is None or key[:2] > self.best[:2]:
+            self.best = key
+        if score <= 0:
+            return
+        if len(self.heap) < self.top_k:
+            heapq.heappush(self.heap, key)
+        elif key[:2] > self.heap[0][:2]:
+            heapq.heapreplace(self.heap, key)
+
+    def hits(self) -> List[Tuple[int, float, float]]:
+        """按总分从高到低返回 (文档编号, 总分, 关键词得分)"""
+        return [(-neg_id, total_score, score) for total_score, neg_id, score in sorted(self.heap, reverse=True)]
+
+    def best_hit(self) -> Optional[Tuple[int, float, float]]:
+        if self.best is None:
+            return None
+        return -self.best[1], self.best[0], self.best[2]
+
+    @classmethod
+    def merge(cls, collectors: Iterable['TopKCollector'], top_k: int) -> 'TopKCollector':
+        """合并多个分片各自的前 k 个命中与兜底结果"""
+        merged = cls(top_k)
+        for collector in collectors:
+            for key in collector.heap:
+                if len(merged.heap) < merged.top_k:
+                    heapq.heappush(merged.heap, key)
+                elif key[:2] > merged.heap[0][:2]:
+                    heapq.heapreplace(merged.heap, key)
+            if collector.best is not None and (merged.best is None or collector.best[:2] > merged.best[:2]):
+                merged.best = collector.best
+        return merged
+
+
+def rank_candidates(search_query: SearchQuery, candidates: Sequence[int], top_k: int,
+                    scorer: QuestionScorer) -> TopKCollector:
+    """单次遍历候选文档，收集前 k 个命中与兜底的最佳匹配
+
+    评分器可以跳过不可能进入前 k 名的文档（BM25 按检索词最大权重剪枝）；
+    剪枝只在已有 k 个命中后发生，此时不需要兜底结果。
+    """
+    collector = TopKCollector(top_k)
+    if not candidates:
+        return collector
+    for doc_id, total_score, score in scorer.score_top_k(search_query, candidates, top_k):
+        collector.add(doc_id, total_score, score)
+    return collector
+
+
+SCORERS = {scorer.name: scorer for scorer in (LegacyScorer, BM25Scorer)}
+
+
+def create_scorer(name: str, index: InvertedIndex, **params) -> QuestionScorer:
+    """根据配置名称创建评分器，未知名称时回退到原有规则"""
+    scorer_class = SCORERS.get((name or '').lower())
+    if scorer_class is None:
+        logger.warning(f"未知的评分器 {name}，使用 {LegacyScorer.name}")
+        return LegacyScorer(index)
+    return scorer_class(index, **params)
@@ -0,0 +1,158 @@
+import math
+import re
+from array import array
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Sequence, Set
+
+# 英文/Python 按单词切分，中文按连续汉字串切分
+_TOKEN_PATTERN = re.compile(r'[a-z0-9_]+|[\u4e00-\u9fff]+')
+# 逐篇检查得到的短子串结果最多缓存的条数
+_CONTAINING_CACHE_SIZE = 256
+
+
+def _is_cjk(token: str) -> bool:
+    return '\u4e00' <= token[0] <= '\u9fff'
+
+
+def tokenize(text: str, with_unigrams: bool = False) -> List[str]:
+    """将文本切分为检索词
+
+    英文/Python 代码按单词切分；中文按字符二元组切分，单个汉字保留为一元词。
+
+    Args:
+        text: 待切分文本（调用方需先转为小写）
+        with_unigrams: 是否额外输出中文一元词（建索引时使用，以支持单字查询）
+    """
+    tokens = []
+    for run in _TOKEN_PATTERN.findall(text):
+        if not _is_cjk(run):
+            tokens.append(run)
+        elif len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+            if with_unigrams:
+                tokens.extend(run)
+    return tokens
+
+
+def _lower(text: str) -> str:
+    lowered = text.lower()
+    return text if lowered == text else lowered
+
+
+class InvertedIndex:
+    """题目文本的倒排索引，在题库加载时一次性构建"""
+
+    def __init__(self, texts: Iterable[str]):
+        # 预先转为小写，避免每次搜索重复处理；无需转换的文本直接复用原字符串
+        self.texts: List[str] = [_lower(text) for text in texts]
+        postings: Dict[str, List[int]] = {}
+        term_freqs: Dict[str, List[int]] = {}
+        # 每篇文档的检索词个数，供评分器预计算使用
+        self.doc_lengths = array('I')
+        for doc_id, text in enumerate(self.texts):
+            tokens = tokenize(text, with_unigrams=True)
+            self.doc_lengths.append(len(tokens))
+            for token, freq in Counter(tokens).items():
+                postings.setdefault(token, []).append(doc_id)
+                term_freqs.setdefault(token, []).append(freq)
+        # 倒排表与词频使用定长数组存储，比整数列表节省一半以上内存
+        self.postings: Dict[str, array] = {token: array('I', ids) for token, ids in postings.items()}
+        # 与 postings 一一对应的词频
+        self.term_freqs: Dict[str, array] = {token: array('I', freqs) for token, freqs in term_freqs.items()}
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def candidates(self, tokens: Iterable[str]) -> List[int]:
+        """返回包含任一检索词的文档编号，按题库顺序排列"""
+        doc_ids = set()
+        for token in set(tokens):
+            doc_ids.update(self.postings.get(token, ()))
+        return sorted(doc_ids)
+
+    def containing(self, needle: str, trigram_index: Optional['TrigramIndex'] = None) -> Sequence[int]:
+        """返回文本中包含子串 needle 的文档编号，按题库顺序排列
+
+        不少于三个字符时先取 needle 中最罕见三元组的倒排表，再逐篇确认；
+        更短的子串（或未启用三元组索引时）逐篇检查全部文本，结果缓存在索引上。
+        """
+        texts = self.texts
+        if trigram_index is not None and len(needle) >= 3 and needle == ' '.join(needle.split()):
+            postings = [trigram_index.postings.get(gram) for gram in trigrams(needle)]
+            if not all(postings):
+                return []
+            return [doc_id for doc_id in min(postings, key=len) if needle in texts[doc_id]]
+        cache = self.__dict__.setdefault('_containing_cache', {})
+        doc_ids = cache.get(needle)
+        if doc_ids is None:
+            doc_ids = array('I', (doc_id for doc_id, text in enumerate(texts) if needle in text))
+            if len(cache) >= _CONTAINING_CACHE_SIZE:
+                cache.clear()
+            cache[needle] = doc_ids
+        return doc_ids
+
+    def __getstate__(self):
+        # 子串查询缓存不写入快照
+        state = self.__dict__.copy()
+        state.pop('_containing_cache', None)
+        return state
+
+
+_WHITESPACE_PATTERN = re.compile(r'\s+')
+
+
+def trigrams(text: str) -> Set[str]:
+    """返回文本（小写）中所有的字符三元组，连续空白视为一个空格"""
+    text = _WHITESPACE_PATTERN.sub(' ', text).strip()
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class TrigramIndex:
+    """字符三元组索引，用于容错搜索
+
+    学生重新输入题目时常有错别字或少量改动，按三元组重合数量筛选出少量相似题目，
+    再交给评分器精确评分，避免整库扫描。
+    """
+
+    def __init__(self, texts: Iterable[str]):
+        postings: Dict[str, List[int]] = {}
+        doc_count = 0
+        for doc_id, text in enumerate(texts):
+            doc_count += 1
+            for gram in trigrams(text):
+                postings.setdefault(gram, []).append(doc_id)
+        self.doc_count = doc_count
+        self.postings: Dict[str, array] = {gram: array('I', ids) for gram, ids in postings.items()}
+
+    def __len__(self) -> int:
+        return self.doc_count
+
+    def candidates(self, text: str, max_candidates: int = 200, min_overlap: float = 0.3,
+                   max_posting_ratio: float = 0.05) -> List[int]:
+        """返回与查询三元组重合最多的文档编号，按题库顺序排列
+
+        出现在大量题目中的三元组（如“下列关”“的是 ”）区分度很低，计数时跳过，
+        使候选筛选的开销只与罕见三元组的倒排表长度有关。
+
+        Args:
+            text: 查询文本（小写）
+            max_candidates: 最多返回的候选数量
+            min_overlap: 候选文档至少包含的（参与计数的）查询三元组比例
+            max_posting_ratio: 倒排表长度超过题库该比例的三元组不参与计数
+        """
+        grams = [gram for gram in trigrams(text) if gram in self.postings]
+        if not grams:
+            return []
+        max_posting = max(max_candidates, int(self.doc_count * max_posting_ratio))
+        selective = [gram for gram in grams if len(self.postings[gram]) <= max_posting]
+        if not selective:
+            # 只命中常见三元组时无法区分相似度，取最罕见三元组倒排表中的前若干篇
+            rarest = min(grams, key=lambda gram: len(self.postings[gram]))
+            return self.postings[rarest][:max_candidates].tolist()
+        counts = Counter()
+        for gram in selective:
+            counts.update(self.postings[gram])
+        threshold = max(1, math.ceil(min_overlap * len(selective)))
+        return sorted(doc_id for doc_id, count in counts.most_common(max_candidates) if count >= threshold)
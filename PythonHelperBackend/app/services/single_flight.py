@@ -0,0 +1,170 @@
+import threading
+from typing import Callable, Dict, Hashable, Iterator, List, Optional, Tuple, TypeVar
+
+T = TypeVar('T')
+
+
+class _Call:
+    """一次进行中的请求：首个调用方执行，其余调用方等待其结果"""
+
+    __slots__ = ('event', 'value', 'error', 'waiters')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """合并同时进行的相同请求（single-flight）
+
+    同一个键同时只执行一次 fn：首个调用方（leader）发起请求，
+    在它完成之前到达的相同请求等待并共享同一个结果或异常。请求完成后即移除，不做缓存。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self._counters = {'leaders': 0, 'coalesced': 0}
+
+    def do(self, key: Hashable, fn: Callable[[], T]) -> Tuple[T, bool]:
+        """执行或等待 key 对应的请求，返回 (结果, 是否由本调用方执行)"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self._counters['leaders'] += 1
+            else:
+                call.waiters += 1
+                self._counters['coalesced'] += 1
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value, False
+
+        try:
+            call.value = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+        return call.value, True
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self._counters, 'in_flight': len(self._calls)}
+
+
+class _SharedStream:
+    """被多个调用方同时读取的上游流
+
+    已读到的行全部保留，后加入的调用方从头回放。没有单独的读取线程：
+    需要下一行的调用方中只有一个去读取上游，其余等待它读到后一起返回。
+    """
+
+    def __init__(self, open_source: Callable[[], Iterator]):
+        self.open_source = open_source
+        self.source: Optional[Iterator] = None
+        self.lines: List = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.fetching = False
+        self.subscribers = 0
+        self.condition = threading.Condition()
+
+    def _fetch(self) -> None:
+        """读取上游的下一行（同一时间只有一个调用方执行）"""
+        line, finished, error = None, False, None
+        try:
+            if self.source is None:
+                self.source = iter(self.open_source())
+            line = next(self.source)
+        except StopIteration:
+            finished = True
+        except Exception as e:
+            finished, error = True, e
+        with self.condition:
+            if finished:
+                self.done, self.error = True, error
+            else:
+                self.lines.append(line)
+            self.fetching = False
+            self.condition.notify_all()
+
+    def read(self) -> Iterator:
+        index = 0
+        while True:
+            with self.condition:
+                while index >= len(self.lines) and not self.done and self.fetching:
+                    self.condition.wait()
+                fetch = False
+                if index < len(self.lines):
+                    line = self.lines[index]
+                elif self.done:
+                    if self.error is not None:
+                        raise self.error
+                    return
+                else:
+                    self.fetching = fetch = True
+            if fetch:
+                self._fetch()
+                continue
+            index += 1
+            yield line
+
+    def close(self) -> None:
+        if self.source is not None and hasattr(self.source, 'close'):
+            self.source.close()
+
+
+class StreamFanout:
+    """合并同时进行的相同流式请求
+
+    同一个键同时只向上游发起一次流式请求，之后加入的调用方共享同一个流：
+    已收到的内容先回放，随后与首个调用方同步收到新内容。
+    所有调用方都离开（如客户端全部断开）时关闭上游流。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._streams: Dict[Hashable, _SharedStream] = {}
+        self._counters = {'leaders': 0, 'coalesced': 0}
+
+    def join(self, key: Hashable, open_source: Callable[[], Iterator]) -> Tuple[Iterator, bool]:
+        """加入 key 对应的流，返回 (逐行迭代器, 是否为首个调用方)
+
+        open_source 只在首个调用方开始读取时调用一次。
+        """
+        with self._lock:
+            stream = self._streams.get(key)
+            # 已失败的流不再共享，重新发起请求
+            leader = stream is None or stream.error is not None
+            if leader:
+                stream = self._streams[key] = _SharedStream(open_source)
+                self._counters['leaders'] += 1
+            else:
+                self._counters['coalesced'] += 1
+            stream.subscribers += 1
+        return self._subscribe(key, stream), leader
+
+    def _subscribe(self, key: Hashable, stream: _SharedStream) -> Iterator:
+        try:
+            yield from stream.read()
+        finally:
+            with self._lock:
+                stream.subscribers -= 1
+                last = stream.subscribers == 0
+                if last and self._streams.get(key) is stream:
+                    del self._streams[key]
+            if last:
+                stream.close()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self._counters, 'in_flight': len(self._streams)}
@@ -0,0 +1,155 @@
+import logging
+import queue
+import threading
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 队列结束标记
+_END = object()
+_FENCES = ('```', '~~~')
+
+
+class DraftSegmenter:
+    """把流式到达的草稿切分为段落，供逐段审查
+
+    只在段落边界（代码块外的空行）与代码块结束处切分，代码块不会被拆开；
+    累计不足 min_chars 个字符时与下一段合并，避免为很短的段落单独发起审查请求。
+    """
+
+    def __init__(self, min_chars: int = 200):
+        self.min_chars = min_chars
+        self._pending: List[str] = []
+        self._pending_chars = 0
+        self._partial = ''
+        self._in_code = False
+
+    def feed(self, text: str) -> List[str]:
+        """加入一段草稿内容，返回已完整的段落"""
+        self._partial += text
+        *lines, self._partial = self._partial.split('\n')
+        segments = []
+        for line in lines:
+            segment = self._add_line(line)
+            if segment:
+                segments.append(segment)
+        return segments
+
+    def finish(self) -> Optional[str]:
+        """草稿结束，返回剩余内容"""
+        if self._partial:
+            self._pending.append(self._partial)
+            self._partial = ''
+        segment = '\n'.join(self._pending).strip()
+        self._pending, self._pending_chars = [], 0
+        return segment or None
+
+    def _add_line(self, line: str) -> Optional[str]:
+        stripped = line.strip()
+        boundary = False
+        if stripped.startswith(_FENCES):
+            # 代码块结束处可以切分，开始处不切分（代码前的说明与代码保持在同一段）
+            boundary = self._in_code
+            self._in_code = not self._in_code
+        elif not stripped and not self._in_code:
+            boundary = True
+        if self._pending or stripped:
+            self._pending.append(line)
+            self._pending_chars += len(line)
+        if boundary and self._pending_chars >= self.min_chars:
+            segment = '\n'.join(self._pending).strip()
+            self._pending, self._pending_chars = [], 0
+            return segment
+        return None
+
+
+def pipelined_filter(draft: Iterable[Dict], filter_segment: Callable[[str], Iterable[Dict]],
+                     min_chars: int = 200, max_parallel: int = 4) -> Iterator[Dict]:
+    """边生成草稿边逐段审查，按原顺序流式返回审查后的内容
+
+    草稿在后台线程中读取并切分，每个段落完整后立即开始审查（最多 max_parallel 段同时审查）；
+    调用方先收到第一段的审查结果，无需等待整个草稿生成完毕。
+    draft 与 filter_segment 返回的内容都是 call_ai_api_stream 格式的数据块；
+    段与段之间以空行连接，所有段落完成后返回一个结束块，任一阶段出错时返回错误块并停止。
+    调用方提前关闭生成器（如客户端断开）时，后台的草稿与审查请求随之停止。
+    """
+    segments: queue.SimpleQueue = queue.SimpleQueue()
+    stop = threading.Event()
+    slots = threading.Semaphore(max_parallel)
+
+    def run_filter(segment: str, output: queue.SimpleQueue):
+        chunks = iter(filter_segment(segment))
+        try:
+            for chunk in chunks:
+                output.put(chunk)
+                if stop.is_set() or chunk.get('done'):
+                    break
+        except Exception as e:
+            logger.error(f"段落审查失败: {e}")
+            output.put({'content': f'处理AI响应失败: {str(e)}', 'done': True, 'error': True})
+        finally:
+            if hasattr(chunks, 'close'):
+                chunks.close()
+            output.put(_END)
+            slots.release()
+
+    def start_filter(segment: str):
+        slots.acquire()
+        output = queue.SimpleQueue()
+        threading.Thread(target=run_filter, args=(segment, output), name='ai-filter', daemon=True).start()
+        segments.put(output)
+
+    def read_draft():
+        segmenter = DraftSegmenter(min_chars)
+        chunks = iter(draft)
+        try:
+            for chunk in chunks:
+                if stop.is_set():
+                    return
+                if chunk.get('error'):
+                    segments.put(chunk)
+                    return
+                for segment in segmenter.feed(chunk.get('content') or ''):
+                    start_filter(segment)
+                if chunk.get('done'):
+                    break
+            tail = segmenter.finish()
+            if tail and not stop.is_set():
+                start_filter(tail)
+        except Exception as e:
+            logger.error(f"草稿生成失败: {e}")
+            segments.put({'content': f'处理AI响应失败: {str(e)}', 'done': True, 'error': True})
+        finally:
+            if hasattr(chunks, 'close'):
+                chunks.close()
+            segments.put(_END)
+
+    threading.Thread(target=read_draft, name='ai-draft', daemon=True).start()
+    try:
+        index = 0
+        while True:
+            output = segments.get()
+            if output is _END:
+                break
+            if isinstance(output, dict):
+                yield output
+                return
+            started = False
+            while True:
+                chunk = output.get()
+                if chunk is _END:
+                    break
+                if chunk.get('error'):
+                    yield chunk
+                    return
+                content = chunk.get('content')
+                if not content:
+                    continue
+                if index and not started:
+                    yield {'content': '\n\n', 'done': False}
+                started = True
+                yield {'content': content, 'done': False}
+            index += started
+        yield {'content': '', 'done': True}
+    finally:
+        stop.set()
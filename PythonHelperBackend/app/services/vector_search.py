@@ -0,0 +1,127 @@
+from collections import Counter
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from .search_index import InvertedIndex, tokenize
+
+# 批量查询时稠密得分矩阵（查询数 × 题目数）单块的最大元素个数
+_BATCH_BLOCK_ELEMENTS = 1 << 22
+
+
+class TfidfMatrix:
+    """题库的稀疏 TF-IDF 矩阵（按检索词压缩存储的列格式）
+
+    直接由倒排索引构建：第 t 列为检索词 t 的倒排表，indices 保存题目编号，
+    data 保存按题目 L2 归一化后的权重。单个查询的打分是一次稀疏矩阵-向量乘法，
+    批量查询是一次稀疏矩阵-矩阵乘法，全部由 NumPy 完成，不再逐题循环。
+    """
+
+    def __init__(self, index: InvertedIndex):
+        self.doc_count = len(index)
+        terms = list(index.postings)
+        self.vocabulary: Dict[str, int] = {term: term_id for term_id, term in enumerate(terms)}
+        lengths = np.fromiter((len(index.postings[term]) for term in terms), dtype=np.int64, count=len(terms))
+        self.indptr = np.zeros(len(terms) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=self.indptr[1:])
+        if terms:
+            # 倒排表是 array('I')，按缓冲区直接读取，不复制成 Python 整数
+            self.indices = np.concatenate([np.frombuffer(index.postings[term], dtype=np.uint32) for term in terms])
+            freqs = np.concatenate([np.frombuffer(index.term_freqs[term], dtype=np.uint32) for term in terms])
+        else:
+            self.indices = np.zeros(0, dtype=np.uint32)
+            freqs = np.zeros(0, dtype=np.uint32)
+        # 平滑 IDF 与对数词频
+        self.idf = (np.log((1 + self.doc_count) / (1 + lengths)) + 1).astype(np.float32)
+        data = (1 + np.log(freqs, dtype=np.float32)) * np.repeat(self.idf, lengths)
+        norms = np.sqrt(np.bincount(self.indices, weights=data * data, minlength=self.doc_count))
+        norms[norms == 0] = 1
+        self.data = (data / norms[self.indices]).astype(np.float32)
+
+    def __len__(self) -> int:
+        return self.doc_count
+
+    def query_vector(self, text: str) -> Tuple[np.ndarray, np.ndarray]:
+        """将查询（小写）转换为稀疏向量，返回 (检索词编号, 归一化权重)"""
+        counts = Counter(token for token in tokenize(text, with_unigrams=True) if token in self.vocabulary)
+        if not counts:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        term_ids = np.fromiter((self.vocabulary[token] for token in counts), dtype=np.int64, count=len(counts))
+        weights = (1 + np.log(np.fromiter(counts.values(), dtype=np.float32, count=len(counts)))) * self.idf[term_ids]
+        return term_ids, weights / np.linalg.norm(weights)
+
+    def _gather(self, term_ids: np.ndarray, weights: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """取出各检索词所在列的非零元素，返回 (所属的查询项位置, 题目编号, 乘上查询权重后的值)"""
+        starts, ends = self.indptr[term_ids], self.indptr[term_ids + 1]
+        lengths = ends - starts
+        # 将多个 [start, end) 区间展开为一个下标数组
+        offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+        owners = np.repeat(np.arange(len(term_ids)), lengths)
+        return owners, self.indices[offsets], self.data[offsets] * weights[owners]
+
+    def scores(self, text: str) -> np.ndarray:
+        """查询与每道题目的余弦相似度（稀疏矩阵-向量乘法）"""
+        term_ids, weights = self.query_vector(text)
+        _, doc_ids, values = self._gather(term_ids, weights)
+        return np.bincount(doc_ids, weights=values, minlength=self.doc_count)
+
+    def scores_batch(self, texts: Sequence[str]):
+        """逐块返回多个查询的得分矩阵 (起始查询位置, 块内查询数 × 题目数)
+
+        查询先组成稀疏矩阵，每块只做一次稀疏矩阵-矩阵乘法；分块以限制稠密结果的内存。
+        """
+        return self._multiply([self.query_vector(text) for text in texts])
+
+    def _multiply(self, vectors: List[Tuple[np.ndarray, np.ndarray]]):
+        block = max(1, _BATCH_BLOCK_ELEMENTS // max(1, self.doc_count))
+        for begin in range(0, len(vectors), block):
+            chunk = vectors[begin:begin + block]
+            term_ids = np.concatenate([ids for ids, _ in chunk])
+            weights = np.concatenate([w for _, w in chunk])
+            rows = np.repeat(np.arange(len(chunk)), [len(ids) for ids, _ in chunk])
+            owners, doc_ids, values = self._gather(term_ids, weights)
+            cells = rows[owners] * self.doc_count + doc_ids
+            flat = np.bincount(cells, weights=values, minlength=len(chunk) * self.doc_count)
+            yield begin, flat.reshape(len(chunk), self.doc_count)
+
+    def neighbors(self, top_k: int = 10, max_terms: int = 16, max_df_ratio: float = 0.1):
+        """逐题返回最相似的 top_k 道其他题目 (题目编号, [(相似题目编号, 相似度)])，供离线构建相关题目图
+
+        每道题只用权重最高的 max_terms 个检索词去做矩阵乘法，并跳过出现在超过 max_df_ratio 比例
+        （且多于 1000 道）题目中的常见词，乘法规模不再随常见词的倒排表增长；得到的是近似的余弦相似度。
+        """
+        # 将按检索词存储的列格式转置为按题目存储
+        term_of = np.repeat(np.arange(len(self.idf)), np.diff(self.indptr))
+        order = np.argsort(self.indices, kind='stable')
+        row_ptr = np.zeros(self.doc_count + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.indices, minlength=self.doc_count), out=row_ptr[1:])
+        doc_terms, doc_weights = term_of[order], self.data[order]
+        common = np.diff(self.indptr) > max(1000, self.doc_count * max_df_ratio)
+
+        vectors = []
+        for doc_id in range(self.doc_count):
+            terms = doc_terms[row_ptr[doc_id]:row_ptr[doc_id + 1]]
+            weights = doc_weights[row_ptr[doc_id]:row_ptr[doc_id + 1]]
+            keep = ~common[terms]
+            terms, weights = terms[keep], weights[keep]
+            if len(terms) > max_terms:
+                strongest = np.argpartition(weights, len(terms) - max_terms)[len(terms) - max_terms:]
+                terms, weights = terms[strongest], weights[strongest]
+            vectors.append((terms, weights))
+
+        for begin, block in self._multiply(vectors):
+            for offset, scores in enumerate(block):
+                doc_id = begin + offset
+                scores[doc_id] = 0
+                yield doc_id, top_k_scores(scores, top_k)
+
+
+def top_k_scores(scores: np.ndarray, top_k: int) -> List[Tuple[int, float]]:
+    """返回得分大于 0 的前 k 道题目 [(题目编号, 得分)]，得分相同时按题库顺序"""
+    doc_ids = np.flatnonzero(scores > 0)
+    if len(doc_ids) > top_k:
+        # 先取出不低于第 k 名得分的全部题目，再排序，保证并列时结果确定
+        kth = np.partition(scores[doc_ids], len(doc_ids) - top_k)[len(doc_ids) - top_k]
+        doc_ids = doc_ids[scores[doc_ids] >= kth]
+    order = np.lexsort((doc_ids, -scores[doc_ids]))[:top_k]
+    return [(int(doc_id), float(scores[doc_id])) for doc_id in doc_ids[order]]
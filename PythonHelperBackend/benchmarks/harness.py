@@ -0,0 +1,89 @@
+"""
+各基准共用的工具：写出合成题库、按配置创建题库服务、截取查询、统计延迟与内存
+"""
+
+import gc
+import json
+import random
+import statistics
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Tuple
+
+from flask import Flask
+from config import Config
+from app.services.question_service import QuestionService
+
+
+def write_bank(bank: List[Dict], path: str) -> str:
+    """将合成题库写入 JSON 文件，返回文件路径"""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(bank, f, ensure_ascii=False)
+    return path
+
+
+def create_service(bank_path: str, **overrides) -> QuestionService:
+    """从题库文件创建题库服务
+
+    默认不使用快照、相关题目图与搜索结果缓存，测量的是加载与搜索本身的开销；overrides 覆盖应用配置。
+    """
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    app.config.update({
+        'QUESTIONS_DB_PATH_NEW': bank_path, 'QUESTIONS_SNAPSHOT_PATH': None, 'RELATED_QUESTIONS_PATH': None,
+        'SEARCH_CACHE_SIZE': 0, **overrides,
+    })
+    with app.app_context():
+        return QuestionService()
+
+
+def sample_queries(bank: List[Dict], count: int, seed: int = 1, min_chars: int = 4,
+                   max_chars: int = 30) -> List[str]:
+    """从题目文本中截取片段作为查询，模拟学生粘贴部分题目"""
+    rng = random.Random(seed)
+    queries = []
+    while len(queries) < count:
+        text = rng.choice(bank)['question']
+        start = rng.randrange(len(text))
+        query = text[start:start + rng.randint(min_chars, max_chars)].strip()
+        if query:
+            queries.append(query)
+    return queries
+
+
+def percentile(samples: List[float], fraction: float) -> float:
+    """已排序样本的分位数"""
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))] if samples else 0.0
+
+
+def latency(search: Callable[[str], object], queries: List[str]) -> Tuple[float, float]:
+    """逐个执行查询，返回 (p50 毫秒, p99 毫秒)"""
+    samples = []
+    for query in queries:
+        start = time.perf_counter()
+        search(query)
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return statistics.median(samples), percentile(samples, 0.99)
+
+
+def timed(func: Callable[[], object]) -> Tuple[object, float]:
+    """执行 func，返回 (结果, 耗时秒)"""
+    gc.collect()
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+def measure(loader: Callable[[], object]) -> int:
+    """返回 loader() 结果在垃圾回收后的常驻内存（字节）"""
+    gc.collect()
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    result = loader()
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    del result
+    gc.collect()
+    return retained
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+题库内存占用基准：对比原始字典列表与紧凑记录的常驻内存
+
+用法: python -m benchmarks.memory_benchmark --sizes 10000 100000
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.question_store import build_question_records
+from benchmarks.harness import create_service, measure
+from benchmarks.synthetic_bank import generate_bank
+
+
+def load_plain(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def load_records(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return build_question_records(json.load(f))
+
+
+def run(size):
+    with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False, encoding='utf-8') as f:
+        json.dump(generate_bank(size), f, ensure_ascii=False)
+        path = f.name
+    try:
+        return {
+            'size': size,
+            'plain_dicts_bytes': measure(lambda: load_plain(path)),
+            'compact_records_bytes': measure(lambda: load_records(path)),
+            'service_total_bytes': measure(lambda: create_service(path)),
+        }
+    finally:
+        os.remove(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='题库内存占用基准')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--json', help='将结果写入 JSON 文件')
+    args = parser.parse_args()
+
+    results = [run(size) for size in args.sizes]
+    mb = 1024 * 1024
+    print(f"{'题目数':>10} {'原始字典(MB)':>14} {'紧凑记录(MB)':>14} {'节省':>8} {'服务总计(MB)':>14}")
+    for r in results:
+        saved = 1 - r['compact_records_bytes'] / r['plain_dicts_bytes'] if r['plain_dicts_bytes'] else 0
+        print(f"{r['size']:>10} {r['plain_dicts_bytes'] / mb:>14.1f} {r['compact_records_bytes'] / mb:>14.1f} "
+              f"{saved:>8.0%} {r['service_total_bytes'] / mb:>14.1f}")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
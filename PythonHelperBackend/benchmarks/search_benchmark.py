@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+题库搜索基准套件：在 1k~1M 道题目的合成题库上对比索引与评分器方案
+
+每个规模、每个方案测量：加载耗时、常驻内存、search_questions 的 p50/p99 延迟与吞吐量，
+查询按真实使用情况混合（整题粘贴、题目片段、关键词、错别字、代码片段、无匹配）。
+结果写入 JSON，便于不同提交之间对比。
+
+用法: python -m benchmarks.search_benchmark --sizes 1000 100000 --variants legacy bm25 -o results.json
+"""
+
+import argparse
+import gc
+import json
+import multiprocessing
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.harness import create_service, measure, percentile, write_bank
+from benchmarks.synthetic_bank import NAMES, TOPICS, generate_bank
+
+# 各方案共同的基础配置：内存索引、单分片、关闭全部可选索引，方案只开启自己用到的部分，
+# 加载耗时与内存的差异即来自该方案的索引
+BASE_CONFIG = {
+    'QUESTION_STORAGE_BACKEND': 'memory', 'QUESTION_SEARCH_SCORER': 'legacy',
+    'QUESTION_SHARD_BY': 'hash', 'QUESTION_SHARD_COUNT': 1, 'QUESTION_SEARCH_PROCESSES': 0,
+    'QUESTION_TRIGRAM_INDEX': False, 'QUESTION_CODE_INDEX': False,
+    'QUESTION_VECTOR_SEARCH': False, 'QUESTION_AUTOCOMPLETE': False,
+}
+
+# 方案名 -> (完整配置, 搜索方法名)
+VARIANTS = {
+    'legacy': ({**BASE_CONFIG}, 'search_questions'),
+    'bm25': ({**BASE_CONFIG, 'QUESTION_SEARCH_SCORER': 'bm25'}, 'search_questions'),
+    'legacy-4shards': ({**BASE_CONFIG, 'QUESTION_SHARD_COUNT': 4}, 'search_questions'),
+    'legacy-trigram': ({**BASE_CONFIG, 'QUESTION_TRIGRAM_INDEX': True}, 'search_questions'),
+    'vector': ({**BASE_CONFIG, 'QUESTION_VECTOR_SEARCH': True}, 'vector_search'),
+    'code': ({**BASE_CONFIG, 'QUESTION_CODE_INDEX': True}, 'match_code'),
+    'autocomplete': ({**BASE_CONFIG, 'QUESTION_AUTOCOMPLETE': True}, 'autocomplete'),
+    # 首次加载包含导入 FTS5 题库的时间
+    'fts5': ({**BASE_CONFIG, 'QUESTION_STORAGE_BACKEND': 'sqlite'}, 'search_questions'),
+}
+
+# 查询类型及其在混合查询中的比例
+QUERY_MIX = (
+    ('full', 0.2),       # 粘贴整道题目
+    ('fragment', 0.3),   # 题目中的一段
+    ('keywords', 0.2),   # 两三个知识点关键词
+    ('typo', 0.15),      # 带错别字的题目片段
+    ('code', 0.1),       # 改过变量名和缩进的代码
+    ('miss', 0.05),      # 题库中没有的内容
+)
+
+
+def _typo(rng: random.Random, text: str) -> str:
+    chars = list(text)
+    for _ in range(max(1, len(chars) // 10)):
+        position = rng.randrange(len(chars))
+        action = rng.random()
+        if action < 0.4:
+            del chars[position]
+        elif action < 0.7 and position + 1 < len(chars):
+            chars[position], chars[position + 1] = chars[position + 1], chars[position]
+        else:
+            chars.insert(position, rng.choice('的了是在和有'))
+        if not chars:
+            chars = list(text)
+    return ''.join(chars)
+
+
+def generate_queries(bank: List[Dict], count: int, seed: int = 1) -> List[Tuple[str, str]]:
+    """按 QUERY_MIX 生成 [(查询类型, 查询文本)]"""
+    rng = random.Random(seed)
+    kinds = [kind for kind, _ in QUERY_MIX]
+    weights = [weight for _, weight in QUERY_MIX]
+    code_questions = [q['question'] for q in bank if '\n' in q['question']] or [bank[0]['question']]
+    queries = []
+    while len(queries) < count:
+        kind = rng.choices(kinds, weights)[0]
+        text = rng.choice(bank)['question']
+        if kind == 'full':
+            query = text
+        elif kind == 'fragment':
+            start = rng.randrange(len(text))
+            query = text[start:start + rng.randint(4, 30)]
+        elif kind == 'keywords':
+            query = ' '.join(rng.sample(TOPICS, rng.randint(2, 3)))
+        elif kind == 'typo':
+            start = rng.randrange(len(text))
+            query = _typo(rng, text[start:start + rng.randint(8, 30)])
+        elif kind == 'code':
+            code = rng.choice(code_questions).split('\n', 1)[1]
+            for name in NAMES:
+                code = code.replace(name, rng.choice(NAMES))
+            query = code.replace('    ', '  ')
+        else:
+            query = ''.join(rng.choice('qwxzjkv') for _ in range(rng.randint(4, 10)))
+        if query.strip():
+            queries.append((kind, query))
+    return queries
+
+
+def _rss_bytes() -> Optional[int]:
+    """当前进程的常驻内存（仅 Linux），其他平台返回 None"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def run_variant(size: int, bank_path: str, variant: str, queries: List[Tuple[str, str]], threads: int,
+                trace_memory: bool, cache_size: int) -> Dict:
+    overrides, method = VARIANTS[variant]
+    overrides = {**overrides, 'SEARCH_CACHE_SIZE': cache_size}
+    gc.collect()
+    rss_before = _rss_bytes()
+    start = time.perf_counter()
+    service = create_service(bank_path, **overrides)
+    load_seconds = time.perf_counter() - start
+    gc.collect()
+    rss_after = _rss_bytes()
+    search = getattr(service, method)
+
+    # 预热，避免首次调用的导入与缓存分配计入延迟
+    for _, query in queries[:10]:
+        search(query)
+
+    samples: Dict[str, List[float]] = {}
+    start = time.perf_counter()
+    for kind, query in queries:
+        query_start = time.perf_counter()
+        search(query)
+        samples.setdefault(kind, []).append((time.perf_counter() - query_start) * 1000)
+    serial_seconds = time.perf_counter() - start
+
+    concurrent_qps = None
+    if threads > 1:
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            start = time.perf_counter()
+            list(executor.map(lambda item: search(item[1]), queries))
+            concurrent_qps = len(queries) / (time.perf_counter() - start)
+
+    all_samples = sorted(sample for kind_samples in samples.values() for sample in kind_samples)
+    result = {
+        'size': size, 'variant': variant,
+        'load_seconds': round(load_seconds, 3),
+        'rss_delta_bytes': rss_after - rss_before if rss_before is not None and rss_after is not None else None,
+        'p50_ms': round(percentile(all_samples, 0.5), 3),
+        'p99_ms': round(percentile(all_samples, 0.99), 3),
+        'throughput_qps': round(len(queries) / serial_seconds, 1),
+        'concurrent_qps': round(concurrent_qps, 1) if concurrent_qps else None,
+        'by_kind': {
+            kind: {'count': len(kind_samples),
+                   'p50_ms': round(percentile(sorted(kind_samples), 0.5), 3),
+                   'p99_ms': round(percentile(sorted(kind_samples), 0.99), 3)}
+            for kind, kind_samples in sorted(samples.items())
+        },
+    }
+    service.bank.shards.close()
+    del service, search
+    if trace_memory:
+        # tracemalloc 会明显拖慢加载，单独再加载一次统计 Python 对象占用
+        result['traced_bytes'] = measure(lambda: create_service(bank_path, **overrides))
+    return result
+
+
+def run_isolated(*args) -> Dict:
+    """在单独的子进程中运行一个方案，使各方案的加载耗时与内存互不影响"""
+    if 'fork' not in multiprocessing.get_all_start_methods():
+        return run_variant(*args)
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('fork')) as executor:
+        return executor.submit(run_variant, *args).result()
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='题库搜索基准套件')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--variants', nargs='+', default=['legacy', 'bm25', 'vector'], choices=sorted(VARIANTS))
+    parser.add_argument('--queries', type=int, default=500, help='每个规模的查询数')
+    parser.add_argument('--threads', type=int, default=4, help='并发吞吐量测试的线程数（1 表示不测）')
+    parser.add_argument('--cache-size', type=int, default=0, help='搜索结果缓存大小（默认关闭缓存，测量原始开销）')
+    parser.add_argument('--trace-memory', action='store_true', help='额外用 tracemalloc 统计 Python 对象内存')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('-o', '--output', help='将结果写入 JSON 文件')
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in args.sizes:
+            bank = generate_bank(size, args.seed)
+            bank_path = write_bank(bank, os.path.join(workdir, f'bank_{size}.json'))
+            queries = generate_queries(bank, args.queries, args.seed + 1)
+            del bank
+            for variant in args.variants:
+                result = run_isolated(size, bank_path, variant, queries, args.threads, args.trace_memory,
+                                     args.cache_size)
+                results.append(result)
+                rss = f"{result['rss_delta_bytes'] / 1024 / 1024:.1f}" if result['rss_delta_bytes'] is not None else '-'
+                print(f"{size:>9} {variant:>18} 加载 {result['load_seconds']:>8.2f}s  内存 {rss:>8}MB  "
+                      f"p50 {result['p50_ms']:>9.3f}ms  p99 {result['p99_ms']:>9.3f}ms  "
+                      f"{result['throughput_qps']:>9.1f} 查询/秒", flush=True)
+            os.remove(bank_path)
+
+    if args.output:
+        document = {
+            'meta': {
+                'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'), 'git_revision': _git_revision(),
+                'python': platform.python_version(), 'platform': platform.platform(), 'cpu_count': os.cpu_count(),
+                'queries': args.queries, 'threads': args.threads, 'cache_size': args.cache_size, 'seed': args.seed,
+                'query_mix': dict(QUERY_MIX),
+            },
+            'results': results,
+        }
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(document, f, ensure_ascii=False, indent=2)
+        print(f"结果已写入 {args.output}")
+
+
+if __name__ == '__main__':
+    main()
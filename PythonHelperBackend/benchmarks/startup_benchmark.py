@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+题库启动耗时基准：对比从 JSON 构建与从二进制快照加载的 start-to-ready 时间
+
+用法: python -m benchmarks.startup_benchmark --sizes 1000 100000 1000000
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.harness import create_service, timed, write_bank
+from benchmarks.synthetic_bank import generate_bank
+
+
+def run(size, workdir):
+    bank_path = write_bank(generate_bank(size), os.path.join(workdir, f'bank_{size}.json'))
+    snapshot_path = os.path.join(workdir, f'bank_{size}.snapshot')
+
+    service, json_seconds = timed(lambda: create_service(bank_path))
+    _, write_seconds = timed(lambda: service.write_snapshot(snapshot_path))
+    expected = service.search_questions('以下代码段的输出是什么')
+    del service
+
+    service, snapshot_seconds = timed(lambda: create_service(bank_path, QUESTIONS_SNAPSHOT_PATH=snapshot_path))
+    assert service.search_questions('以下代码段的输出是什么') == expected, '快照加载结果与 JSON 不一致'
+    del service
+
+    result = {
+        'size': size,
+        'json_bytes': os.path.getsize(bank_path),
+        'snapshot_bytes': os.path.getsize(snapshot_path),
+        'json_start_seconds': round(json_seconds, 3),
+        'snapshot_write_seconds': round(write_seconds, 3),
+        'snapshot_start_seconds': round(snapshot_seconds, 3),
+    }
+    os.remove(bank_path)
+    os.remove(snapshot_path)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='题库启动耗时基准')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 100000])
+    parser.add_argument('--json', help='将结果写入 JSON 文件')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        results = [run(size, workdir) for size in args.sizes]
+    print(f"{'题目数':>10} {'JSON启动(s)':>12} {'快照启动(s)':>12} {'加速':>8} {'快照大小(MB)':>14}")
+    for r in results:
+        speedup = r['json_start_seconds'] / r['snapshot_start_seconds'] if r['snapshot_start_seconds'] else 0
+        print(f"{r['size']:>10} {r['json_start_seconds']:>12.3f} {r['snapshot_start_seconds']:>12.3f} "
+              f"{speedup:>7.1f}x {r['snapshot_bytes'] / 1024 / 1024:>14.1f}")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
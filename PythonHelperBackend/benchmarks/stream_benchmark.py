@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+/ai/chat/stream 首字延迟基准：对比先生成完整草稿再审查（sequential）与逐段审查（pipeline）
+
+本地启动一个模拟的 OpenAI 兼容接口，按固定速度逐字流式返回：
+草稿阶段返回一篇多段落（含代码块）的回复，审查阶段原样返回待审查的内容。
+
+用法: python -m benchmarks.stream_benchmark --token-delay 0.005 --paragraphs 8
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from config import Config
+
+REVIEW_PREFIX = '请审查以下回复:\n\n'
+
+
+def make_draft(paragraphs):
+    """生成多段落的草稿，每三段插入一个代码块"""
+    parts = []
+    for index in range(paragraphs):
+        parts.append(f'第{index + 1}部分：' + '这里讲解本题涉及的知识点与思路，' * 8)
+        if index % 3 == 2:
+            parts.append('```python\nfor i in range(n):\n    total += i\n```')
+    return '\n\n'.join(parts)
+
+
+def serve_upstream(draft, token_delay, chunk_chars=4):
+    """启动模拟上游，返回 HTTP 服务器"""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+            last = body['messages'][-1]['content']
+            text = last[len(REVIEW_PREFIX):] if last.startswith(REVIEW_PREFIX) else draft
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            pieces = [text[i:i + chunk_chars] for i in range(0, len(text), chunk_chars)]
+            for piece in pieces + [None]:
+                if piece is None:
+                    line = 'data: [DONE]\n\n'
+                else:
+                    time.sleep(token_delay)
+                    line = 'data: ' + json.dumps({'choices': [{'delta': {'content': piece}}]}) + '\n\n'
+                payload = line.encode()
+                self.wfile.write(f'{len(payload):x}\r\n'.encode() + payload + b'\r\n')
+                self.wfile.flush()
+            self.wfile.write(b'0\r\n\r\n')
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def measure(client, endpoint, question):
+    """发送一次流式请求，返回 (首字延迟秒, 总耗时秒, 收到的内容)"""
+    start = time.perf_counter()
+    response = client.post('/ai/chat/stream', json={
+        'messages': [{'role': 'user', 'content': question}], 'apiEndpoint': endpoint,
+    }, buffered=False)
+    first_token = None
+    content = []
+    for raw in response.response:
+        for line in raw.decode('utf-8').splitlines():
+            if not line.startswith('data: '):
+                continue
+            chunk = json.loads(line[6:])
+            if chunk.get('content') and first_token is None:
+                first_token = time.perf_counter() - start
+            content.append(chunk.get('content', ''))
+    response.close()
+    return first_token, time.perf_counter() - start, ''.join(content)
+
+
+def run(mode, endpoint, runs):
+    config = type('BenchmarkConfig', (Config,), {
+        'AI_STREAM_PIPELINE': mode == 'pipeline',
+        'AI_CACHE_ENABLED': False,
+        'AI_COALESCE_REQUESTS': False,
+        'QUESTION_BANK_RELOAD_INTERVAL': 0,
+    })
+    client = create_app(config).test_client()
+    ttft, total = [], []
+    for index in range(runs):
+        first_token, elapsed, content = measure(client, endpoint, f'问题 {mode} {index}')
+        ttft.append(first_token * 1000)
+        total.append(elapsed * 1000)
+    return {'mode': mode, 'ttft_ms': round(statistics.median(ttft), 1),
+            'total_ms': round(statistics.median(total), 1), 'chars': len(content)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--token-delay', type=float, default=0.005, help='模拟上游每个数据块的间隔秒数')
+    parser.add_argument('--paragraphs', type=int, default=8)
+    parser.add_argument('--runs', type=int, default=3)
+    args = parser.parse_args()
+
+    draft = make_draft(args.paragraphs)
+    server = serve_upstream(draft, args.token_delay)
+    endpoint = f'http://127.0.0.1:{server.server_port}/v1/chat/completions'
+    print(f'草稿 {len(draft)} 字符，每 4 个字符间隔 {args.token_delay * 1000:.1f} ms')
+    for mode in ('sequential', 'pipeline'):
+        print(json.dumps(run(mode, endpoint, args.runs), ensure_ascii=False))
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+生成与 database.json 结构一致的合成题库，供基准测试使用
+
+用法: python -m benchmarks.synthetic_bank 100000 -o /tmp/bank_100k.json
+"""
+
+import argparse
+import json
+import random
+from typing import Dict, List
+
+TOPICS = ['变量', '字符串', '列表', '字典', '元组', '集合', '函数', '循环', '条件语句', '异常处理',
+          '文件操作', '面向对象', '模块', '递归', '切片', '推导式', '生成器', '装饰器', '类型转换', '运算符']
+STEMS = [
+    '以下代码段的输出是什么？',
+    '关于{topic}，下列说法正确的是？',
+    '下列关于{topic}的描述中，错误的是？',
+    '执行以下代码后，变量 {name} 的值是多少？',
+    '在Python中，{topic}的主要作用是什么？',
+    '为什么在使用{topic}时需要注意{other}？',
+]
+JUDGE_STEMS = [
+    '在Python中，{topic}是不可变的。',
+    '{topic}可以作为字典的键。',
+    '使用{topic}时，必须先导入相应的模块。',
+    '表达式 {a} > {b} 的结果为 True。',
+]
+NAMES = ['x', 'y', 'z', 'count', 'total', 'items', 'result', 'data', 'value', 'idx', 'text', 'nums']
+
+
+def _code_snippet(rng: random.Random) -> str:
+    a, b = rng.randint(0, 50), rng.randint(0, 50)
+    name, other = rng.sample(NAMES, 2)
+    templates = [
+        f"{name} = {a}\n{other} = {b}\nif {name} > {other}:\n    print(\"A\")\nelse:\n    print(\"B\")",
+        f"{name} = [i * {a % 5 + 1} for i in range({b % 10 + 1})]\nprint(sum({name}))",
+        f"def f({name}):\n    return {name} + {a}\n\nprint(f({b}))",
+        f"{name} = {{'k': {a}}}\nfor key in {name}:\n    print(key, {name}[key] + {b})",
+        f"{name} = 0\nwhile {name} < {a}:\n    {name} += {b % 7 + 1}\nprint({name})",
+    ]
+    return rng.choice(templates)
+
+
+def generate_question(rng: random.Random, number: int) -> Dict:
+    """生成一道合成题目"""
+    topic, other = rng.sample(TOPICS, 2)
+    name = rng.choice(NAMES)
+    if rng.random() < 0.45:
+        stem = rng.choice(JUDGE_STEMS).format(topic=topic, a=rng.randint(0, 99), b=rng.randint(0, 99))
+        if rng.random() < 0.3:
+            stem += '\n' + _code_snippet(rng)
+        return {
+            'question_type': '判断题', 'question_number': str(number),
+            'question': stem, 'options': [], 'answer': rng.choice(['True', 'False'])
+        }
+    stem = rng.choice(STEMS).format(topic=topic, other=other, name=name)
+    if '代码' in stem or '变量' in stem or rng.random() < 0.3:
+        stem += '\n' + _code_snippet(rng)
+    options = [f"{letter}. {rng.choice(TOPICS)}{rng.choice(['可以', '不能', '必须', '通常'])}{rng.choice(TOPICS)}"
+               for letter in 'ABCD']
+    return {
+        'question_type': '单选题', 'question_number': str(number),
+        'question': stem, 'options': options, 'answer': rng.choice('ABCD')
+    }
+
+
+def generate_bank(size: int, seed: int = 0) -> List[Dict]:
+    """生成指定题目数量的合成题库"""
+    rng = random.Random(seed)
+    return [generate_question(rng, number) for number in range(1, size + 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='生成合成题库')
+    parser.add_argument('size', type=int, help='题目数量')
+    parser.add_argument('-o', '--output', required=True, help='输出 JSON 文件路径')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(generate_bank(args.size, args.seed), f, ensure_ascii=False)
+    print(f"已生成 {args.size} 道题目: {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+搜索延迟基准：对比逐题评分（legacy、bm25）与 TF-IDF 向量搜索
+
+用法: python -m benchmarks.vector_benchmark --sizes 10000 100000
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.harness import create_service, latency, sample_queries, write_bank
+from benchmarks.synthetic_bank import generate_bank
+
+
+def run(size, query_count, workdir):
+    bank = generate_bank(size)
+    bank_path = write_bank(bank, os.path.join(workdir, f'bank_{size}.json'))
+    queries = sample_queries(bank, query_count)
+
+    results = []
+    for scorer in ('legacy', 'bm25'):
+        service = create_service(bank_path, QUESTION_SEARCH_SCORER=scorer)
+        p50, p99 = latency(service.search_questions, queries)
+        results.append({'size': size, 'mode': scorer, 'p50_ms': round(p50, 3), 'p99_ms': round(p99, 3)})
+    service = create_service(bank_path, QUESTION_VECTOR_SEARCH=True)
+    assert service.bank.vector_index is not None, '向量搜索不可用（需要 NumPy）'
+    p50, p99 = latency(service.vector_search, queries)
+    start = time.perf_counter()
+    service.vector_search_batch(queries)
+    batch_ms = (time.perf_counter() - start) * 1000 / len(queries)
+    results.append({'size': size, 'mode': 'vector', 'p50_ms': round(p50, 3), 'p99_ms': round(p99, 3),
+                    'batch_ms_per_query': round(batch_ms, 3)})
+    os.remove(bank_path)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='搜索延迟基准')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--queries', type=int, default=200, help='每个规模的查询数')
+    parser.add_argument('--json', help='将结果写入 JSON 文件')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        results = [row for size in args.sizes for row in run(size, args.queries, workdir)]
+    print(f"{'题目数':>10} {'模式':>8} {'p50(ms)':>10} {'p99(ms)':>10} {'批量(ms/查询)':>14}")
+    for r in results:
+        batch = f"{r['batch_ms_per_query']:>14.3f}" if 'batch_ms_per_query' in r else f"{'-':>14}"
+        print(f"{r['size']:>10} {r['mode']:>8} {r['p50_ms']:>10.3f} {r['p99_ms']:>10.3f} {batch}")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
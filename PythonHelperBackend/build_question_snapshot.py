@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+构建题库二进制快照：预先解析 database.json 并建好倒排索引与评分器，
+服务启动时直接加载快照，题库文件修改后快照自动失效并回退到 JSON。
+
+用法: python build_question_snapshot.py [-o database.snapshot]
+"""
+
+import argparse
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from flask import Flask
+from config import Config
+from app.services.question_service import QuestionService
+
+
+def build_snapshot(config_class=Config, output=None):
+    """按配置加载题库并写入快照，返回快照路径"""
+    app = Flask(__name__)
+    app.config.from_object(config_class)
+    # 始终从 JSON 重新构建，不读取已有快照
+    app.config['QUESTIONS_SNAPSHOT_PATH'] = None
+    with app.app_context():
+        service = QuestionService()
+    return service.write_snapshot(output or config_class.QUESTIONS_SNAPSHOT_PATH)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='构建题库二进制快照')
+    parser.add_argument('-o', '--output', help='快照输出路径（默认使用配置中的 QUESTIONS_SNAPSHOT_PATH）')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    start = time.perf_counter()
+    path = build_snapshot(output=args.output)
+    print(f"快照已生成: {path} ({os.path.getsize(path) / 1024 / 1024:.1f} MB, 用时 {time.perf_counter() - start:.2f}s)")
+
+
+if __name__ == '__main__':
+    main()
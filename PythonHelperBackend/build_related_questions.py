@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+离线构建相关题目图：为每道题目计算 TF-IDF 余弦相似度最高的 k 道其他题目，
+写入与 database.json 同目录的 database.related.json，服务加载题库时读取，
+/questions/<id>/related 请求时只需查表。题库修改后需重新运行并重新加载题库。
+
+用法: python build_related_questions.py [-k 10] [-o database.related.json]
+"""
+
+import argparse
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from flask import Flask
+from config import Config
+from app.services.question_service import QuestionService
+
+
+def build_related(config_class=Config, output=None, top_k=10):
+    """按配置加载题库并写入相关题目图，返回文件路径"""
+    app = Flask(__name__)
+    app.config.from_object(config_class)
+    # 不读取旧的相关题目图
+    app.config['RELATED_QUESTIONS_PATH'] = None
+    with app.app_context():
+        service = QuestionService()
+    return service.write_related_graph(output or config_class.RELATED_QUESTIONS_PATH, top_k)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='离线构建相关题目图')
+    parser.add_argument('-k', '--top-k', type=int, default=10, help='每道题目保留的相关题目数量')
+    parser.add_argument('-o', '--output', help='输出路径（默认使用配置中的 RELATED_QUESTIONS_PATH）')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    start = time.perf_counter()
+    path = build_related(output=args.output, top_k=args.top_k)
+    print(f"相关题目图已生成: {path} ({os.path.getsize(path) / 1024 / 1024:.1f} MB, 用时 {time.perf_counter() - start:.2f}s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -18,6 +18,80 @@ class ProductionConfig:
 
     # 题库数据文件路径
     QUESTIONS_DB_PATH_NEW = 'database.json'
+    # 预先构建的题库二进制快照（由 build_question_snapshot.py 生成），过期时自动回退到 JSON
+    QUESTIONS_SNAPSHOT_PATH = os.environ.get('QUESTIONS_SNAPSHOT_PATH', 'database.snapshot')
+    # 离线计算的相关题目图（由 build_related_questions.py 生成）
+    RELATED_QUESTIONS_PATH = os.environ.get('RELATED_QUESTIONS_PATH', 'database.related.json')
+    # 题库存储: memory（内存索引）或 sqlite（导入 FTS5 题库，检索在 SQLite 中完成，多进程共享）
+    QUESTION_STORAGE_BACKEND = os.environ.get('QUESTION_STORAGE_BACKEND', 'memory').lower()
+    # FTS5 题库文件，未设置时为题库文件旁边的 database.fts.db
+    QUESTIONS_FTS_PATH = os.environ.get('QUESTIONS_FTS_PATH')
+
+    # 题库搜索评分器: legacy（原有规则）或 bm25
+    QUESTION_SEARCH_SCORER = os.environ.get('QUESTION_SEARCH_SCORER', 'legacy')
+    BM25_K1 = float(os.environ.get('BM25_K1', 1.2))
+    BM25_B = float(os.environ.get('BM25_B', 0.75))
+
+    # /search 单次请求最多返回的命中数量
+    SEARCH_MAX_TOP_K = 50
+    # /search/batch 单次请求最多包含的查询数
+    SEARCH_BATCH_MAX_QUERIES = 100
+    # /questions 分页时单页最多返回的题目数
+    QUESTIONS_PAGE_MAX_LIMIT = 1000
+
+    # 题库分片：hash 按题目编号哈希划分为 QUESTION_SHARD_COUNT 片，course 按题目的 course 字段划分
+    QUESTION_SHARD_BY = os.environ.get('QUESTION_SHARD_BY', 'hash')
+    QUESTION_SHARD_COUNT = int(os.environ.get('QUESTION_SHARD_COUNT', 1))
+    # 分片并行搜索的进程数（0 表示在请求线程内搜索），候选数达到阈值的查询才会并行
+    QUESTION_SEARCH_PROCESSES = int(os.environ.get('QUESTION_SEARCH_PROCESSES', 0))
+    QUESTION_PARALLEL_MIN_CANDIDATES = int(os.environ.get('QUESTION_PARALLEL_MIN_CANDIDATES', 20000))
+
+    # 可选索引（三元组、代码、向量、前缀提示）默认关闭，按需开启；每个索引都会增加题库加载耗时与每个工作进程的内存
+    # 容错搜索：按字符三元组重合度筛选相似题目，避免查询有错别字时扫描全库
+    QUESTION_TRIGRAM_INDEX = os.environ.get('QUESTION_TRIGRAM_INDEX', 'false').lower() == 'true'
+    QUESTION_TRIGRAM_MAX_CANDIDATES = int(os.environ.get('QUESTION_TRIGRAM_MAX_CANDIDATES', 200))
+    QUESTION_TRIGRAM_MIN_OVERLAP = float(os.environ.get('QUESTION_TRIGRAM_MIN_OVERLAP', 0.3))
+
+    # 代码片段匹配（/search 的 mode=code）：MinHash/LSH 索引（默认关闭，加载题库时为含代码的题目计算签名）与最低相似度
+    QUESTION_CODE_INDEX = os.environ.get('QUESTION_CODE_INDEX', 'false').lower() == 'true'
+    QUESTION_CODE_MIN_SIMILARITY = float(os.environ.get('QUESTION_CODE_MIN_SIMILARITY', 0.5))
+
+    # 向量搜索（/search 的 mode=vector）：加载时构建稀疏 TF-IDF 矩阵，需要 NumPy
+    QUESTION_VECTOR_SEARCH = os.environ.get('QUESTION_VECTOR_SEARCH', 'false').lower() == 'true'
+
+    # 输入框前缀提示（/autocomplete）：加载时构建排序前缀数组，每个前缀最多返回的提示数
+    QUESTION_AUTOCOMPLETE = os.environ.get('QUESTION_AUTOCOMPLETE', 'false').lower() == 'true'
+    AUTOCOMPLETE_MAX_SUGGESTIONS = int(os.environ.get('AUTOCOMPLETE_MAX_SUGGESTIONS', 10))
+
+    # AI 接口 HTTP 客户端：每个端点的长连接池大小、连接超时与读取超时（秒）、最多保留连接池的端点数
+    AI_HTTP_POOL_SIZE = int(os.environ.get('AI_HTTP_POOL_SIZE', 10))
+    AI_HTTP_CONNECT_TIMEOUT = float(os.environ.get('AI_HTTP_CONNECT_TIMEOUT', 10))
+    AI_HTTP_READ_TIMEOUT = float(os.environ.get('AI_HTTP_READ_TIMEOUT', 600))
+    AI_HTTP_MAX_ENDPOINTS = int(os.environ.get('AI_HTTP_MAX_ENDPOINTS', 8))
+    # AI 回复缓存：相同提示词直接返回已缓存的回复；缓存文件（默认在 mistakes.db 同一目录的 ai_cache.db）、
+    # 过期秒数、最多条目数与最大总字节数
+    AI_CACHE_ENABLED = os.environ.get('AI_CACHE_ENABLED', 'true').lower() == 'true'
+    AI_CACHE_PATH = os.environ.get('AI_CACHE_PATH')
+    AI_CACHE_TTL = int(os.environ.get('AI_CACHE_TTL', 7 * 24 * 3600))
+    AI_CACHE_MAX_ENTRIES = int(os.environ.get('AI_CACHE_MAX_ENTRIES', 10000))
+    AI_CACHE_MAX_BYTES = int(os.environ.get('AI_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+    # 合并同时进行的相同 AI 请求：只有第一个发往上游，其余等待其结果或共享其流式输出
+    AI_COALESCE_REQUESTS = os.environ.get('AI_COALESCE_REQUESTS', 'true').lower() == 'true'
+    # /ai/chat/stream 流水线模式（默认关闭）：草稿按段落切分后逐段审查并流式返回；
+    # 每个请求额外占用一个草稿线程与最多 AI_STREAM_PIPELINE_MAX_PARALLEL 个审查线程，且审查按段进行，输出与整篇审查不同；
+    # 每段最少字符数（过短的段落与下一段合并）与同时审查的段数
+    AI_STREAM_PIPELINE = os.environ.get('AI_STREAM_PIPELINE', 'false').lower() == 'true'
+    AI_STREAM_PIPELINE_MIN_CHARS = int(os.environ.get('AI_STREAM_PIPELINE_MIN_CHARS', 200))
+    AI_STREAM_PIPELINE_MAX_PARALLEL = int(os.environ.get('AI_STREAM_PIPELINE_MAX_PARALLEL', 4))
+
+    # /search 结果缓存：最多缓存的查询数（0 表示关闭）与过期秒数
+    SEARCH_CACHE_SIZE = int(os.environ.get('SEARCH_CACHE_SIZE', 1024))
+    SEARCH_CACHE_TTL = int(os.environ.get('SEARCH_CACHE_TTL', 300))
+
+    # 题库热加载：轮询题库文件修改时间的间隔秒数（0 表示关闭）
+    QUESTION_BANK_RELOAD_INTERVAL = float(os.environ.get('QUESTION_BANK_RELOAD_INTERVAL', 10))
+    # 管理员令牌，用于 POST /questions/reload（未设置时该接口关闭）
+    ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
 
     # 服务器域名
     SERVER_DOMAIN = os.environ.get('SERVER_DOMAIN', 'your-domain.com')
@@ -58,6 +132,9 @@ class DevelopmentConfig:
     PPT_UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ppt_files')
     ALLOWED_EXTENSIONS = {'ppt', 'pptx', 'doc', 'docx', 'pdf'}
     QUESTIONS_DB_PATH_NEW = 'database.json'
+    QUESTIONS_SNAPSHOT_PATH = os.environ.get('QUESTIONS_SNAPSHOT_PATH', 'database.snapshot')
+    RELATED_QUESTIONS_PATH = os.environ.get('RELATED_QUESTIONS_PATH', 'database.related.json')
+    QUESTION_SEARCH_SCORER = os.environ.get('QUESTION_SEARCH_SCORER', 'legacy')
 
     SERVER_DOMAIN = 'localhost:5000'
     SERVER_URL = 'http://localhost:5000'
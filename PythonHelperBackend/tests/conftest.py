@@ -0,0 +1,5 @@
+import os
+import tempfile
+
+# 导入蓝图时会按 DATABASE_PATH 初始化错题数据库：测试使用临时文件，不改动仓库中的 mistakes.db
+os.environ['DATABASE_PATH'] = os.path.join(tempfile.mkdtemp(prefix='helper-tests-'), 'mistakes.db')
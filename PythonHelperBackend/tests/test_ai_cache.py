@@ -0,0 +1,142 @@
+import json
+import sqlite3
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from app.services import ai_cache, ai_service
+from app.services.ai_cache import AIResponseCache, make_cache_key
+
+REPLY = ['第一段', '，第二段', '，结束。']
+
+
+def sse_body(parts, finished=True):
+    events = [{'choices': [{'delta': {'content': part}}]} for part in parts]
+    body = b''.join(b'data: ' + json.dumps(event, ensure_ascii=False).encode('utf-8') + b'\n\n' for event in events)
+    return body + (b'data: [DONE]\n\n' if finished else b'')
+
+
+class ChatHandler(BaseHTTPRequestHandler):
+    """/full 返回完整的流式回复，/cut 的回复在 [DONE] 之前中断"""
+    protocol_version = 'HTTP/1.1'
+    calls = []
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers['Content-Length']))
+        type(self).calls.append(self.path)
+        body = sse_body(REPLY, finished=self.path.startswith('/full'))
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture(scope='module')
+def server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), ChatHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{server.server_port}'
+    server.shutdown()
+
+
+@pytest.fixture
+def cache(tmp_path):
+    ChatHandler.calls.clear()
+    yield ai_service.configure_ai_cache({'AI_CACHE_PATH': str(tmp_path / 'ai_cache.db')})
+    ai_service.configure_ai_cache({'AI_CACHE_ENABLED': False})
+
+
+def stream(endpoint, question='什么是列表？'):
+    return list(ai_service.call_ai_api_stream([{'role': 'user', 'content': question}], 'key', endpoint, '系统提示'))
+
+
+def content_of(chunks):
+    return ''.join(chunk['content'] for chunk in chunks if not chunk.get('error'))
+
+
+def test_entry_expires_after_ttl(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(ai_cache.time, 'time', lambda: now[0])
+    cache = AIResponseCache(str(tmp_path / 'ai_cache.db'), ttl=60)
+    cache.put('key', 'model', '回复')
+    now[0] += 59
+    assert cache.get('key') == '回复'
+    now[0] += 2
+    assert cache.get('key') is None
+    assert cache.stats()['entries'] == 0
+    assert (cache.stats()['hits'], cache.stats()['misses']) == (1, 1)
+
+
+def test_put_evicts_expired_and_least_recently_used(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(ai_cache.time, 'time', lambda: now[0])
+    cache = AIResponseCache(str(tmp_path / 'ai_cache.db'), ttl=60, max_entries=2)
+    cache.put('old', 'model', 'a')
+    now[0] += 61
+    cache.put('first', 'model', 'b')
+    assert cache.stats()['entries'] == 1
+    now[0] += 1
+    cache.put('second', 'model', 'c')
+    now[0] += 1
+    cache.get('first')
+    now[0] += 1
+    cache.put('third', 'model', 'd')
+    assert [cache.get(key) for key in ('first', 'second', 'third')] == ['b', None, 'd']
+
+
+def test_cache_key_ignores_whitespace_but_not_indentation():
+    messages = [{'role': 'user', 'content': 'for i in x:\n    print(i)'}]
+    assert make_cache_key('http://A/v1', 'm', messages) == make_cache_key(
+        'http://a/v1 ', 'm', [{'role': 'user', 'content': 'for i in x:  \r\n    print(i)\n'}])
+    assert make_cache_key('http://a/v1', 'm', messages) != make_cache_key(
+        'http://a/v1', 'm', [{'role': 'user', 'content': 'for i in x:\nprint(i)'}])
+
+
+def test_streamed_reply_is_served_from_cache(server, cache):
+    first = stream(server + '/full')
+    assert content_of(first) == ''.join(REPLY)
+    assert first[-1] == {'content': '', 'done': True}
+
+    second = stream(server + '/full')
+    assert content_of(second) == ''.join(REPLY)
+    assert second[-1] == {'content': '', 'done': True, 'cached': True}
+    assert ChatHandler.calls == ['/full']
+    # 流式得到的回复同样供非流式接口使用
+    assert ai_service.call_ai_api('什么是列表？', 'key', server + '/full', '系统提示') == ''.join(REPLY)
+    assert ChatHandler.calls == ['/full']
+
+
+def test_interrupted_stream_is_not_cached(server, cache):
+    assert content_of(stream(server + '/cut')) == ''.join(REPLY)
+    assert cache.stats()['entries'] == 0
+    stream(server + '/cut')
+    assert ChatHandler.calls == ['/cut', '/cut']
+
+
+def test_unopenable_cache_is_disabled(tmp_path, server):
+    blocker = tmp_path / 'not-a-directory'
+    blocker.write_text('')
+    try:
+        assert ai_service.configure_ai_cache({'AI_CACHE_PATH': str(blocker / 'ai_cache.db')}) is None
+        ChatHandler.calls.clear()
+        assert content_of(stream(server + '/full')) == ''.join(REPLY)
+        assert content_of(stream(server + '/full')) == ''.join(REPLY)
+        assert len(ChatHandler.calls) == 2
+    finally:
+        ai_service.configure_ai_cache({'AI_CACHE_ENABLED': False})
+
+
+def test_unwritable_cache_keeps_answering(server, cache, caplog):
+    # 换成只读连接，模拟缓存文件无法写入（磁盘已满、权限变化等）
+    cache._local.connection = sqlite3.connect(f'file:{cache.path}?mode=ro', uri=True, isolation_level=None)
+    with caplog.at_level('WARNING', logger=ai_cache.__name__):
+        first = stream(server + '/full')
+        second = stream(server + '/full')
+    assert content_of(first) == content_of(second) == ''.join(REPLY)
+    assert not any(chunk.get('error') or chunk.get('cached') for chunk in first + second)
+    assert len(ChatHandler.calls) == 2
+    assert '写入 AI 回复缓存失败' in caplog.text
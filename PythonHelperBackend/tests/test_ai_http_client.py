@@ -0,0 +1,57 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from app.services.ai_service import AIHttpClient
+
+STREAM_BODY = b''.join(b'data: %d\n\n' % i for i in range(3)) + b'data: [DONE]\n\n'
+
+
+class StreamHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers['Content-Length']))
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(STREAM_BODY)))
+        self.end_headers()
+        for start in range(0, len(STREAM_BODY), 8):
+            self.wfile.write(STREAM_BODY[start:start + 8])
+            self.wfile.flush()
+            time.sleep(0.005)
+
+
+@pytest.fixture(scope='module')
+def endpoints():
+    servers = [ThreadingHTTPServer(('127.0.0.1', 0), StreamHandler) for _ in range(4)]
+    for server in servers:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield [f'http://127.0.0.1:{server.server_port}/v1/chat/completions' for server in servers]
+    for server in servers:
+        server.shutdown()
+
+
+def test_evicted_endpoint_removes_counters(endpoints):
+    client = AIHttpClient(max_endpoints=2)
+    for url in endpoints:
+        client.post(url, json={}).close()
+    assert set(client.stats()) == {client._origin(url) for url in endpoints[2:]}
+    assert len(client._endpoints) == 2
+
+
+def test_evicted_endpoint_stays_open_while_streaming(endpoints):
+    # 流式响应进行中其端点被淘汰，连接池应等流结束后再关闭
+    client = AIHttpClient(max_endpoints=2)
+    lines = client.stream_lines(endpoints[0], json={})
+    assert next(lines) == b'data: 0'
+    endpoint = client._endpoints[client._origin(endpoints[0])]
+    for url in endpoints[1:]:
+        client.post(url, json={}).close()
+    assert endpoint.evicted and endpoint.users == 1
+    assert [line for line in lines if line] == [b'data: 1', b'data: 2', b'data: [DONE]']
+    assert endpoint.users == 0
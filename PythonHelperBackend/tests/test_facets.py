@@ -0,0 +1,109 @@
+import pytest
+
+from app.services.facets import FacetIndex, normalize_filters
+from test_search import create_service
+
+QUESTIONS = [
+    {'question_type': '单选题', 'course': 'Python', 'tags': ['循环', '列表']},
+    {'question_type': '判断题', 'course': 'Python', 'tags': '字符串'},
+    {'question_type': '单选题', 'course': 'C', 'tags': ['循环']},
+    {'question_type': '判断题', 'course': 'C'},
+    {'question_type': '单选题', 'course': '', 'tags': [None, '列表']},
+    {'question_type': '填空题', 'course': 'Python', 'tags': []},
+]
+
+
+def brute_force(questions, filters):
+    """逐题判断：同一字段的取值为“或”，不同字段之间为“且”"""
+    def values(question, field):
+        if field == 'tag':
+            tags = question.get('tags')
+            tags = [tags] if isinstance(tags, str) else tags or []
+            return {str(tag) for tag in tags if tag not in (None, '')}
+        value = question.get(field)
+        return set() if value in (None, '') else {str(value)}
+
+    return [doc_id for doc_id, question in enumerate(questions)
+            if all(values(question, field) & set(wanted) for field, wanted in filters.items())]
+
+
+@pytest.fixture
+def index():
+    return FacetIndex(QUESTIONS, cache_size=2)
+
+
+def resolve(index, raw):
+    return index.resolve(normalize_filters(raw))
+
+
+def test_single_filter_mask(index):
+    facet = resolve(index, {'question_type': '单选题'})
+    assert list(facet.doc_ids) == [0, 2, 4]
+    assert list(facet.mask) == [1, 0, 1, 0, 1, 0]
+    assert 2 in facet and 1 not in facet
+
+
+def test_combined_filters_match_brute_force(index):
+    cases = [
+        {'question_type': ['单选题'], 'course': ['Python']},
+        {'question_type': ['单选题', '判断题'], 'course': ['C']},
+        {'tag': ['循环'], 'course': ['Python', 'C']},
+        {'tag': ['列表', '字符串']},
+        {'question_type': ['单选题'], 'tag': ['列表'], 'course': ['Python']},
+    ]
+    for raw in cases:
+        facet = resolve(index, raw)
+        expected = brute_force(QUESTIONS, normalize_filters(raw))
+        assert list(facet.doc_ids) == expected, raw
+        assert [doc_id for doc_id, flag in enumerate(facet.mask) if flag] == expected, raw
+
+
+def test_unknown_value_matches_nothing(index):
+    assert len(resolve(index, {'course': 'Java'})) == 0
+    assert not any(resolve(index, {'question_type': '单选题', 'course': 'Java'}).mask)
+    # 未知取值与已知取值同属一个字段时，只是不增加结果
+    assert list(resolve(index, {'course': ['Java', 'C']}).doc_ids) == [2, 3]
+
+
+def test_apply_keeps_candidate_order(index):
+    facet = resolve(index, {'course': 'Python'})
+    assert facet.apply([5, 4, 1, 0, 3]) == [5, 1, 0]
+
+
+def test_mask_is_cached_by_normalized_filters(index):
+    first = resolve(index, {'course': ['C', 'Python'], 'question_type': '单选题'})
+    again = resolve(index, {'question_type': ['单选题'], 'course': ['Python', 'C', 'C']})
+    assert again is first
+    # 超出 cache_size 后最久未用的条目被淘汰，重新计算的结果相同
+    resolve(index, {'course': 'C'})
+    resolve(index, {'tag': '循环'})
+    recomputed = resolve(index, {'course': ['C', 'Python'], 'question_type': '单选题'})
+    assert recomputed is not first and list(recomputed.doc_ids) == list(first.doc_ids)
+
+
+def test_counts_skip_empty_values(index):
+    assert index.counts('course') == {'Python': 3, 'C': 2}
+    assert index.counts('tag') == {'循环': 2, '列表': 2, '字符串': 1}
+
+
+def test_no_filters_resolve_to_none(index):
+    assert resolve(index, None) is None
+    assert resolve(index, {}) is None
+
+
+@pytest.mark.parametrize('raw', [
+    {'difficulty': '简单'},
+    {'course': []},
+    {'course': 3},
+    ['course'],
+])
+def test_invalid_filters_raise(raw):
+    with pytest.raises(ValueError):
+        normalize_filters(raw)
+
+
+def test_search_with_unknown_facet_value_returns_nothing():
+    service = create_service()
+    assert service.search_questions('print', filters={'question_type': '不存在的题型'}) == []
+    hits = service.search_questions('print', top_k=10, filters={'question_type': '判断题'})
+    assert hits and all(hit['question_type'] == '判断题' for hit in hits)
@@ -0,0 +1,35 @@
+import pytest
+
+from config import Config
+from app import create_app
+from test_search import BANK_PATH
+
+
+@pytest.fixture(scope='module')
+def client(tmp_path_factory):
+    workdir = tmp_path_factory.mktemp('app')
+
+    class TestConfig(Config):
+        QUESTIONS_DB_PATH_NEW = BANK_PATH
+        QUESTIONS_SNAPSHOT_PATH = None
+        RELATED_QUESTIONS_PATH = None
+        QUESTION_BANK_RELOAD_INTERVAL = 0
+        PPT_UPLOAD_FOLDER = str(workdir / 'ppt')
+        AI_CACHE_ENABLED = False
+        ADMIN_TOKEN = 'secret'
+
+    return create_app(TestConfig).test_client()
+
+
+@pytest.mark.parametrize('token', [None, 'wrong', 'sécret', 'ÿ' * 6])
+def test_reload_rejects_invalid_token(client, token):
+    headers = {'X-Admin-Token': token} if token is not None else {}
+    response = client.post('/questions/reload', headers=headers)
+    assert response.status_code == 403
+    assert response.json['status'] == 'error'
+
+
+def test_reload_accepts_admin_token(client):
+    response = client.post('/questions/reload', headers={'X-Admin-Token': 'secret'})
+    assert response.status_code == 202
+    assert response.json['status'] == 'accepted'
@@ -0,0 +1,213 @@
+import json
+import os
+import random
+
+import pytest
+from flask import Flask
+
+from config import Config
+from app.services.question_service import QuestionService
+from app.services.question_shards import ParallelShardPool
+from app.services.scorers import SearchQuery, legacy_score
+
+BANK_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'database.json')
+
+
+def create_service(**overrides):
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    app.config.update({'QUESTIONS_DB_PATH_NEW': BANK_PATH, 'QUESTIONS_SNAPSHOT_PATH': None,
+                       'QUESTION_STORAGE_BACKEND': 'memory', 'SEARCH_CACHE_SIZE': 0,
+                       'QUESTION_SEARCH_PROCESSES': 0, 'QUESTION_BANK_RELOAD_INTERVAL': 0, **overrides})
+    with app.app_context():
+        return QuestionService()
+
+
+def full_scan(questions, query, top_k=5):
+    """原先的整库扫描：关键词得分大于 0 的按总分取前 top_k，否则返回总分最高的一道（is_fallback）"""
+    search_query = SearchQuery(query)
+    scored = []
+    for doc_id, question in enumerate(questions):
+        total_score, score = legacy_score(search_query, question.get('question', '').lower())
+        scored.append((doc_id, total_score, score))
+    hits = [item for item in scored if item[2] > 0]
+    if hits:
+        return [(doc_id, round(total, 6), False)
+                for doc_id, total, _ in sorted(hits, key=lambda item: item[1], reverse=True)[:top_k]]
+    doc_id, total, _ = max(scored, key=lambda item: (item[1], -item[0]))
+    return [(doc_id, round(total, 6), True)]
+
+
+def result_keys(service, results):
+    index = {record.id: doc_id for doc_id, record in enumerate(service.formatted_questions)}
+    return [(index[hit['id']], round(hit['score'], 6), hit.get('is_fallback', False)) for hit in results]
+
+
+def sample_queries(questions, count, seed=7):
+    """题目中截取的片段（含单词的一部分、单个字符）"""
+    rng = random.Random(seed)
+    queries = ['int', 'i', '-elif', '3={', 'print', 'for i in', '列表', 'x', 'def f']
+    while len(queries) < count:
+        text = rng.choice(questions)['question']
+        start = rng.randrange(len(text))
+        query = text[start:start + rng.randint(1, 12)].strip()
+        if query:
+            queries.append(query)
+    return queries
+
+
+@pytest.fixture(scope='module')
+def service():
+    return create_service(QUESTION_SEARCH_SCORER='legacy')
+
+
+@pytest.fixture(scope='module')
+def questions():
+    with open(BANK_PATH, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def test_search_matches_full_scan(service, questions):
+    for query in sample_queries(questions, 200):
+        assert result_keys(service, service.search_questions(query)) == full_scan(questions, query), query
+
+
+def test_batch_search_matches_full_scan(service, questions):
+    queries = sample_queries(questions, 100, seed=11)
+    for query, results in zip(queries, service.search_questions_batch(queries)):
+        assert result_keys(service, results) == full_scan(questions, query), query
+
+
+def test_fallback_scans_bank_when_candidates_never_score(questions, monkeypatch):
+    # 按检索词取候选时，“3={” 的检索词 3 有命中但没有任何题目得到关键词得分，兜底结果仍应取自全库
+    from app.services.scorers import LegacyScorer, QuestionScorer
+    monkeypatch.setattr(LegacyScorer, 'candidates', QuestionScorer.candidates)
+    service = create_service(QUESTION_SEARCH_SCORER='legacy')
+    assert service.search_index.candidates(SearchQuery('3={').tokens)
+    for query in ('3={', 'x = 1'):
+        assert result_keys(service, service.search_questions(query)) == full_scan(questions, query), query
+        assert result_keys(service, service.search_questions_batch([query])[0]) == full_scan(questions, query)
+
+
+def test_bm25_pruning_keeps_top_k(questions):
+    # MaxScore 剪枝的结果应与对全部候选评分后排序一致
+    from app.services.scorers import rank_candidates
+    service = create_service(QUESTION_SEARCH_SCORER='bm25')
+    scorer = service.scorer
+    for query in sample_queries(questions, 200, seed=3):
+        search_query = SearchQuery(query)
+        candidates = service.search_index.candidates(search_query.tokens)
+        for top_k in (1, 5):
+            expected = sorted(scorer.score_candidates(search_query, candidates),
+                              key=lambda item: (-item[1], item[0]))[:top_k]
+            ranked = rank_candidates(search_query, candidates, top_k, scorer).hits()
+            assert [doc_id for doc_id, _, _ in ranked] == [doc_id for doc_id, _, _ in expected], query
+
+
+@pytest.mark.skipif(not ParallelShardPool.available(), reason='需要 fork')
+def test_shard_pool_matches_single_process(service, questions):
+    # 进程池在各版本题库间共用：重新加载后子进程应使用新题库，单个与批量搜索都与单进程一致
+    parallel = create_service(QUESTION_SEARCH_SCORER='legacy', QUESTION_SEARCH_PROCESSES=2,
+                              QUESTION_PARALLEL_MIN_CANDIDATES=0)
+    try:
+        queries = sample_queries(questions, 40, seed=5)
+        for reload in (False, True):
+            if reload:
+                assert parallel.reload_questions_db()
+            assert parallel.bank.shards.pool is parallel.shard_pool
+            for query in queries:
+                assert (result_keys(parallel, parallel.search_questions(query))
+                        == result_keys(service, service.search_questions(query))), query
+            searches = sum(shard['searches'] for shard in parallel.bank.shards.stats())
+            batch = parallel.search_questions_batch(queries)
+            assert sum(shard['searches'] for shard in parallel.bank.shards.stats()) > searches
+            assert ([result_keys(parallel, results) for results in batch]
+                    == [result_keys(service, results) for results in service.search_questions_batch(queries)])
+    finally:
+        parallel.shard_pool.close()
+
+
+@pytest.mark.skipif(not ParallelShardPool.available(), reason='需要 fork')
+def test_shard_pool_cleans_up_and_fails_over_once(service, questions, caplog):
+    parallel = create_service(QUESTION_SEARCH_SCORER='legacy', QUESTION_SEARCH_PROCESSES=1,
+                              QUESTION_PARALLEL_MIN_CANDIDATES=0)
+    pool = parallel.shard_pool
+    try:
+        first_path = pool.payload_path
+        assert parallel.reload_questions_db()
+        assert not os.path.exists(first_path) and os.path.exists(pool.payload_path)
+
+        submits = []
+
+        def broken_submit(*args, **kwargs):
+            submits.append(args)
+            raise RuntimeError('worker died')
+        pool.executor.submit = broken_submit
+        for query in ('print', 'for i in', '列表'):
+            assert (result_keys(parallel, parallel.search_questions(query))
+                    == result_keys(service, service.search_questions(query))), query
+        assert pool.broken and len(submits) == 1
+        assert sum('分片并行搜索失败' in record.getMessage() for record in caplog.records) == 1
+    finally:
+        del pool.executor.submit
+        last_path = pool.payload_path
+        pool.close()
+    assert not os.path.exists(last_path)
+
+
+def test_malformed_bank_with_fts_backend_uses_default_questions(tmp_path):
+    # FTS5 导入时题库文件格式错误，应与内存索引一样改用默认数据，而不是让应用启动失败
+    bank_path = tmp_path / 'database.json'
+    bank_path.write_text('{"broken": ', encoding='utf-8')
+    service = create_service(QUESTIONS_DB_PATH_NEW=str(bank_path), QUESTION_STORAGE_BACKEND='sqlite',
+                             QUESTIONS_FTS_PATH=str(tmp_path / 'questions.fts.db'))
+    assert service.bank.fts_store is None
+    assert len(service.bank.questions) == len(service.get_default_questions())
+    assert not service.reload_questions_db()
+
+
+def test_bm25_snapshot_reuses_prebuilt_scorer(tmp_path, monkeypatch):
+    # 快照头部的评分器参数（嵌套列表）应与当前配置匹配，直接使用快照中预先构建的评分器
+    from app.services import question_service
+    snapshot_path = str(tmp_path / 'bank.snapshot')
+    service = create_service(QUESTION_SEARCH_SCORER='bm25', QUESTIONS_SNAPSHOT_PATH=snapshot_path)
+    service.write_snapshot()
+    expected = service.search_questions('列表')
+
+    def fail(*args, **kwargs):
+        raise AssertionError('快照中的评分器未被使用')
+    monkeypatch.setattr(question_service, 'create_scorer', fail)
+    restored = create_service(QUESTION_SEARCH_SCORER='bm25', QUESTIONS_SNAPSHOT_PATH=snapshot_path)
+    assert restored.search_questions('列表') == expected
+
+
+def test_code_index_is_opt_in_and_skips_prose(service, questions):
+    from app.services.code_matching import contains_code
+    assert service.bank.code_index is None
+    indexed = create_service(QUESTION_CODE_INDEX=True)
+    code_ids = [doc_id for doc_id, question in enumerate(questions) if contains_code(question['question'])]
+    assert list(indexed.bank.code_index.doc_ids) == code_ids
+    assert not contains_code('对于两个集合s1和s2，s1 < s2的意思是？')
+    # 改过变量名与缩进的代码仍能找到原题
+    source = questions[0]['question']
+    snippet = source.split('\n', 1)[1].replace('x', 'a').replace('y', 'b').replace('    ', '  ')
+    results = indexed.match_code(snippet)
+    assert results[0]['match_mode'] == 'code'
+    assert result_keys(indexed, results)[0][0] == 0
+
+
+def test_autocomplete_matches_prefix_scan(questions):
+    # 预先计算的长区间结果与逐个比较提示词的结果一致；提示内容在返回时由题目生成
+    service = create_service(QUESTION_AUTOCOMPLETE=True)
+    index = service.bank.prefix_index
+    keys = [(index.keys[position], index.ranks[position]) for position in range(len(index))]
+    rng = random.Random(5)
+    prefixes = ['p', 'i', '以', '以下', '单选题', '单选题 1', 'print', 'zz'] + [
+        key[:rng.randint(1, len(key))] for key, _ in rng.sample(keys, 50)]
+    for prefix in prefixes:
+        expected = sorted({rank for key, rank in keys if key.startswith(prefix)})[:index.max_suggestions]
+        suggestions = service.autocomplete(prefix)
+        assert [index._suggestion(rank) for rank in expected] == suggestions, prefix
+    question = service.autocomplete('单选题 1')[0]
+    assert question['kind'] == 'question' and question['id'] == service.formatted_questions[0].id
+    assert question['text'] == ' '.join(questions[0]['question'].split())[:40]
@@ -0,0 +1,146 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.services.single_flight import SingleFlight, StreamFanout
+
+WAITERS = 8
+
+
+def wait_until(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, '等待超时'
+        time.sleep(0.001)
+
+
+def run_concurrently(flight, key, fn):
+    """启动 WAITERS 个相同请求，等到它们都已加入后返回 futures"""
+    executor = ThreadPoolExecutor(WAITERS)
+    futures = [executor.submit(flight.do, key, fn) for _ in range(WAITERS)]
+    wait_until(lambda: flight.stats()['coalesced'] == WAITERS - 1)
+    executor.shutdown(wait=False)
+    return futures
+
+
+def test_concurrent_calls_share_one_upstream_call():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        release.wait(5)
+        return {'answer': 42}
+
+    futures = run_concurrently(flight, 'key', fetch)
+    release.set()
+    results = [future.result(5) for future in futures]
+    assert len(calls) == 1
+    assert all(value is results[0][0] for value, _ in results)
+    assert sorted(leader for _, leader in results) == [False] * (WAITERS - 1) + [True]
+    assert flight.stats() == {'leaders': 1, 'coalesced': WAITERS - 1, 'in_flight': 0}
+
+
+def test_different_keys_are_not_coalesced():
+    flight = SingleFlight()
+    assert flight.do('a', lambda: 1) == (1, True)
+    assert flight.do('b', lambda: 2) == (2, True)
+    # 完成后不缓存，相同的键再次执行
+    assert flight.do('a', lambda: 3) == (3, True)
+
+
+def test_leader_exception_reaches_every_waiter():
+    flight = SingleFlight()
+    release = threading.Event()
+    error = ConnectionError('上游超时')
+
+    def fetch():
+        release.wait(5)
+        raise error
+
+    futures = run_concurrently(flight, 'key', fetch)
+    release.set()
+    for future in futures:
+        with pytest.raises(ConnectionError) as raised:
+            future.result(5)
+        assert raised.value is error
+    # 失败的请求不保留，下一次调用重新执行
+    assert flight.do('key', lambda: 'ok') == ('ok', True)
+
+
+def failing_source(opened, lines, error):
+    def open_source():
+        opened.append(1)
+        yield from lines
+        raise error
+    return open_source
+
+
+def test_follower_sees_replay_then_error_when_stream_stops_partway():
+    fanout = StreamFanout()
+    opened = []
+    error = ConnectionError('连接中断')
+    leader, is_leader = fanout.join('key', failing_source(opened, [b'a', b'b'], error))
+    assert is_leader and next(leader) == b'a'
+
+    follower, is_leader = fanout.join('key', failing_source(opened, [b'x'], error))
+    assert not is_leader
+    # 先回放已收到的内容，再与首个调用方共享后续内容与异常
+    assert next(follower) == b'a'
+    assert next(follower) == b'b'
+    assert next(leader) == b'b'
+    for lines in (follower, leader):
+        with pytest.raises(ConnectionError) as raised:
+            next(lines)
+        assert raised.value is error
+    assert len(opened) == 1
+
+    # 已失败的流不再共享，新的调用方重新发起请求
+    retry, is_leader = fanout.join('key', lambda: iter([b'c']))
+    assert is_leader and list(retry) == [b'c']
+
+
+def test_follower_leaving_partway_keeps_stream_open_for_others():
+    fanout = StreamFanout()
+    closed = []
+
+    def open_source():
+        try:
+            yield from (b'a', b'b', b'c')
+        finally:
+            closed.append(1)
+
+    leader, _ = fanout.join('key', open_source)
+    follower, _ = fanout.join('key', open_source)
+    assert next(leader) == b'a' and next(follower) == b'a'
+    follower.close()
+    assert not closed
+    assert list(leader) == [b'b', b'c']
+    assert closed and fanout.stats()['in_flight'] == 0
+
+
+def test_concurrent_stream_readers_receive_same_lines():
+    fanout = StreamFanout()
+    opened = []
+    started = threading.Event()
+    release = threading.Event()
+
+    def open_source():
+        opened.append(1)
+        yield b'first'
+        started.set()
+        release.wait(5)
+        yield from (b'second', b'third')
+
+    streams = [fanout.join('key', open_source) for _ in range(WAITERS)]
+    assert [is_leader for _, is_leader in streams] == [True] + [False] * (WAITERS - 1)
+    with ThreadPoolExecutor(WAITERS) as executor:
+        futures = [executor.submit(list, lines) for lines, _ in streams]
+        started.wait(5)
+        release.set()
+        results = [future.result(5) for future in futures]
+    assert results == [[b'first', b'second', b'third']] * WAITERS
+    assert len(opened) == 1
@@ -0,0 +1,86 @@
+import time
+
+from app.services.stream_pipeline import DraftSegmenter, pipelined_filter
+
+
+def segment_all(text, min_chars, piece=3):
+    """按 piece 个字符一块喂给切分器，模拟流式到达"""
+    segmenter = DraftSegmenter(min_chars)
+    segments = []
+    for start in range(0, len(text), piece):
+        segments.extend(segmenter.feed(text[start:start + piece]))
+    tail = segmenter.finish()
+    return segments + ([tail] if tail else [])
+
+
+def draft_chunks(text, piece=5):
+    for start in range(0, len(text), piece):
+        yield {'content': text[start:start + piece], 'done': False}
+    yield {'content': '', 'done': True}
+
+
+def content_of(chunks):
+    return ''.join(chunk.get('content') or '' for chunk in chunks)
+
+
+def test_segmenter_splits_on_blank_lines():
+    text = 'aaaa\n\nbbbb\n\ncccc'
+    assert segment_all(text, min_chars=1) == ['aaaa', 'bbbb', 'cccc']
+
+
+def test_segmenter_merges_short_paragraphs():
+    text = 'aa\n\nbb\n\ncccccc\n\ndd'
+    assert segment_all(text, min_chars=4) == ['aa\n\nbb', 'cccccc', 'dd']
+
+
+def test_segmenter_keeps_code_block_together():
+    # 代码块内的空行不切分，说明文字与代码块在同一段，代码块结束处切分
+    text = '说明：\n```python\nx = 1\n\ny = 2\n```\n后续内容'
+    assert segment_all(text, min_chars=1) == ['说明：\n```python\nx = 1\n\ny = 2\n```', '后续内容']
+
+
+def test_segmenter_finish_without_content():
+    segmenter = DraftSegmenter(1)
+    assert segmenter.feed('\n\n') == []
+    assert segmenter.finish() is None
+
+
+def test_pipeline_keeps_segment_order():
+    # 后面的段落先审查完，输出仍按草稿顺序，段与段之间以空行连接
+    delays = {'first': 0.05, 'second': 0.0, 'third': 0.02}
+
+    def review(segment):
+        time.sleep(delays[segment])
+        yield {'content': segment.upper(), 'done': False}
+        yield {'content': '', 'done': True}
+
+    chunks = list(pipelined_filter(draft_chunks('first\n\nsecond\n\nthird'), review, min_chars=1))
+    assert content_of(chunks) == 'FIRST\n\nSECOND\n\nTHIRD'
+    assert chunks[-1] == {'content': '', 'done': True}
+
+
+def test_pipeline_stops_when_review_fails_mid_segment():
+    reviewed = []
+
+    def review(segment):
+        reviewed.append(segment)
+        yield {'content': segment[:2], 'done': False}
+        if segment == 'second':
+            raise RuntimeError('upstream closed')
+        yield {'content': segment[2:], 'done': False}
+        yield {'content': '', 'done': True}
+
+    chunks = list(pipelined_filter(draft_chunks('first\n\nsecond\n\nthird'), review, min_chars=1, max_parallel=1))
+    assert chunks[-1]['error'] and chunks[-1]['done']
+    assert 'upstream closed' in chunks[-1]['content']
+    assert content_of(chunks[:-1]) == 'first\n\nse'
+
+
+def test_pipeline_passes_draft_error_through():
+    def draft():
+        yield {'content': 'para\n\n', 'done': False}
+        yield {'content': '草稿失败', 'done': True, 'error': True}
+
+    chunks = list(pipelined_filter(draft(), lambda segment: iter([{'content': segment, 'done': True}]),
+                                   min_chars=1))
+    assert chunks[-1] == {'content': '草稿失败', 'done': True, 'error': True}